@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, Reminder, Task, Note, Tag, NoteTag, Attachment, Notification, TokenBlacklist
+from .models import User, Reminder, Task, Note, Tag, NoteTag, Attachment, Notification, Tombstone, TokenBlacklist
 
 admin.site.register(User)
 admin.site.register(Reminder)
@@ -9,4 +9,5 @@ admin.site.register(Tag)
 admin.site.register(NoteTag)
 admin.site.register(Attachment)
 admin.site.register(Notification)
+admin.site.register(Tombstone)
 admin.site.register(TokenBlacklist)
@@ -3,3 +3,12 @@ from django.apps import AppConfig
 class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from . import signals  # noqa: F401
+        from .instrumentation import install_execute_wrapper
+        from .search import install_functions
+
+        connection_created.connect(install_execute_wrapper, dispatch_uid='app.instrumentation')
+        connection_created.connect(install_functions, dispatch_uid='app.search')
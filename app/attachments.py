@@ -0,0 +1,283 @@
+import hashlib
+import os
+import re
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Attachment, Blob, UploadSession
+
+CHUNK_SIZE = 1024 * 1024
+# A chunk's writer holds the upload for WRITER_LEASE after it last confirmed
+# it, and confirms again before writing whenever WRITER_REFRESH has passed
+WRITER_LEASE = timedelta(seconds=60)
+WRITER_REFRESH = 10
+UPLOAD_DIR = 'uploads'
+BLOB_DIR = 'blobs'
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def max_size():
+    return getattr(settings, 'ATTACHMENT_MAX_SIZE', 100 * 1024 * 1024)
+
+
+def blob_name(sha256):
+    """Storage name of a blob, fanned out over two directory levels."""
+    return f'{BLOB_DIR}/{sha256[:2]}/{sha256[2:4]}/{sha256}'
+
+
+def part_path(session_id):
+    return default_storage.path(f'{UPLOAD_DIR}/{session_id}.part')
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def store(path, size):
+    """
+    Move a finished file at `path` into the blob store and take a reference
+    to its blob. When the content is already stored the file is discarded.
+    Must run inside a transaction.
+    """
+    sha256 = file_sha256(path)
+    blob, created = Blob.objects.get_or_create(sha256=sha256, defaults={'size': size})
+    target = default_storage.path(blob_name(sha256))
+    if created or not os.path.exists(target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(path, target)
+    else:
+        os.remove(path)
+    Blob.objects.filter(id=blob.id).update(ref_count=F('ref_count') + 1)
+    return blob
+
+
+def release(blob_id):
+    """Drop one reference to a blob, deleting it and its file once none are left."""
+    with transaction.atomic():
+        Blob.objects.filter(id=blob_id).update(ref_count=F('ref_count') - 1)
+        blob = Blob.objects.filter(id=blob_id, ref_count__lte=0).first()
+        if blob is not None:
+            blob.delete()
+            transaction.on_commit(lambda: _remove_blob_file(blob.sha256))
+
+
+def _remove_blob_file(sha256):
+    # The same content may have been uploaded again in the meantime.
+    if Blob.objects.filter(sha256=sha256).exists():
+        return
+    try:
+        os.remove(default_storage.path(blob_name(sha256)))
+    except FileNotFoundError:
+        pass
+
+
+def create_attachment(path, size, owner_type, owner_id, filename, mime_type):
+    with transaction.atomic():
+        blob = store(path, size)
+        return Attachment.objects.create(
+            owner_type=owner_type,
+            owner_id=owner_id,
+            file=blob_name(blob.sha256),
+            blob=blob,
+            filename=filename,
+            mime_type=mime_type,
+            size=size,
+        )
+
+
+def save_uploaded_file(uploaded, owner_type, owner_id):
+    """Store a file received in one multipart request, without reading it into memory at once."""
+    path = default_storage.path(f'{UPLOAD_DIR}/{uuid.uuid4()}.part')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        with open(path, 'wb') as f:
+            for chunk in uploaded.chunks(CHUNK_SIZE):
+                f.write(chunk)
+        return create_attachment(path, uploaded.size, owner_type, owner_id, uploaded.name,
+                                 uploaded.content_type or 'application/octet-stream')
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def start_upload(owner_type, owner_id, filename, mime_type, size):
+    if owner_type not in dict(Attachment.OWNER_TYPES):
+        raise UploadError(f'Invalid owner_type: {owner_type}')
+    if size < 0:
+        raise UploadError('size must not be negative')
+    if size > max_size():
+        raise UploadError(f'File is larger than the {max_size()} byte limit', status=413)
+    prune_uploads()
+    session = UploadSession.objects.create(
+        owner_type=owner_type, owner_id=owner_id, filename=filename or '',
+        mime_type=mime_type or 'application/octet-stream', size=size,
+    )
+    os.makedirs(os.path.dirname(part_path(session.id)), exist_ok=True)
+    open(part_path(session.id), 'wb').close()
+    return session
+
+
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+def parse_content_range(header, session):
+    """Return the (start, end) byte positions a chunk claims, end inclusive."""
+    match = CONTENT_RANGE.match(header or '')
+    if not match:
+        raise UploadError('Content-Range: bytes <start>-<end>/<total> is required')
+    start, end, total = (int(group) for group in match.groups())
+    if total != session.size or end < start or end >= total:
+        raise UploadError('Content-Range does not fit this upload', status=416)
+    if start != session.received:
+        raise UploadError(f'Expected a chunk starting at byte {session.received}', status=409)
+    return start, end
+
+
+def claim_writer(session, start):
+    """
+    Take the upload for one chunk at `start` before touching its part file,
+    so a concurrent or retried request for the same offset cannot truncate
+    or overwrite bytes this one is writing. Returns the claim token.
+    """
+    token = uuid.uuid4().hex
+    now = timezone.now()
+    claimed = UploadSession.objects.filter(id=session.id, received=start).filter(
+        Q(writer='') | Q(writer_seen__lt=now - WRITER_LEASE),
+    ).update(writer=token, writer_seen=now)
+    if not claimed:
+        raise UploadError('Another request is uploading this chunk', status=409)
+    return token
+
+
+def append_chunk(session, start, end, stream):
+    """
+    Write one chunk from the request stream to the upload's part file,
+    CHUNK_SIZE bytes at a time.
+
+    If the client disconnects halfway, the bytes that arrived still count,
+    so the next attempt resumes from there. Returns the attachment once the
+    last byte is in, otherwise None.
+    """
+    token = claim_writer(session, start)
+    mine = UploadSession.objects.filter(id=session.id, writer=token)
+    expected = end - start + 1
+    written = 0
+    error = None
+    try:
+        with open(part_path(session.id), 'r+b') as f:
+            f.seek(start)
+            f.truncate()
+            confirmed = time.monotonic()
+            try:
+                while written < expected:
+                    chunk = stream.read(min(CHUNK_SIZE, expected - written))
+                    if not chunk:
+                        break
+                    # A stalled read may have outlasted the lease; never write after losing it
+                    if time.monotonic() - confirmed >= WRITER_REFRESH:
+                        if not mine.update(writer_seen=timezone.now()):
+                            raise UploadError('Another request took over this upload', status=409)
+                        confirmed = time.monotonic()
+                    f.write(chunk)
+                    written += len(chunk)
+            except OSError as e:
+                error = e
+    finally:
+        # Record the bytes that arrived and let the next chunk in
+        advanced = mine.update(received=start + written, writer='', writer_seen=None, updated_at=timezone.now())
+    if not advanced:
+        raise UploadError('Another request took over this upload', status=409)
+    session.received = start + written
+    if error is not None:
+        raise UploadError(f'Upload interrupted at byte {session.received}: {error}')
+    if written != expected:
+        raise UploadError(f'Chunk ended early at byte {session.received}')
+    if session.received == session.size:
+        return finish_upload(session)
+    return None
+
+
+def finish_upload(session):
+    attachment = create_attachment(
+        part_path(session.id), session.size, session.owner_type, session.owner_id,
+        session.filename, session.mime_type,
+    )
+    UploadSession.objects.filter(id=session.id).delete()
+    return attachment
+
+
+def cancel_upload(session):
+    """Forget an upload the client gave up on, along with its part file."""
+    UploadSession.objects.filter(id=session.id).delete()
+    try:
+        os.remove(part_path(session.id))
+    except FileNotFoundError:
+        pass
+
+
+def prune_uploads():
+    """Forget uploads that have not received a chunk within ATTACHMENT_UPLOAD_TTL."""
+    ttl = getattr(settings, 'ATTACHMENT_UPLOAD_TTL', timedelta(days=1))
+    stale = list(UploadSession.objects.filter(updated_at__lt=timezone.now() - ttl).values_list('id', flat=True))
+    for session_id in stale:
+        try:
+            os.remove(part_path(session_id))
+        except FileNotFoundError:
+            pass
+    UploadSession.objects.filter(id__in=stale).delete()
+    return len(stale)
+
+
+BYTE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range(header, size):
+    """
+    Resolve a Range header against a file size.
+
+    Returns (start, end) inclusive for one satisfiable range, None to serve
+    the whole file (no header, or a form that is not supported, such as
+    several ranges), or raises ValueError when the range is unsatisfiable.
+    """
+    match = BYTE_RANGE.match((header or '').strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if start > end or start >= size:
+            raise ValueError('Range not satisfiable')
+    else:
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise ValueError('Range not satisfiable')
+        start, end = max(0, size - suffix), size - 1
+    return start, end
+
+
+def iter_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
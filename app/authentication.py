@@ -0,0 +1,275 @@
+import datetime
+import hashlib
+import math
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import jwt
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+
+from .instrumentation import phase
+from .models import TokenBlacklist
+
+SECRET_KEY = os.environ.get('SECRET_KEY', 'django-insecure-test-key')
+TOKEN_LIFETIME = datetime.timedelta(days=7)
+
+
+def generate_tokens(user_id):
+    now = datetime.datetime.utcnow()
+    payload = {
+        'user_id': user_id,
+        'jti': uuid.uuid4().hex,
+        'iat': now,
+        'exp': now + TOKEN_LIFETIME,
+    }
+    access_token = jwt.encode(payload, SECRET_KEY, algorithm='HS256')
+    return {'access': access_token, 'refresh': access_token}
+
+
+def token_digest(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def token_jti(token, payload):
+    """The revocation key of a token: its jti claim, or a digest for tokens issued before jti existed."""
+    return payload.get('jti') or token_digest(token)
+
+
+class TokenUser:
+    """The authenticated user as far as a verified token can tell, without a database read."""
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, user_id):
+        self.id = self.pk = user_id
+
+    def __str__(self):
+        return f'TokenUser {self.id}'
+
+
+class VerifiedToken:
+    def __init__(self, token, payload):
+        self.token = token
+        self.payload = payload
+        self.user_id = payload['user_id']
+        self.jti = token_jti(token, payload)
+        self.expires_at = datetime.datetime.fromtimestamp(payload['exp'], tz=datetime.timezone.utc)
+
+    def __str__(self):
+        return self.token
+
+
+class LRUCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.items.get(key)
+            if value is not None:
+                self.items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+    def pop(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+
+class BloomFilter:
+    """
+    Fixed-size bloom filter over strings. `in` can give false positives at
+    roughly `error_rate` but never false negatives.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.sha256(value.encode()).digest()
+        first = int.from_bytes(digest[:8], 'big')
+        second = int.from_bytes(digest[8:16], 'big') | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class RevocationIndex:
+    """
+    In-process bloom filter of revoked jtis, kept in step with TokenBlacklist.
+
+    Most tokens were never revoked, so the filter lets those requests skip
+    the database entirely; only a filter hit is confirmed with an indexed
+    lookup. Revocations made by other worker processes are pulled in with an
+    incremental query at most every `refresh_interval` seconds, which bounds
+    how long a token revoked elsewhere can still be used.
+
+    One request at a time runs the refresh query, outside the lock; the
+    others carry on with the current filter meanwhile and the result is
+    swapped in under the lock. Until the first load every token is a
+    possible hit, so it is checked against the database.
+    """
+
+    def __init__(self, capacity, refresh_interval):
+        self.capacity = capacity
+        self.refresh_interval = refresh_interval
+        self.lock = threading.Lock()
+        self.bloom = None
+        self.loaded_until = None
+        self.next_refresh = 0.0
+        # Bumped by reset(), so a refresh that started before it is discarded
+        self.generation = 0
+        # Local revocations made while a refresh query runs, added to its result
+        self.added_during_refresh = None
+
+    def _load(self, bloom, loaded_until, capacity):
+        """Query for a new or updated filter: (bloom, jtis to add, loaded_until, capacity)."""
+        now = timezone.now()
+        if bloom is None or bloom.count >= capacity:
+            live = TokenBlacklist.objects.filter(expires_at__gt=now)
+            count = live.count()
+            while capacity < count * 2:
+                capacity *= 2
+            bloom = BloomFilter(capacity)
+            for jti in live.values_list('jti', flat=True).iterator(chunk_size=2000):
+                bloom.add(jti)
+            return bloom, [], now, capacity
+        # Re-read a short overlap so rows committed during the last refresh are not missed.
+        since = loaded_until - datetime.timedelta(seconds=self.refresh_interval)
+        return bloom, list(TokenBlacklist.objects.filter(created_at__gte=since).values_list('jti', flat=True)), now, capacity
+
+    def _refresh(self):
+        with self.lock:
+            if self.added_during_refresh is not None or time.monotonic() < self.next_refresh:
+                return  # another request is refreshing, or just did
+            self.next_refresh = time.monotonic() + self.refresh_interval
+            generation = self.generation
+            current = (self.bloom, self.loaded_until, self.capacity)
+            self.added_during_refresh = []
+        try:
+            bloom, jtis, loaded_until, capacity = self._load(*current)
+        except Exception:
+            with self.lock:
+                if generation == self.generation:
+                    self.next_refresh = 0.0
+                    self.added_during_refresh = None
+            raise
+        with self.lock:
+            if generation != self.generation:
+                return
+            for jti in jtis + self.added_during_refresh:
+                bloom.add(jti)
+            self.bloom, self.loaded_until, self.capacity = bloom, loaded_until, capacity
+            self.added_during_refresh = None
+
+    def maybe_revoked(self, jti):
+        if time.monotonic() >= self.next_refresh:
+            self._refresh()
+        with self.lock:
+            return self.bloom is None or jti in self.bloom
+
+    def add(self, jti):
+        with self.lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+            if self.added_during_refresh is not None:
+                self.added_during_refresh.append(jti)
+
+    def reset(self):
+        with self.lock:
+            self.bloom = None
+            self.next_refresh = 0.0
+            self.generation += 1
+            self.added_during_refresh = None
+
+
+verified_tokens = LRUCache(getattr(settings, 'JWT_CACHE_SIZE', 10000))
+revocations = RevocationIndex(
+    capacity=getattr(settings, 'JWT_REVOCATION_BLOOM_CAPACITY', 100000),
+    refresh_interval=getattr(settings, 'JWT_REVOCATION_REFRESH_SECONDS', 5),
+)
+
+
+def verify_token(token):
+    """Decode and check a token, reusing the result of an earlier decode when possible."""
+    key = token_digest(token)
+    verified = verified_tokens.get(key)
+    if verified is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+        except jwt.ExpiredSignatureError:
+            raise AuthenticationFailed('Token has expired')
+        except jwt.InvalidTokenError:
+            raise AuthenticationFailed('Invalid token')
+        if 'user_id' not in payload or 'exp' not in payload:
+            raise AuthenticationFailed('Invalid token')
+        verified = VerifiedToken(token, payload)
+        verified_tokens.set(key, verified)
+    elif verified.expires_at <= timezone.now():
+        verified_tokens.pop(key)
+        raise AuthenticationFailed('Token has expired')
+
+    if revocations.maybe_revoked(verified.jti) and TokenBlacklist.objects.filter(jti=verified.jti).exists():
+        raise AuthenticationFailed('Token has been revoked')
+    return verified
+
+
+def revoke_token(verified):
+    TokenBlacklist.objects.get_or_create(
+        jti=verified.jti,
+        defaults={'user_id': verified.user_id, 'expires_at': verified.expires_at},
+    )
+    revocations.add(verified.jti)
+    verified_tokens.pop(token_digest(verified.token))
+
+
+def prune_revoked_tokens():
+    """Revocations are only needed until the token would have expired anyway."""
+    return TokenBlacklist.objects.filter(expires_at__lte=timezone.now()).delete()[0]
+
+
+class JWTAuthentication(BaseAuthentication):
+    keyword = b'bearer'
+
+    def authenticate(self, request):
+        header = get_authorization_header(request).split()
+        if not header or header[0].lower() != self.keyword:
+            return None
+        if len(header) != 2:
+            raise AuthenticationFailed('Invalid Authorization header')
+        try:
+            token = header[1].decode()
+        except UnicodeError:
+            raise AuthenticationFailed('Invalid Authorization header')
+
+        with phase('auth'):
+            verified = verify_token(token)
+        return TokenUser(verified.user_id), verified
+
+    def authenticate_header(self, request):
+        return 'Bearer'
@@ -0,0 +1,44 @@
+"""
+Django's SQLite backend plus the `init_command` and `transaction_mode`
+OPTIONS that Django 5.1 added, so the production profile in settings.py can
+tune every connection on Django 4.2. Once on 5.1+, ENGINE can go back to
+'django.db.backends.sqlite3' with the same OPTIONS.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'EXCLUSIVE', 'IMMEDIATE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        # sqlite3.connect() rejects keyword arguments it does not know.
+        kwargs.pop('init_command', None)
+        kwargs.pop('transaction_mode', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        init_command = self.settings_dict['OPTIONS'].get('init_command')
+        if init_command:
+            for statement in init_command.split(';'):
+                if statement.strip():
+                    conn.execute(statement)
+        return conn
+
+    @property
+    def transaction_mode(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        if mode is not None and mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(f'transaction_mode must be one of {", ".join(TRANSACTION_MODES)}, not {mode!r}')
+        return mode and mode.upper()
+
+    def _start_transaction_under_autocommit(self):
+        # IMMEDIATE takes the write lock when the transaction begins. A
+        # deferred transaction that reads first and then writes cannot wait
+        # out busy_timeout; SQLite fails it with "database is locked" at once.
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
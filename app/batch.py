@@ -0,0 +1,191 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.utils import timezone
+
+from . import revisions
+from .models import Reminder, Task, Note, NoteRevision
+from .recurrence import RecurrenceError, parse_rule
+from .response_cache import bump_user_version
+from .serializers import ReminderSerializer, TaskSerializer, NoteSerializer
+from .tags import set_note_tags
+
+MAX_OPERATIONS = 500
+
+TYPES = {
+    'reminder': (Reminder, ReminderSerializer),
+    'task': (Task, TaskSerializer),
+    'note': (Note, NoteSerializer),
+}
+
+READ_ONLY_FIELDS = {'id', 'user', 'created_at', 'updated_at', 'tags', 'revision', *Note.PREVIEW_FIELDS}
+
+REQUIRED_ON_CREATE = {
+    'reminder': ['title', 'reminder_date'],
+    'task': ['title'],
+    'note': ['title'],
+}
+
+
+class OperationError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def writable_fields(serializer_class):
+    return [name for name in serializer_class.Meta.fields if name not in READ_ONLY_FIELDS]
+
+
+def apply_data(instance, serializer_class, data):
+    """
+    Validate and copy allowed fields from `data` onto the instance, returning
+    the attribute names that changed.
+    """
+    allowed = writable_fields(serializer_class)
+    changed = []
+    for name, value in data.items():
+        if name == 'tags':
+            continue
+        if name not in allowed:
+            raise OperationError(f'Unknown or read-only field: {name}')
+        field = instance._meta.get_field(name)
+        try:
+            value = field.clean(value, instance)
+            if name == 'recurrence_rule' and value:
+                parse_rule(value)
+        except ValidationError as e:
+            raise OperationError(f'{name}: {" ".join(e.messages)}')
+        except RecurrenceError as e:
+            raise OperationError(f'{name}: {e}')
+        setattr(instance, field.attname, value)
+        changed.append(field.attname)
+    return changed
+
+
+def run_batch(user_id, operations):
+    """
+    Apply create/update/delete operations across reminders, tasks and notes
+    in one transaction, using one bulk statement per model and kind of write.
+
+    Every operation is validated before anything is written. If any of them
+    fails, nothing is applied and the per-operation results say which one
+    failed and why. Returns (ok, results).
+    """
+    if not isinstance(operations, list) or not operations:
+        raise ValueError('operations must be a non-empty list')
+    if len(operations) > MAX_OPERATIONS:
+        raise ValueError(f'At most {MAX_OPERATIONS} operations per batch')
+
+    results = [None] * len(operations)
+    creates = {name: [] for name in TYPES}
+    updates = {name: {} for name in TYPES}
+    deletes = {name: [] for name in TYPES}
+    tag_writes = []
+
+    # Load every row the batch touches with one query per model.
+    wanted = {name: set() for name in TYPES}
+    for op in operations:
+        if isinstance(op, dict) and op.get('type') in TYPES and op.get('op') in ('update', 'delete'):
+            try:
+                wanted[op['type']].add(int(op.get('id')))
+            except (TypeError, ValueError):
+                pass
+    existing = {
+        name: {obj.id: obj for obj in TYPES[name][0].objects.filter(user_id=user_id, id__in=ids)} if ids else {}
+        for name, ids in wanted.items()
+    }
+
+    now = timezone.now()
+    for index, op in enumerate(operations):
+        try:
+            if not isinstance(op, dict):
+                raise OperationError('Operation must be an object')
+            kind, type_name, data = op.get('op'), op.get('type'), op.get('data') or {}
+            if type_name not in TYPES:
+                raise OperationError(f'Unknown type: {type_name}')
+            model, serializer_class = TYPES[type_name]
+
+            if kind == 'create':
+                missing = [name for name in REQUIRED_ON_CREATE[type_name] if data.get(name) in (None, '')]
+                if missing:
+                    raise OperationError(f'Missing required field: {missing[0]}')
+                instance = model(user_id=user_id)
+                apply_data(instance, serializer_class, data)
+                creates[type_name].append((index, instance))
+                if type_name == 'note':
+                    # bulk_create skips Note.save(), which keeps the preview up to date
+                    instance.update_preview()
+                    if data.get('tags'):
+                        tag_writes.append((instance, data['tags'], False))
+            elif kind in ('update', 'delete'):
+                try:
+                    instance = existing[type_name][int(op.get('id'))]
+                except (KeyError, TypeError, ValueError):
+                    raise OperationError(f'{model.__name__} not found', status=404)
+                if kind == 'update':
+                    changed = apply_data(instance, serializer_class, data)
+                    if 'body' in changed:
+                        instance.update_preview()
+                        changed += Note.PREVIEW_FIELDS
+                    instance.updated_at = now
+                    entry = updates[type_name].setdefault(instance.id, (instance, set()))
+                    entry[1].update(changed)
+                    results[index] = (200, instance)
+                    if type_name == 'note' and 'tags' in data:
+                        tag_writes.append((instance, data['tags'], True))
+                else:
+                    deletes[type_name].append(instance.id)
+                    results[index] = (204, None)
+            else:
+                raise OperationError(f'Unknown op: {kind}')
+        except OperationError as e:
+            results[index] = (e.status, str(e))
+
+    failed = [i for i, result in enumerate(results) if result is not None and result[0] >= 400]
+    if failed:
+        return False, [_result(i, *results[i]) if i in failed else {'index': i, 'status': 424, 'error': 'Not applied'}
+                       for i in range(len(operations))]
+
+    with transaction.atomic():
+        for type_name, pending in creates.items():
+            if pending:
+                TYPES[type_name][0].objects.bulk_create([instance for _, instance in pending])
+                for index, instance in pending:
+                    results[index] = (201, instance)
+        for type_name, rows in updates.items():
+            if rows:
+                fields = set().union(*(changed for _, changed in rows.values())) | {'updated_at'}
+                # A whole-body write starts the note's history again from a snapshot (see app/revisions.py)
+                rewritten = [instance for instance, changed in rows.values() if 'body' in changed]
+                for instance in rewritten:
+                    instance.revision += 1
+                if rewritten:
+                    fields.add('revision')
+                TYPES[type_name][0].objects.bulk_update([instance for instance, _ in rows.values()], sorted(fields))
+                NoteRevision.objects.bulk_create([revisions.snapshot(instance) for instance in rewritten])
+        for instance, names, replace in tag_writes:
+            set_note_tags(instance, names, replace=replace)
+        for type_name, ids in deletes.items():
+            if not ids:
+                continue
+            model = TYPES[type_name][0]
+            if model is Note:
+                # Notes are archived rather than deleted, as in note_detail.
+                model.objects.filter(id__in=ids).update(is_archived=True, updated_at=now)
+            else:
+                model.objects.filter(id__in=ids).delete()
+        bump_user_version(user_id)
+
+    notes = [payload for status, payload in results if isinstance(payload, Note)]
+    prefetch_related_objects(notes, NoteSerializer.tag_prefetch())
+    return True, [_result(i, *results[i], type_name=operations[i]['type']) for i in range(len(operations))]
+
+
+def _result(index, status, payload, type_name=None):
+    result = {'index': index, 'status': status}
+    if status >= 400:
+        result['error'] = payload
+    elif payload is not None:
+        result['data'] = TYPES[type_name][1](payload).data
+    return result
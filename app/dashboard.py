@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import Reminder, Task, Note
+from .response_cache import user_version
+
+DASHBOARD_SLICE = 3
+
+
+def dashboard_cache_key(user_id):
+    return f'dashboard:{user_id}:{user_version(user_id)}'
+
+
+def build_dashboard(user_id):
+    """Counts and top-N slices for the dashboard, from a handful of indexed queries."""
+    reminder_counts = Reminder.objects.filter(user_id=user_id).aggregate(total=Count('id'))
+    task_counts = Task.objects.filter(user_id=user_id).aggregate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(status='completed')),
+    )
+    note_counts = Note.objects.filter(user_id=user_id, is_archived=False).aggregate(total=Count('id'))
+
+    upcoming_reminders = Reminder.objects.filter(user_id=user_id, status='pending').order_by(
+        '-reminder_date'
+    ).values('id', 'title', 'reminder_date', 'category')[:DASHBOARD_SLICE]
+    recent_tasks = Task.objects.filter(user_id=user_id).exclude(status='completed').order_by(
+        'order_index'
+    ).values('id', 'title', 'priority', 'status', 'due_date')[:DASHBOARD_SLICE]
+    pinned_notes = Note.objects.filter(user_id=user_id, is_archived=False, is_pinned=True).order_by(
+        '-created_at'
+    ).values('id', 'title', 'excerpt')[:DASHBOARD_SLICE]
+
+    return {
+        'counts': {
+            'reminders': reminder_counts['total'],
+            'tasks': task_counts['total'],
+            'tasks_completed': task_counts['completed'],
+            'notes': note_counts['total'],
+        },
+        'upcoming_reminders': list(upcoming_reminders),
+        'recent_tasks': list(recent_tasks),
+        'pinned_notes': list(pinned_notes),
+    }
+
+
+def get_dashboard(user_id):
+    timeout = getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300)
+    return cache.get_or_set(dashboard_cache_key(user_id), lambda: build_dashboard(user_id), timeout)
+
@@ -0,0 +1,279 @@
+"""
+Server-Sent Events for due reminders: each web-channel Notification is
+pushed to its user's open /api/events streams once the notifier creates
+it, which it does when the reminder comes due.
+
+One poller per process reads new web notifications with a single query
+per EVENTS_POLL_SECONDS, whatever the number of open streams, and fans
+them out to per-connection queues. A queue that falls EVENTS_QUEUE_SIZE
+events behind is dropped and its stream ends; the browser reconnects with
+Last-Event-ID (the last notification id it saw) and catches up from the
+database, so a slow client holds a bounded amount of memory. Streams also
+end after EVENTS_STREAM_SECONDS in case a disconnect goes unnoticed;
+EventSource simply reconnects.
+
+Streams are async generators and need an ASGI server to stay open without
+holding a thread. sojibWebApp/asgi.py routes /api/events to asgi_app below
+rather than through Django's handler, which in Django 4.2 keeps a thread
+per request for as long as the response lasts. Under WSGI the Django view
+answers at once with what is pending and a `retry:` delay instead, so
+EventSource falls back to polling without holding a worker.
+"""
+import asyncio
+import json
+import logging
+import time
+import weakref
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Max
+from django.http import QueryDict
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.utils.encoders import JSONEncoder
+
+from .authentication import verify_token
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+EVENT_FIELDS = ('id', 'user_id', 'notify_at', 'reminder_id', 'reminder__title', 'reminder__reminder_date',
+                'reminder__category')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _web_notifications():
+    return Notification.objects.filter(channel='web').exclude(status='failed')
+
+
+def format_event(row):
+    data = {'id': row['id'], 'notify_at': row['notify_at'], 'reminder': None}
+    if row['reminder_id'] is not None:
+        data['reminder'] = {
+            'id': row['reminder_id'],
+            'title': row['reminder__title'],
+            'reminder_date': row['reminder__reminder_date'],
+            'category': row['reminder__category'],
+        }
+    return f'id: {row["id"]}\nevent: reminder\ndata: {json.dumps(data, cls=JSONEncoder, separators=(",", ":"))}\n\n'
+
+
+def ready_event(last_id):
+    # Sets the id EventSource resumes from; as a named event, the page can also keep it across reloads
+    return f'id: {last_id}\nevent: ready\ndata: {last_id}\n\n'
+
+
+def parse_last_event_id(value):
+    try:
+        return int(value) if value not in (None, '') else None
+    except ValueError:
+        return None
+
+
+async def latest_id():
+    return (await Notification.objects.aaggregate(latest=Max('id')))['latest'] or 0
+
+
+async def backlog(user_id, after, limit):
+    """Up to `limit` of the user's web notifications after id `after`, within the replay window."""
+    since = timezone.now() - timedelta(hours=_setting('EVENTS_REPLAY_HOURS', 24))
+    rows = _web_notifications().filter(user_id=user_id, id__gt=after, notify_at__gte=since)
+    return [row async for row in rows.order_by('id').values(*EVENT_FIELDS)[:limit]]
+
+
+class Subscription:
+    __slots__ = ('user_id', 'queue')
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.queue = asyncio.Queue()
+
+
+class Broker:
+    """Polls for new web notifications on behalf of every stream open in one event loop."""
+
+    def __init__(self):
+        self.subscriptions = {}  # user_id -> set of Subscription
+        self.cursor = None
+        self.task = None
+
+    async def subscribe(self, user_id):
+        if self.cursor is None:
+            self.cursor = await latest_id()
+        subscription = Subscription(user_id)
+        self.subscriptions.setdefault(user_id, set()).add(subscription)
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscriptions = self.subscriptions.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self.subscriptions[subscription.user_id]
+
+    def publish(self, row):
+        limit = _setting('EVENTS_QUEUE_SIZE', 100)
+        for subscription in list(self.subscriptions.get(row['user_id'], ())):
+            if subscription.queue.qsize() >= limit:
+                # Too far behind: end the stream; the client catches up on reconnect
+                self.unsubscribe(subscription)
+                subscription.queue.put_nowait(None)
+            else:
+                subscription.queue.put_nowait(row)
+
+    async def poll(self):
+        batch = _setting('EVENTS_BATCH', 200)
+        while True:
+            rows = _web_notifications().filter(id__gt=self.cursor).order_by('id').values(*EVENT_FIELDS)[:batch]
+            rows = [row async for row in rows]
+            for row in rows:
+                self.publish(row)
+            if rows:
+                self.cursor = rows[-1]['id']
+            if len(rows) < batch:
+                return
+
+    async def run(self):
+        while self.subscriptions:
+            await asyncio.sleep(_setting('EVENTS_POLL_SECONDS', 2))
+            try:
+                await self.poll()
+            except Exception:
+                logger.exception('Polling for web notifications failed')
+
+
+_brokers = weakref.WeakKeyDictionary()
+
+
+def get_broker():
+    loop = asyncio.get_running_loop()
+    if loop not in _brokers:
+        _brokers[loop] = Broker()
+    return _brokers[loop]
+
+
+async def stream(user_id, last_event_id=None):
+    """One connection's stream: events missed since `last_event_id`, then live events and heartbeats."""
+    broker = get_broker()
+    subscription = await broker.subscribe(user_id)
+    try:
+        yield f'retry: {_setting("EVENTS_RETRY_MS", 3000)}\n\n'
+        if last_event_id is None:
+            # Nothing to replay on a first connection, but give the client an id to resume from
+            last_event_id = broker.cursor
+            yield ready_event(last_event_id)
+        cursor = last_event_id
+        batch = _setting('EVENTS_BATCH', 200)
+        while True:
+            rows = await backlog(user_id, cursor, batch)
+            for row in rows:
+                yield format_event(row)
+                cursor = row['id']
+            if len(rows) < batch:
+                break
+
+        heartbeat = _setting('EVENTS_HEARTBEAT_SECONDS', 15)
+        deadline = time.monotonic() + _setting('EVENTS_STREAM_SECONDS', 300)
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                row = await asyncio.wait_for(subscription.queue.get(), min(heartbeat, remaining))
+            except asyncio.TimeoutError:
+                if time.monotonic() < deadline:
+                    yield ': heartbeat\n\n'
+                continue
+            if row is None:
+                return
+            if row['id'] > cursor:
+                yield format_event(row)
+                cursor = row['id']
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def pending(user_id, last_event_id=None):
+    """The WSGI fallback: what a stream would replay, in one response, then a reconnect delay."""
+    body = [f'retry: {_setting("EVENTS_WSGI_RETRY_MS", 10000)}\n\n']
+    if last_event_id is None:
+        body.append(ready_event(await latest_id()))
+    else:
+        body += [format_event(row) for row in await backlog(user_id, last_event_id, _setting('EVENTS_BATCH', 200))]
+    return ''.join(body)
+
+
+async def _respond(send, status, headers, body=b''):
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _disconnected(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def asgi_app(scope, receive, send):
+    """
+    /api/events as a bare ASGI application, with the same authentication
+    and parameters as views.event_stream. Ends the stream as soon as the
+    client disconnects.
+    """
+    headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+    query = QueryDict(scope.get('query_string', b'').decode('latin-1'))
+    cors = []
+    origin = headers.get('origin')
+    if origin and (origin in getattr(settings, 'CORS_ALLOWED_ORIGINS', ())
+                   or getattr(settings, 'CORS_ALLOW_ALL_ORIGINS', False)):
+        cors = [(b'access-control-allow-origin', origin.encode('latin-1')), (b'vary', b'Origin')]
+    json_headers = [(b'content-type', b'application/json'), *cors]
+
+    if scope['method'] not in ('GET', 'HEAD'):
+        body = json.dumps({'detail': f'Method "{scope["method"]}" not allowed.'}).encode()
+        return await _respond(send, 405, json_headers, body)
+    auth = headers.get('authorization', '').split()
+    token = auth[1] if len(auth) == 2 and auth[0].lower() == 'bearer' else query.get('token')
+    if not token:
+        return await _respond(send, 401, json_headers,
+                              json.dumps({'error': 'Authentication credentials were not provided.'}).encode())
+    try:
+        verified = await sync_to_async(verify_token)(token)
+    except AuthenticationFailed as e:
+        return await _respond(send, 401, json_headers, json.dumps({'error': str(e.detail)}).encode())
+
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [
+        (b'content-type', b'text/event-stream; charset=utf-8'),
+        (b'cache-control', b'no-cache'),
+        (b'x-accel-buffering', b'no'),
+        *cors,
+    ]})
+    if scope['method'] == 'HEAD':
+        return await send({'type': 'http.response.body', 'body': b''})
+
+    last_event_id = parse_last_event_id(headers.get('last-event-id') or query.get('last_event_id'))
+    chunks = stream(verified.user_id, last_event_id)
+    disconnected = asyncio.ensure_future(_disconnected(receive))
+    chunk = None
+    try:
+        while True:
+            chunk = asyncio.ensure_future(chunks.__anext__())
+            await asyncio.wait({chunk, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                return
+            try:
+                body = chunk.result()
+            except StopAsyncIteration:
+                break
+            await send({'type': 'http.response.body', 'body': body.encode(), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        disconnected.cancel()
+        if chunk is not None and not chunk.done():
+            # Cancelling the pending step runs the generator's cleanup
+            chunk.cancel()
+            await asyncio.wait({chunk})
+        await chunks.aclose()
@@ -0,0 +1,56 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, ScryptPasswordHasher, check_password, make_password
+
+# Password hashing is deliberately slow CPU work. hashlib releases the GIL
+# while it runs, so doing it on a small dedicated pool lets the rest of the
+# process keep serving requests, and the pool size caps how many cores a
+# burst of logins can take at once.
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'PASSWORD_HASH_WORKERS', 2),
+            thread_name_prefix='password-hash',
+        )
+    return _executor
+
+
+class ConfiguredPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 with the iteration count from PASSWORD_PBKDF2_ITERATIONS."""
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', PBKDF2PasswordHasher.iterations)
+
+
+class ConfiguredScryptPasswordHasher(ScryptPasswordHasher):
+    """scrypt with the work factor from PASSWORD_SCRYPT_WORK_FACTOR."""
+
+    @property
+    def work_factor(self):
+        return getattr(settings, 'PASSWORD_SCRYPT_WORK_FACTOR', ScryptPasswordHasher.work_factor)
+
+
+def verify(password, encoded):
+    """
+    Check a password, returning (valid, new_hash). new_hash is set when the
+    password was right but `encoded` was made with an outdated hasher or
+    parameters, and should replace the stored hash.
+    """
+    upgraded = []
+    valid = check_password(password, encoded, setter=lambda raw: upgraded.append(make_password(raw)))
+    return valid, upgraded[0] if upgraded else None
+
+
+async def ahash_password(password):
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), make_password, password)
+
+
+async def averify(password, encoded):
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), verify, password, encoded)
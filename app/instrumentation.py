@@ -0,0 +1,231 @@
+"""
+Per-request timing: database queries, serialization, authentication and
+total time, reported in a Server-Timing header, logged when slow, and
+aggregated per route for the Prometheus endpoint at /api/_metrics.
+
+Everything here is a few perf_counter() calls and dictionary updates per
+request, so it is meant to stay on in production.
+"""
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+# Upper bounds in seconds of the request duration histogram buckets.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestMetrics:
+    __slots__ = ('started', 'db_queries', 'db_time', 'phases', 'active')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.phases = {}
+        self.active = None
+
+
+@contextmanager
+def phase(name):
+    """
+    Add the time spent inside the block to the current request's `name` phase.
+
+    Only the outermost phase counts, so nested serializers are not added
+    twice, and queries run inside the block are left to the db figure.
+    """
+    metrics = _current.get()
+    if metrics is None or metrics.active is not None:
+        yield
+        return
+    metrics.active = name
+    db_before = metrics.db_time
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start - (metrics.db_time - db_before)
+        metrics.phases[name] = metrics.phases.get(name, 0.0) + elapsed
+        metrics.active = None
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    """Time every query, attributing it to the current request and logging it when slow."""
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.db_queries += 1
+            metrics.db_time += elapsed
+        if elapsed * 1000 >= getattr(settings, 'SLOW_QUERY_MS', 200):
+            logger.warning('Slow query (%.1f ms): %s', elapsed * 1000, sql[:2000])
+
+
+def install_execute_wrapper(sender, connection, **kwargs):
+    """connection_created receiver; a reconnecting DatabaseWrapper keeps its wrappers, so add it once."""
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(execute_wrapper)
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSONRenderer whose encoding time counts as serialization."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with phase('serialize'):
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class RouteStats:
+    __slots__ = ('buckets', 'count', 'duration', 'db_queries', 'db_time', 'phases', 'statuses')
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.duration = 0.0
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.phases = {}
+        self.statuses = {}
+
+
+class Registry:
+    """Per-process aggregates keyed by (route, method)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+
+    def observe(self, route, method, status_code, duration, metrics):
+        with self.lock:
+            stats = self.routes.get((route, method))
+            if stats is None:
+                stats = self.routes[(route, method)] = RouteStats()
+            for i, bound in enumerate(BUCKETS):
+                if duration <= bound:
+                    stats.buckets[i] += 1
+            stats.count += 1
+            stats.duration += duration
+            stats.db_queries += metrics.db_queries
+            stats.db_time += metrics.db_time
+            for name, elapsed in metrics.phases.items():
+                stats.phases[name] = stats.phases.get(name, 0.0) + elapsed
+            stats.statuses[status_code] = stats.statuses.get(status_code, 0) + 1
+
+    def render(self):
+        """The aggregates in the Prometheus text exposition format."""
+        with self.lock:
+            routes = sorted(self.routes.items())
+            lines = [
+                '# HELP remonal_request_duration_seconds Time from the request entering Django to the response leaving it.',
+                '# TYPE remonal_request_duration_seconds histogram',
+            ]
+            for (route, method), stats in routes:
+                labels = f'route="{_escape(route)}",method="{method}"'
+                for bound, count in zip(BUCKETS, stats.buckets):
+                    lines.append(f'remonal_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'remonal_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats.count}')
+                lines.append(f'remonal_request_duration_seconds_sum{{{labels}}} {stats.duration:.6f}')
+                lines.append(f'remonal_request_duration_seconds_count{{{labels}}} {stats.count}')
+
+            lines += [
+                '# HELP remonal_requests_total Requests by route, method and response status.',
+                '# TYPE remonal_requests_total counter',
+            ]
+            for (route, method), stats in routes:
+                for status_code, count in sorted(stats.statuses.items()):
+                    lines.append(
+                        f'remonal_requests_total{{route="{_escape(route)}",method="{method}",'
+                        f'status="{status_code}"}} {count}'
+                    )
+
+            lines += [
+                '# HELP remonal_request_db_queries_total Database queries run by requests.',
+                '# TYPE remonal_request_db_queries_total counter',
+            ]
+            for (route, method), stats in routes:
+                lines.append(f'remonal_request_db_queries_total{{route="{_escape(route)}",method="{method}"}} '
+                             f'{stats.db_queries}')
+
+            lines += [
+                '# HELP remonal_request_phase_seconds_total Time spent per phase: db, serialize, auth.',
+                '# TYPE remonal_request_phase_seconds_total counter',
+            ]
+            for (route, method), stats in routes:
+                labels = f'route="{_escape(route)}",method="{method}"'
+                lines.append(f'remonal_request_phase_seconds_total{{{labels},phase="db"}} {stats.db_time:.6f}')
+                for name, elapsed in sorted(stats.phases.items()):
+                    lines.append(f'remonal_request_phase_seconds_total{{{labels},phase="{name}"}} {elapsed:.6f}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = Registry()
+
+
+def route_of(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.route if match is not None else 'unmatched'
+
+
+def logged_path(request):
+    """The request path for logs, without the token that /api/events accepts as a query parameter."""
+    if 'token' not in request.GET:
+        return request.get_full_path()
+    query = request.GET.copy()
+    query['token'] = 'redacted'
+    return f'{request.path}?{query.urlencode(safe="")}'
+
+
+def server_timing(metrics, total):
+    entries = [f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.db_queries} queries"']
+    for name, elapsed in metrics.phases.items():
+        entries.append(f'{name};dur={elapsed * 1000:.1f}')
+    entries.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(entries)
+
+
+class RequestTimingMiddleware:
+    """
+    Measures each request and reports it through Server-Timing, the slow
+    request log and the per-route registry. Goes first in MIDDLEWARE so the
+    total covers every other middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - metrics.started
+
+        route = route_of(request)
+        registry.observe(route, request.method, response.status_code, total, metrics)
+        if getattr(settings, 'SERVER_TIMING', True):
+            response['Server-Timing'] = server_timing(metrics, total)
+        if total * 1000 >= getattr(settings, 'SLOW_REQUEST_MS', 1000):
+            logger.warning(
+                'Slow request (%.1f ms): %s %s -> %s, route %s, %s queries in %.1f ms, %s',
+                total * 1000, request.method, logged_path(request), response.status_code, route,
+                metrics.db_queries, metrics.db_time * 1000,
+                ', '.join(f'{name} {elapsed * 1000:.1f} ms' for name, elapsed in metrics.phases.items()) or 'no phases',
+            )
+        return response
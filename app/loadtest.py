@@ -0,0 +1,186 @@
+"""
+Synthetic dataset and in-process load driver for the `loadtest` command.
+
+Requests go through django.test.Client, so they pass through the full
+middleware and view stack without a network hop; results measure the
+application and database, not the server in front of them.
+"""
+import random
+import statistics
+import threading
+import time
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.db import close_old_connections, connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import User, Reminder, Task, Note, Tag, NoteTag
+from .response_cache import RESPONSE_CACHE
+
+WORDS = (
+    'alpha bravo budget call client dentist draft email family focus garden gym invoice '
+    'launch meeting notes plan project read report review schedule shopping sprint travel'
+).split()
+BULK_BATCH = 2000
+
+
+def _text(rng, count):
+    return ' '.join(rng.choices(WORDS, k=count))
+
+
+def _bulk(model, rows):
+    for start in range(0, len(rows), BULK_BATCH):
+        model.objects.bulk_create(rows[start:start + BULK_BATCH])
+
+
+def seed(users=10, reminders=100, tasks=100, notes=100, tags=10, seed_value=0):
+    """
+    Create `users` users, each with the given number of reminders, tasks,
+    notes and tags, using bulk inserts. Every note gets up to three tags and
+    a tenth of the tasks are subtasks. Returns the ids the scenarios need.
+    """
+    rng = random.Random(seed_value)
+    now = timezone.now()
+    with transaction.atomic():
+        first_user = (User.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+        _bulk(User, [
+            User(name=f'Load {i}', email=f'load{first_user + i}@example.com', password_hash='!')
+            for i in range(users)
+        ])
+        user_ids = list(User.objects.filter(id__gte=first_user).values_list('id', flat=True))
+
+        _bulk(Reminder, [
+            Reminder(user_id=user_id, title=_text(rng, 3), description=_text(rng, 12),
+                     reminder_date=now + timedelta(minutes=rng.randint(-30 * 24 * 60, 30 * 24 * 60)),
+                     category=rng.choice(Reminder.CATEGORY_CHOICES)[0])
+            for user_id in user_ids for _ in range(reminders)
+        ])
+        _bulk(Task, [
+            Task(user_id=user_id, title=_text(rng, 3), description=_text(rng, 12), order_index=i + 1,
+                 priority=rng.choice(Task.PRIORITY_CHOICES)[0], status=rng.choice(Task.STATUS_CHOICES)[0])
+            for user_id in user_ids for i in range(tasks)
+        ])
+        for user_id in user_ids:
+            task_ids = list(Task.objects.filter(user_id=user_id).values_list('id', flat=True))
+            subtasks = task_ids[len(task_ids) * 9 // 10:]
+            if subtasks and len(task_ids) > len(subtasks):
+                Task.objects.filter(id__in=subtasks).update(parent_task_id=task_ids[0])
+
+        note_rows = [
+            Note(user_id=user_id, title=_text(rng, 4), body=_text(rng, rng.randint(40, 200)))
+            for user_id in user_ids for _ in range(notes)
+        ]
+        for note in note_rows:
+            note.update_preview()
+        _bulk(Note, note_rows)
+        _bulk(Tag, [Tag(user_id=user_id, name=f'tag{i}') for user_id in user_ids for i in range(tags)])
+        tag_ids = {}
+        for tag_id, user_id in Tag.objects.filter(user_id__in=user_ids).values_list('id', 'user_id'):
+            tag_ids.setdefault(user_id, []).append(tag_id)
+        note_ids = {}
+        for note_id, user_id in Note.objects.filter(user_id__in=user_ids).values_list('id', 'user_id'):
+            note_ids.setdefault(user_id, []).append(note_id)
+        _bulk(NoteTag, [
+            NoteTag(note_id=note_id, tag_id=tag_id)
+            for user_id, ids in note_ids.items() if tag_ids.get(user_id)
+            for note_id in ids
+            for tag_id in rng.sample(tag_ids[user_id], min(len(tag_ids[user_id]), rng.randint(0, 3)))
+        ])
+    return {'user_ids': user_ids, 'note_ids': note_ids}
+
+
+# Each scenario maps (client, rng, dataset) to a response.
+def _user(rng, dataset):
+    return rng.choice(dataset['user_ids'])
+
+
+def _note(rng, dataset):
+    return rng.choice(dataset['note_ids'][_user(rng, dataset)])
+
+
+SCENARIOS = {
+    'reminder_list': lambda c, rng, d: c.get('/api/reminders', {'user_id': _user(rng, d), 'limit': 50}),
+    'task_list': lambda c, rng, d: c.get('/api/tasks', {'user_id': _user(rng, d), 'limit': 50}),
+    'task_tree': lambda c, rng, d: c.get('/api/tasks/tree', {'user_id': _user(rng, d)}),
+    'note_list': lambda c, rng, d: c.get('/api/notes', {'user_id': _user(rng, d), 'limit': 50}),
+    'note_detail': lambda c, rng, d: c.get(f'/api/notes/{_note(rng, d)}'),
+    'note_detail_patch': lambda c, rng, d: c.patch(
+        f'/api/notes/{_note(rng, d)}', {'title': _text(rng, 4)}, content_type='application/json'),
+    'search_notes': lambda c, rng, d: c.get('/api/notes/search', {'user_id': _user(rng, d), 'q': rng.choice(WORDS)}),
+    'dashboard': lambda c, rng, d: c.get('/api/dashboard', {'user_id': _user(rng, d)}),
+    'reminder_create': lambda c, rng, d: c.post('/api/reminders', {
+        'user_id': _user(rng, d), 'title': _text(rng, 3),
+        'reminder_date': (timezone.now() + timedelta(days=1)).isoformat(),
+    }, content_type='application/json'),
+}
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))] if samples else None
+
+
+def run_scenario(name, dataset, requests=200, concurrency=4, warmup=10, cold_cache=False, seed_value=0):
+    """
+    Send `requests` requests for one scenario from `concurrency` threads and
+    summarise latency, throughput and queries per request.
+
+    With `cold_cache` the response cache is cleared before every request, so
+    list endpoints are measured on the database path rather than cache hits.
+    """
+    scenario = SCENARIOS[name]
+    remaining = [requests]
+    lock = threading.Lock()
+    latencies, queries, errors = [], [], []
+
+    def worker(index):
+        client = Client()
+        rng = random.Random(f'{seed_value}-{name}-{index}')
+        for _ in range(warmup // concurrency):
+            scenario(client, rng, dataset)
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+            if cold_cache:
+                caches[RESPONSE_CACHE].clear()
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = scenario(client, rng, dataset)
+                elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+                queries.append(len(captured))
+                if response.status_code >= 400:
+                    errors.append(response.status_code)
+        close_old_connections()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'throughput_rps': round(len(latencies) / wall, 1) if wall else None,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50), 2),
+            'p90': round(percentile(latencies, 0.90), 2),
+            'p99': round(percentile(latencies, 0.99), 2),
+            'max': round(latencies[-1], 2),
+            'mean': round(statistics.mean(latencies), 2),
+        } if latencies else None,
+        'queries_per_request': {
+            'mean': round(statistics.mean(queries), 2),
+            'max': max(queries),
+        } if queries else None,
+    }
@@ -0,0 +1,222 @@
+"""
+Email delivery for the `email` notification channel.
+
+The notifications in each claimed batch are grouped by user, and each
+user gets one digest message covering all of theirs. Digests go out over
+SMTP connections that stay open between batches in a small pool, so a
+busy worker pays for the TCP, TLS and AUTH handshakes once per connection
+rather than once per message. A batch is split into runs of at most
+EMAIL_BATCH_SIZE messages, sent in parallel on up to EMAIL_POOL_SIZE
+connections.
+
+A message the server refuses fails the notifications it covers, and the
+notifier retries them with backoff. A connection that turns out to be
+dead, usually one the server closed while it sat idle, is replaced and
+the message is tried once more on the new one.
+
+The connections come from Django's EMAIL_BACKEND, so the console or
+locmem backends work for development, and any local SMTP server works as
+a stand-in for the real one (see benchmarks/email_digest.py).
+"""
+import logging
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+from .models import User
+from .notifier import BaseBackend
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _zone(name):
+    try:
+        return ZoneInfo(name)
+    except (ValueError, KeyError):
+        return ZoneInfo('UTC')
+
+
+def build_digests(notifications):
+    """One EmailMessage per user covering their notifications, as (message, notification ids) pairs."""
+    by_user = {}
+    for notification in sorted(notifications, key=lambda n: (n.notify_at, n.id)):
+        by_user.setdefault(notification.user_id, []).append(notification)
+    users = User.objects.filter(id__in=by_user).values('id', 'name', 'email', 'timezone')
+    users = {user['id']: user for user in users}
+
+    digests = []
+    for user_id, batch in by_user.items():
+        user = users.get(user_id)
+        if user is None:
+            continue
+        zone = _zone(user['timezone'])
+        lines = []
+        for notification in batch:
+            reminder = notification.reminder
+            when = notification.notify_at.astimezone(zone).strftime('%a %d %b %Y, %H:%M')
+            lines.append(f'- {reminder.title} ({reminder.get_category_display()}), {when}' if reminder
+                         else f'- Reminder at {when}')
+        if len(batch) == 1 and batch[0].reminder:
+            subject = f'Reminder: {batch[0].reminder.title}'
+        else:
+            subject = f'{len(batch)} reminders due'
+        body = '\n'.join([f'Hi {user["name"]},', '', 'Due now:', '', *lines, ''])
+        message = EmailMessage(subject, body, _setting('DEFAULT_FROM_EMAIL', None), [user['email']])
+        digests.append((message, [n.id for n in batch]))
+    return digests
+
+
+class PooledConnection:
+    __slots__ = ('backend', 'sent', 'last_used')
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+    def close(self):
+        try:
+            self.backend.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Open connections kept between batches. Servers drop idle connections
+    and cap messages per connection, so a connection idle for longer than
+    `idle_seconds` or used for `max_messages` messages is closed instead
+    of reused. Concurrency is bounded by the caller, not here.
+    """
+
+    def __init__(self, max_messages, idle_seconds, factory=get_connection):
+        self.max_messages = max_messages
+        self.idle_seconds = idle_seconds
+        self.factory = factory
+        self.idle = []
+        self.lock = threading.Lock()
+        self.opened = 0
+
+    def acquire(self):
+        now = time.monotonic()
+        stale = []
+        with self.lock:
+            while self.idle:
+                connection = self.idle.pop()
+                if now - connection.last_used < self.idle_seconds:
+                    break
+                stale.append(connection)
+            else:
+                connection = None
+        for old in stale:
+            old.close()
+        if connection is None:
+            connection = PooledConnection(self.factory(fail_silently=False))
+            try:
+                connection.backend.open()
+            except Exception:
+                # Login or STARTTLS may fail after the socket is open
+                connection.close()
+                raise
+            with self.lock:
+                self.opened += 1
+        return connection
+
+    def release(self, connection, broken=False):
+        if broken or connection.sent >= self.max_messages:
+            connection.close()
+            return
+        connection.last_used = time.monotonic()
+        with self.lock:
+            self.idle.append(connection)
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for connection in idle:
+            connection.close()
+
+
+class EmailDigestBackend(BaseBackend):
+    """Sends each user's email notifications in a batch as one digest message."""
+
+    def __init__(self, channel):
+        super().__init__(channel)
+        self.pool_size = _setting('EMAIL_POOL_SIZE', 4)
+        self.batch_size = _setting('EMAIL_BATCH_SIZE', 50)
+        self.pool = ConnectionPool(
+            max_messages=_setting('EMAIL_MAX_MESSAGES_PER_CONNECTION', 100),
+            idle_seconds=_setting('EMAIL_POOL_IDLE_SECONDS', 60),
+        )
+        self.executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix='email')
+
+    def send(self, notifications):
+        started = time.perf_counter()
+        digests = build_digests(notifications)
+        delivered = {notification_id for _, ids in digests for notification_id in ids}
+        # Notifications whose user no longer exists
+        failed = {n.id for n in notifications} - delivered
+
+        # Spread the batch over the pool, in runs of at most batch_size messages
+        size = max(1, min(self.batch_size, -(-len(digests) // self.pool_size)))
+        runs = [digests[i:i + size] for i in range(0, len(digests), size)]
+        for run_failed in self.executor.map(self.send_run, runs):
+            failed |= run_failed
+
+        elapsed = time.perf_counter() - started
+        logger.info('Sent %s email digests for %s notifications in %.2fs (%.1f messages/s); %s notifications failed',
+                    len(digests), len(notifications), elapsed, len(digests) / elapsed if elapsed else 0.0,
+                    len(failed))
+        return failed
+
+    def send_run(self, digests):
+        """Send (message, notification ids) pairs over one pooled connection; returns the ids that failed."""
+        failed = set()
+        connection = None
+        for position, (message, ids) in enumerate(digests):
+            for attempt in (1, 2):
+                if connection is None:
+                    try:
+                        connection = self.pool.acquire()
+                    except OSError as e:
+                        logger.warning('Could not connect to the mail server: %s', e)
+                        failed.update(i for _, rest in digests[position:] for i in rest)
+                        return failed
+                try:
+                    if not connection.backend.send_messages([message]):
+                        failed.update(ids)
+                    connection.sent += 1
+                    if connection.sent >= self.pool.max_messages:
+                        self.pool.release(connection)
+                        connection = None
+                    break
+                except smtplib.SMTPServerDisconnected:
+                    error = 'disconnected'
+                except smtplib.SMTPException as e:
+                    # Refused by the server; the connection is still usable
+                    logger.warning('Email to %s refused: %s', message.to[0], e)
+                    failed.update(ids)
+                    break
+                except OSError as e:
+                    error = e
+                self.pool.release(connection, broken=True)
+                connection = None
+                if attempt == 2:
+                    logger.warning('Email to %s failed: %s', message.to[0], error)
+                    failed.update(ids)
+        if connection is not None:
+            self.pool.release(connection)
+        return failed
+
+    def close(self):
+        self.executor.shutdown()
+        self.pool.close()
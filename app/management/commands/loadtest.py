@@ -0,0 +1,123 @@
+import json
+import os
+import platform
+import shutil
+import tempfile
+
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment
+
+from app import loadtest
+
+
+def isolated_caches(cache_dir):
+    """
+    settings.CACHES with every cache replaced by an empty one for this run:
+    file-based caches in their own directory under `cache_dir`, which keeps
+    their cost in the numbers, and any other backend in process memory.
+    """
+    isolated = {}
+    for alias, config in settings.CACHES.items():
+        if config['BACKEND'] == 'django.core.cache.backends.filebased.FileBasedCache':
+            isolated[alias] = {**config, 'LOCATION': os.path.join(cache_dir, alias)}
+        else:
+            options = {key: value for key, value in config.get('OPTIONS', {}).items()
+                       if key in ('MAX_ENTRIES', 'CULL_FREQUENCY')}
+            isolated[alias] = {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': f'loadtest-{alias}-{os.path.basename(cache_dir)}',
+                'TIMEOUT': config.get('TIMEOUT', 300),
+                'OPTIONS': options,
+            }
+    return isolated
+
+
+class Command(BaseCommand):
+    help = ('Seed a synthetic dataset into a throwaway database, drive API endpoints in-process '
+            'and report latency percentiles, throughput and queries per request as JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--reminders', type=int, default=200, help='Reminders per user.')
+        parser.add_argument('--tasks', type=int, default=200, help='Tasks per user.')
+        parser.add_argument('--notes', type=int, default=200, help='Notes per user.')
+        parser.add_argument('--tags', type=int, default=10, help='Tags per user.')
+        parser.add_argument('--endpoints', default=','.join(loadtest.SCENARIOS),
+                            help='Comma-separated scenarios to run.')
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per endpoint.')
+        parser.add_argument('--concurrency', type=int, default=4, help='Client threads per endpoint.')
+        parser.add_argument('--warmup', type=int, default=20, help='Unmeasured requests per endpoint.')
+        parser.add_argument('--cold-cache', action='store_true',
+                            help='Clear the response cache before every request.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the dataset and requests.')
+        parser.add_argument('--db', help='SQLite file to create and keep, instead of a temporary one. '
+                                         'Must not exist yet.')
+        parser.add_argument('--output', help='Also write the JSON report to this file.')
+
+    def handle(self, *args, **options):
+        endpoints = [name.strip() for name in options['endpoints'].split(',') if name.strip()]
+        unknown = set(endpoints) - set(loadtest.SCENARIOS)
+        if unknown:
+            raise CommandError(f'Unknown endpoints: {", ".join(sorted(unknown))}. '
+                               f'Choose from: {", ".join(loadtest.SCENARIOS)}')
+        if min(options['users'], options['notes'], options['requests'], options['concurrency']) < 1:
+            raise CommandError('--users, --notes, --requests and --concurrency must be at least 1')
+        if 'sqlite' not in settings.DATABASES['default']['ENGINE']:
+            raise CommandError('The load test needs an SQLite database backend')
+        if options['db'] and os.path.exists(options['db']):
+            raise CommandError(f'{options["db"]} already exists; the load test only runs on a fresh database')
+
+        # Never touch the configured database: point the default connection
+        # at a new SQLite file before anything opens it.
+        workdir = None if options['db'] else tempfile.mkdtemp(prefix='loadtest-')
+        db_file = options['db'] or os.path.join(workdir, 'db.sqlite3')
+        connection.close()
+        settings.DATABASES['default']['NAME'] = db_file
+        setup_test_environment()
+        # Nor the configured caches: seeded user ids overlap real ones, so
+        # shared entries would be served to real users, and would warm the run.
+        cache_dir = tempfile.mkdtemp(prefix='loadtest-cache-')
+        run_caches = override_settings(CACHES=isolated_caches(cache_dir))
+        run_caches.enable()
+
+        try:
+            call_command('migrate', verbosity=0)
+            dataset = loadtest.seed(
+                users=options['users'], reminders=options['reminders'], tasks=options['tasks'],
+                notes=options['notes'], tags=options['tags'], seed_value=options['seed'],
+            )
+            report = {
+                'environment': {
+                    'python': platform.python_version(),
+                    'django': django.get_version(),
+                    'db_profile': getattr(settings, 'DB_PROFILE', None),
+                    'write_coalescing': getattr(settings, 'SQLITE_WRITE_COALESCING', False),
+                    'cpus': os.cpu_count(),
+                },
+                'parameters': {key: options[key] for key in (
+                    'users', 'reminders', 'tasks', 'notes', 'tags', 'requests', 'concurrency',
+                    'warmup', 'cold_cache', 'seed',
+                )},
+                'endpoints': {},
+            }
+            for name in endpoints:
+                report['endpoints'][name] = loadtest.run_scenario(
+                    name, dataset, requests=options['requests'], concurrency=options['concurrency'],
+                    warmup=options['warmup'], cold_cache=options['cold_cache'], seed_value=options['seed'],
+                )
+        finally:
+            connection.close()
+            run_caches.disable()
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            if workdir:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        self.stdout.write(output)
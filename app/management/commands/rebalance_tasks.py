@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from app.ordering import REBALANCE_GAP, rebalance, users_needing_rebalance
+
+
+class Command(BaseCommand):
+    help = "Renumber the task order of users whose order_index gaps have become too small."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--gap', type=float, default=REBALANCE_GAP,
+                            help='Rebalance lists with any neighbour gap below this.')
+
+    def handle(self, *args, **options):
+        users = list(users_needing_rebalance(options['gap']))
+        rows = sum(rebalance(user_id) for user_id in users)
+        self.stdout.write(f'Rebalanced {len(users)} task lists ({rows} rows).')
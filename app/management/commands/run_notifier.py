@@ -0,0 +1,62 @@
+import json
+import signal
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from app import notifier
+
+
+class Command(BaseCommand):
+    help = 'Create Notification rows for due reminders and dispatch them through their channel backends.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Notifications claimed per batch.')
+        parser.add_argument('--max-sleep', type=float, default=30.0,
+                            help='Longest idle sleep in seconds; bounds how late a newly created reminder can fire.')
+        parser.add_argument('--lease', type=float, default=300.0,
+                            help='Seconds after which a claim held by a dead worker is released.')
+        parser.add_argument('--report-every', type=float, default=60.0, help='Seconds between metrics reports.')
+        parser.add_argument('--once', action='store_true', help='Run a single pass and exit.')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        lease = timedelta(seconds=options['lease'])
+        metrics = notifier.Metrics()
+        last_report = time.monotonic()
+
+        try:
+            while not self.stopping:
+                close_old_connections()
+                notifier.run_once(batch_size=options['batch_size'], lease=lease, metrics=metrics)
+
+                if options['once'] or time.monotonic() - last_report >= options['report_every']:
+                    self.stdout.write(json.dumps(metrics.report()))
+                    last_report = time.monotonic()
+                if options['once']:
+                    break
+
+                self.sleep_until_due(options['max_sleep'])
+        finally:
+            # Say QUIT on pooled SMTP connections
+            notifier.close_backends()
+
+    def sleep_until_due(self, max_sleep):
+        # Sleep until the next notification or reminder is due instead of
+        # polling, waking at least every max_sleep seconds to notice rows
+        # created in the meantime.
+        now = timezone.now()
+        due = notifier.next_due(now)
+        delay = max_sleep if due is None else min(max(0.0, (due - now).total_seconds()), max_sleep)
+        deadline = time.monotonic() + delay
+        while not self.stopping and time.monotonic() < deadline:
+            time.sleep(min(1.0, deadline - time.monotonic()))
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.8 on 2026-10-18 08:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['user', 'created_at'], name='app_note_user_id_1cb08f_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.8 on 2026-10-18 08:35
+
+from django.db import migrations
+from django.db.models import Min
+
+
+def remove_duplicate_note_tags(apps, schema_editor):
+    NoteTag = apps.get_model('app', 'NoteTag')
+    keep = NoteTag.objects.values('note', 'tag').annotate(keep_id=Min('id')).values('keep_id')
+    NoteTag.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_note_user_created_at_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_note_tags, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='notetag',
+            unique_together={('note', 'tag')},
+        ),
+    ]
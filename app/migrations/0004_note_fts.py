@@ -0,0 +1,27 @@
+from django.db import migrations
+
+from app.search import FTS_TABLE, POPULATE_FTS, install_fts
+
+
+def create_note_fts(apps, schema_editor):
+    if install_fts(schema_editor):
+        schema_editor.execute(POPULATE_FTS)
+
+
+def drop_note_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for suffix in ('ai', 'ad', 'au'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_notetag_unique_note_tag'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_note_fts, drop_note_fts),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.8 on 2026-10-18 08:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_sync_tombstones'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='task',
+            name='order_index',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'order_index'], name='app_task_user_id_c51704_idx'),
+        ),
+    ]
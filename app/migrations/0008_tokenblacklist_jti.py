@@ -0,0 +1,88 @@
+import datetime
+import hashlib
+
+import jwt
+from django.db import migrations, models
+from django.db.migrations.exceptions import IrreversibleError
+
+
+def digest_tokens(apps, schema_editor):
+    """
+    Replace stored raw tokens with the digest used as their revocation key,
+    and record when each would have expired so it can be pruned.
+    Tokens issued before this change carry no jti claim.
+    """
+    TokenBlacklist = apps.get_model('app', 'TokenBlacklist')
+    seen = set()
+    for row in TokenBlacklist.objects.order_by('id').iterator():
+        jti = hashlib.sha256(row.token.encode()).hexdigest()
+        if jti in seen:
+            row.delete()
+            continue
+        seen.add(jti)
+        try:
+            exp = jwt.decode(row.token, options={'verify_signature': False})['exp']
+            expires_at = datetime.datetime.fromtimestamp(exp, tz=datetime.timezone.utc)
+        except (jwt.InvalidTokenError, KeyError, TypeError, ValueError, OverflowError):
+            expires_at = row.created_at + datetime.timedelta(days=7)
+        row.jti = jti
+        row.expires_at = expires_at
+        row.save(update_fields=['jti', 'expires_at'])
+
+
+def refuse_with_revocations(apps, schema_editor):
+    """
+    Only digests are kept, so the raw tokens the old `token` column held
+    cannot be restored. Unapplying is refused rather than failing half way
+    on the NOT NULL column; with the rows deleted it can go ahead, but the
+    tokens they revoked are then accepted again until they expire.
+    """
+    TokenBlacklist = apps.get_model('app', 'TokenBlacklist')
+    if TokenBlacklist.objects.exists():
+        raise IrreversibleError(
+            'Revoked tokens are stored as digests and cannot be turned back into raw tokens. '
+            'Delete the TokenBlacklist rows to unapply app.0008 (the tokens they revoke become valid '
+            'again until they expire).'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_task_fractional_order'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tokenblacklist',
+            name='jti',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='tokenblacklist',
+            name='expires_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(digest_tokens, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='tokenblacklist',
+            name='token',
+        ),
+        migrations.AlterField(
+            model_name='tokenblacklist',
+            name='jti',
+            field=models.CharField(max_length=64, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='tokenblacklist',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='tokenblacklist',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        # Last, so that it runs first when unapplying
+        migrations.RunPython(migrations.RunPython.noop, refuse_with_revocations),
+    ]
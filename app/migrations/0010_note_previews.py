@@ -0,0 +1,55 @@
+# Generated by Django 4.2.8 on 2026-10-18 09:22
+
+from django.db import migrations, models
+
+from app.previews import note_preview
+from app.search import install_fts
+
+PREVIEW_BATCH = 500
+
+
+def reinstall_fts_triggers(apps, schema_editor):
+    # Adding or removing a column remakes app_note on SQLite, dropping the
+    # FTS triggers with the old table; the index itself is untouched.
+    install_fts(schema_editor)
+
+
+def fill_note_previews(apps, schema_editor):
+    Note = apps.get_model('app', 'Note')
+    batch = []
+    for note in Note.objects.only('id', 'body').iterator(chunk_size=PREVIEW_BATCH):
+        note.excerpt, note.word_count, note.body_size = note_preview(note.body)
+        batch.append(note)
+        if len(batch) >= PREVIEW_BATCH:
+            Note.objects.bulk_update(batch, ['excerpt', 'word_count', 'body_size'])
+            batch = []
+    if batch:
+        Note.objects.bulk_update(batch, ['excerpt', 'word_count', 'body_size'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_attachment_blobs'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, reinstall_fts_triggers),
+        migrations.AddField(
+            model_name='note',
+            name='body_size',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='excerpt',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_note_previews, migrations.RunPython.noop),
+        migrations.RunPython(reinstall_fts_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.8 on 2026-10-18 09:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from app.search import install_fts
+
+
+def reinstall_fts_triggers(apps, schema_editor):
+    # Adding or removing Note.revision remakes app_note on SQLite, dropping
+    # the FTS triggers with the old table.
+    install_fts(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_note_previews'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, reinstall_fts_triggers),
+        migrations.AddField(
+            model_name='note',
+            name='revision',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(reinstall_fts_triggers, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='NoteRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revision', models.PositiveIntegerField()),
+                ('kind', models.CharField(choices=[('delta', 'Delta'), ('snapshot', 'Snapshot')], max_length=10)),
+                ('data', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('note', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='app.note')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='noterevision',
+            constraint=models.UniqueConstraint(fields=('note', 'revision'), name='unique_note_revision'),
+        ),
+    ]
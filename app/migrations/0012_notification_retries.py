@@ -0,0 +1,23 @@
+# Generated by Django 4.2.8 on 2026-10-18 09:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_note_revisions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='retry_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.8 on 2026-10-18 09:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_notification_retries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadsession',
+            name='writer',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='uploadsession',
+            name='writer_seen',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
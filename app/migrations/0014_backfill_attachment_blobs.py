@@ -0,0 +1,57 @@
+import hashlib
+import os
+import shutil
+
+from django.core.files.storage import default_storage
+from django.db import migrations, transaction
+from django.db.models import F
+
+
+def backfill_blobs(apps, schema_editor):
+    """
+    Move attachments saved before the blob store (attachments/<name>, no
+    blob) into it, so they dedupe, get ETags and are refcounted like new
+    ones. Files are copied and the originals removed only after commit, so
+    a failed migration leaves every attachment pointing at a real file.
+    Attachments whose file is missing are left as they are.
+    """
+    Attachment = apps.get_model('app', 'Attachment')
+    Blob = apps.get_model('app', 'Blob')
+    moved = []
+    for attachment in Attachment.objects.filter(blob__isnull=True).exclude(file='').iterator():
+        path = default_storage.path(attachment.file.name)
+        if not os.path.isfile(path):
+            continue
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        sha256 = digest.hexdigest()
+        name = f'blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}'
+        blob, _ = Blob.objects.get_or_create(sha256=sha256, defaults={'size': os.path.getsize(path)})
+        target = default_storage.path(name)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(path, target)
+        Blob.objects.filter(id=blob.id).update(ref_count=F('ref_count') + 1)
+        Attachment.objects.filter(id=attachment.id).update(blob=blob, file=name)
+        moved.append(path)
+
+    def remove_originals():
+        for path in moved:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    transaction.on_commit(remove_originals)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_upload_writer_lease'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_blobs, migrations.RunPython.noop),
+    ]
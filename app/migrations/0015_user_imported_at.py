@@ -0,0 +1,18 @@
+# Generated by Django 4.2.8 on 2026-10-18 09:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_backfill_attachment_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='imported_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+from app.search import FTS_TABLE, POPULATE_FTS, install_fts
+
+
+def rebuild_note_fts(apps, schema_editor):
+    # The index used to be external content over app_note, so it held the
+    # editor's HTML; rebuild it over the notes' plain text.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for suffix in ('ai', 'ad', 'au'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    if install_fts(schema_editor):
+        schema_editor.execute(POPULATE_FTS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0015_user_imported_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_note_fts, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,9 @@
 from django.db import models
 from django.utils import timezone
 import hashlib
+import uuid
+
+from .previews import note_preview
 
 class User(models.Model):
     name = models.CharField(max_length=100)
@@ -8,6 +11,9 @@ class User(models.Model):
     password_hash = models.CharField(max_length=255)
     timezone = models.CharField(max_length=50, default='UTC')
     dark_mode = models.BooleanField(default=False)
+    # Imported rows keep their exported timestamps, so delta sync tokens
+    # older than the last import must fall back to a full sync
+    imported_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -43,6 +49,8 @@ class Reminder(models.Model):
         indexes = [
             models.Index(fields=['user', 'reminder_date']),
             models.Index(fields=['user', 'status']),
+            models.Index(fields=['status', 'reminder_date']),
+            models.Index(fields=['user', 'updated_at']),
         ]
 
 class Task(models.Model):
@@ -64,7 +72,7 @@ class Task(models.Model):
     priority = models.CharField(max_length=20, choices=PRIORITY_CHOICES, default='medium')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='todo')
     parent_task = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='subtasks')
-    order_index = models.IntegerField(default=0)
+    order_index = models.FloatField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -72,6 +80,8 @@ class Task(models.Model):
         indexes = [
             models.Index(fields=['user', 'status']),
             models.Index(fields=['user', 'due_date']),
+            models.Index(fields=['user', 'updated_at']),
+            models.Index(fields=['user', 'order_index']),
         ]
         ordering = ['order_index']
 
@@ -79,17 +89,40 @@ class Note(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notes')
     title = models.CharField(max_length=255)
     body = models.TextField()
+    # Derived from body on save; see update_preview().
+    excerpt = models.CharField(max_length=255, blank=True)
+    word_count = models.PositiveIntegerField(default=0)
+    body_size = models.PositiveIntegerField(default=0)
+    # Bumped on every body change; see app/revisions.py
+    revision = models.PositiveIntegerField(default=0)
     is_pinned = models.BooleanField(default=False)
     is_archived = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    PREVIEW_FIELDS = ('excerpt', 'word_count', 'body_size')
+
     class Meta:
         indexes = [
             models.Index(fields=['user', 'is_pinned']),
             models.Index(fields=['user', 'is_archived']),
+            models.Index(fields=['user', 'created_at']),
+            models.Index(fields=['user', 'updated_at']),
         ]
 
+    def update_preview(self):
+        """Recompute the stored preview from body. bulk_create and bulk_update skip save(), so call this first."""
+        self.excerpt, self.word_count, self.body_size = note_preview(self.body)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'body' in update_fields:
+            if 'body' not in self.get_deferred_fields():
+                self.update_preview()
+                if update_fields is not None:
+                    kwargs['update_fields'] = {*update_fields, *self.PREVIEW_FIELDS}
+        super().save(*args, **kwargs)
+
 class Tag(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tags')
     name = models.CharField(max_length=100)
@@ -101,6 +134,34 @@ class NoteTag(models.Model):
     note = models.ForeignKey(Note, on_delete=models.CASCADE, related_name='tags')
     tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
 
+    class Meta:
+        unique_together = ['note', 'tag']
+
+class NoteRevision(models.Model):
+    """One revision of a note body: the patch from the previous revision, or the whole body."""
+    KIND_CHOICES = [
+        ('delta', 'Delta'),
+        ('snapshot', 'Snapshot'),
+    ]
+
+    note = models.ForeignKey(Note, on_delete=models.CASCADE, related_name='revisions')
+    revision = models.PositiveIntegerField()
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    data = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['note', 'revision'], name='unique_note_revision'),
+        ]
+
+class Blob(models.Model):
+    """Stored file content, shared by every attachment with the same bytes."""
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
 class Attachment(models.Model):
     OWNER_TYPES = [
         ('note', 'Note'),
@@ -110,10 +171,27 @@ class Attachment(models.Model):
     owner_type = models.CharField(max_length=20, choices=OWNER_TYPES)
     owner_id = models.IntegerField()
     file = models.FileField(upload_to='attachments/')
+    blob = models.ForeignKey(Blob, null=True, blank=True, on_delete=models.PROTECT, related_name='attachments')
+    filename = models.CharField(max_length=255, blank=True)
     mime_type = models.CharField(max_length=100)
-    size = models.IntegerField()
+    size = models.BigIntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+class UploadSession(models.Model):
+    """An attachment upload in progress, sent in chunks and resumable from `received`."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner_type = models.CharField(max_length=20, choices=Attachment.OWNER_TYPES)
+    owner_id = models.IntegerField()
+    filename = models.CharField(max_length=255, blank=True)
+    mime_type = models.CharField(max_length=100)
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    # The request currently writing a chunk, and when it last confirmed it
+    writer = models.CharField(max_length=32, blank=True)
+    writer_seen = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
 class Notification(models.Model):
     CHANNEL_CHOICES = [
         ('web', 'Web'),
@@ -122,6 +200,7 @@ class Notification(models.Model):
     ]
     STATUS_CHOICES = [
         ('pending', 'Pending'),
+        ('sending', 'Sending'),
         ('sent', 'Sent'),
         ('failed', 'Failed'),
     ]
@@ -131,15 +210,43 @@ class Notification(models.Model):
     notify_at = models.DateTimeField()
     channel = models.CharField(max_length=20, choices=CHANNEL_CHOICES, default='web')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    claimed_by = models.CharField(max_length=64, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    # Delivery attempts so far; a failed attempt is retried at retry_at
+    attempts = models.PositiveSmallIntegerField(default=0)
+    retry_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         indexes = [
             models.Index(fields=['user', 'notify_at']),
             models.Index(fields=['status']),
+            models.Index(fields=['status', 'notify_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['reminder', 'channel', 'notify_at'], name='unique_reminder_notification'),
+        ]
+
+class Tombstone(models.Model):
+    MODEL_CHOICES = [
+        ('reminder', 'Reminder'),
+        ('task', 'Task'),
+        ('note', 'Note'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tombstones')
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at']),
         ]
 
 class TokenBlacklist(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    token = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    jti = models.CharField(max_length=64, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
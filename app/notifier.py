@@ -0,0 +1,278 @@
+import logging
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, Min, OuterRef, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Reminder, Notification
+from .recurrence import RecurrenceError, iter_occurrences, parse_rule
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKENDS = {
+    'web': 'app.notifier.WebBackend',
+    'email': 'app.mailer.EmailDigestBackend',
+    'push': 'app.notifier.LoggingBackend',
+}
+
+
+class BaseBackend:
+    """
+    Delivers notifications for one channel.
+
+    `send` receives a batch of claimed notifications and returns the ids of
+    the ones that could not be delivered; raising fails the whole batch.
+    Failed notifications are retried with backoff (see `dispatch`).
+    """
+
+    channel = None
+
+    def __init__(self, channel):
+        self.channel = channel
+
+    def send(self, notifications):
+        raise NotImplementedError
+
+    def close(self):
+        """Release anything held between batches, such as open connections."""
+
+
+class WebBackend(BaseBackend):
+    """Web notifications are read by the browser, so dispatching only marks them sent."""
+
+    def send(self, notifications):
+        return set()
+
+
+class LoggingBackend(BaseBackend):
+    """Stand-in for channels without a real transport yet."""
+
+    def send(self, notifications):
+        for notification in notifications:
+            logger.info('%s notification %s for user %s', self.channel, notification.id, notification.user_id)
+        return set()
+
+
+_backends = {}
+
+
+def get_backend(channel):
+    if channel not in _backends:
+        paths = {**DEFAULT_BACKENDS, **getattr(settings, 'NOTIFICATION_BACKENDS', {})}
+        _backends[channel] = import_string(paths[channel])(channel)
+    return _backends[channel]
+
+
+def close_backends():
+    while _backends:
+        _backends.popitem()[1].close()
+
+
+def due_occurrences(start, end, limit):
+    """
+    Up to `limit` occurrences of pending recurring reminders in [start, end)
+    that have no notification yet, as (notify_at, reminder) pairs.
+
+    Every live series is expanded on each call; the month buckets in
+    app/recurrence.py are memoized, so this stays cheap between passes.
+    """
+    reminders = Reminder.objects.filter(status='pending', reminder_date__lt=end).exclude(recurrence_rule='').only(
+        'id', 'user_id', 'reminder_date', 'timezone', 'recurrence_rule',
+    )
+    existing = set(Notification.objects.filter(
+        notify_at__gte=start, notify_at__lt=end, reminder__status='pending',
+    ).exclude(reminder__recurrence_rule='').values_list('reminder_id', 'notify_at'))
+
+    due = []
+    for reminder in reminders.iterator(chunk_size=500):
+        rule_text = reminder.recurrence_rule
+        try:
+            parse_rule(rule_text)
+        except RecurrenceError:
+            rule_text = ''  # a rule stored before validation existed; notify the single occurrence
+        for notify_at in iter_occurrences(rule_text, reminder.reminder_date, reminder.timezone, start, end):
+            if (reminder.id, notify_at) in existing:
+                continue
+            due.append((notify_at, reminder))
+            if len(due) >= limit:
+                return due
+    return due
+
+
+def materialize(now=None, horizon=timedelta(0), channels=None, batch_size=500):
+    """
+    Create Notification rows for pending reminders due up to `now + horizon`
+    that do not have one yet: one per reminder, or one per occurrence of a
+    recurring reminder. Returns the number of occurrences handled, which is
+    below `batch_size` once there are none left.
+
+    Occurrences more than NOTIFICATION_MAX_LATENESS_HOURS overdue are
+    skipped, so a first deploy or a bulk import does not send one for every
+    old reminder still marked pending.
+    """
+    now = now or timezone.now()
+    channels = channels or getattr(settings, 'NOTIFICATION_CHANNELS', ['web'])
+    cutoff = now - timedelta(hours=getattr(settings, 'NOTIFICATION_MAX_LATENESS_HOURS', 24))
+    existing = Notification.objects.filter(reminder=OuterRef('pk'), notify_at=OuterRef('reminder_date'))
+    reminders = list(Reminder.objects.filter(
+        status='pending', recurrence_rule='', reminder_date__gte=cutoff, reminder_date__lte=now + horizon,
+    ).filter(~Exists(existing)).order_by('reminder_date').values('id', 'user_id', 'reminder_date')[:batch_size])
+    due = [(r['reminder_date'], r['id'], r['user_id']) for r in reminders]
+    # The window is half-open, and reminder_date__lte above includes its end
+    for notify_at, reminder in due_occurrences(cutoff, now + horizon + timedelta(microseconds=1), batch_size):
+        due.append((notify_at, reminder.id, reminder.user_id))
+
+    rows = [
+        Notification(user_id=user_id, reminder_id=reminder_id, notify_at=notify_at, channel=channel)
+        for notify_at, reminder_id, user_id in due
+        for channel in channels
+    ]
+    Notification.objects.bulk_create(rows, ignore_conflicts=True)
+    return len(due)
+
+
+def claim(batch_size=100, now=None):
+    """
+    Atomically move up to `batch_size` due notifications from pending to
+    sending under a fresh claim token and return them.
+
+    The status check is repeated in the UPDATE itself, so when several
+    workers race for the same rows each row is claimed by exactly one.
+    """
+    now = now or timezone.now()
+    token = uuid.uuid4().hex
+    due = Notification.objects.filter(status='pending', notify_at__lte=now).filter(
+        Q(retry_at__isnull=True) | Q(retry_at__lte=now),
+    ).order_by('notify_at')
+    due = list(due.values_list('id', flat=True)[:batch_size])
+    claimed = Notification.objects.filter(id__in=due, status='pending').update(
+        status='sending', claimed_by=token, claimed_at=now,
+    )
+    if not claimed:
+        return []
+    return list(Notification.objects.filter(claimed_by=token, status='sending').select_related('reminder'))
+
+
+def release_stale_claims(lease, now=None):
+    """Return notifications claimed by a worker that died mid-batch to the queue."""
+    now = now or timezone.now()
+    return Notification.objects.filter(status='sending', claimed_at__lt=now - lease).update(
+        status='pending', claimed_by='', claimed_at=None,
+    )
+
+
+def retry_delay(attempts):
+    """Backoff before the next try of a notification that has failed `attempts` times."""
+    base = getattr(settings, 'NOTIFICATION_RETRY_BASE_SECONDS', 30)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), getattr(settings, 'NOTIFICATION_RETRY_MAX_SECONDS', 3600)))
+
+
+def dispatch(notifications):
+    """
+    Send claimed notifications through their channel backends and record the
+    outcome. A failed notification goes back to pending with an exponential
+    backoff until it has been tried NOTIFICATION_MAX_ATTEMPTS times, and is
+    then marked failed. Returns (sent, retried, failed) counts.
+    """
+    by_channel = {}
+    for notification in notifications:
+        by_channel.setdefault(notification.channel, []).append(notification)
+
+    sent, failed = [], []
+    for channel, batch in by_channel.items():
+        try:
+            failed_ids = set(get_backend(channel).send(batch))
+        except Exception:
+            logger.exception('Backend for %s failed on a batch of %s', channel, len(batch))
+            failed_ids = {n.id for n in batch}
+        for notification in batch:
+            (failed if notification.id in failed_ids else sent).append(notification.id)
+
+    max_attempts = getattr(settings, 'NOTIFICATION_MAX_ATTEMPTS', 5)
+    attempts = {n.id: n.attempts + 1 for n in notifications}
+    retries = {}  # attempts so far -> ids to retry
+    for notification_id in failed:
+        if attempts[notification_id] < max_attempts:
+            retries.setdefault(attempts[notification_id], []).append(notification_id)
+    given_up = [notification_id for notification_id in failed if attempts[notification_id] >= max_attempts]
+
+    now = timezone.now()
+    with transaction.atomic():
+        if sent:
+            Notification.objects.filter(id__in=sent).update(
+                status='sent', sent_at=now, attempts=F('attempts') + 1, retry_at=None,
+            )
+        for count, ids in retries.items():
+            Notification.objects.filter(id__in=ids).update(
+                status='pending', attempts=count, retry_at=now + retry_delay(count), claimed_by='', claimed_at=None,
+            )
+        if given_up:
+            Notification.objects.filter(id__in=given_up).update(status='failed', attempts=F('attempts') + 1)
+    return len(sent), len(failed) - len(given_up), len(given_up)
+
+
+def next_due(now=None):
+    """The earliest time at which there will be something to do, or None."""
+    now = now or timezone.now()
+    next_notification = Notification.objects.filter(status='pending').aggregate(
+        at=Min(Coalesce('retry_at', 'notify_at'))
+    )['at']
+    next_reminder = Reminder.objects.filter(status='pending', reminder_date__gt=now).aggregate(
+        at=Min('reminder_date')
+    )['at']
+    candidates = [at for at in (next_notification, next_reminder) if at is not None]
+    return min(candidates) if candidates else None
+
+
+class Metrics:
+    """Running throughput and lag figures for the worker's periodic report."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.lags = []
+
+    def record(self, notifications, sent, retried, failed, now=None):
+        now = now or timezone.now()
+        self.sent += sent
+        self.retried += retried
+        self.failed += failed
+        self.lags.extend((now - n.notify_at).total_seconds() for n in notifications)
+
+    def report(self):
+        elapsed = time.monotonic() - self.started
+        lags = sorted(self.lags)
+        summary = {
+            'sent': self.sent,
+            'retried': self.retried,
+            'failed': self.failed,
+            'per_second': round((self.sent + self.retried + self.failed) / elapsed, 2) if elapsed else 0.0,
+            'lag_p50_s': round(lags[len(lags) // 2], 3) if lags else None,
+            'lag_max_s': round(lags[-1], 3) if lags else None,
+        }
+        self.__init__()
+        return summary
+
+
+def run_once(batch_size=100, horizon=timedelta(0), lease=timedelta(minutes=5), metrics=None):
+    """One scheduler pass: materialize, reclaim stale work, then drain due notifications."""
+    release_stale_claims(lease)
+    while materialize(horizon=horizon, batch_size=batch_size) >= batch_size:
+        pass
+    total = 0
+    while True:
+        batch = claim(batch_size)
+        if not batch:
+            return total
+        sent, retried, failed = dispatch(batch)
+        if metrics is not None:
+            metrics.record(batch, sent, retried, failed)
+        total += len(batch)
@@ -0,0 +1,85 @@
+from django.db import transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import Lag
+from django.utils import timezone
+
+from .models import Task
+from .response_cache import bump_user_version
+
+# Spacing between neighbours after a rebalance. Repeatedly inserting at the
+# same spot halves the gap each time, so this leaves room for roughly 60
+# moves into one slot before doubles run out of precision.
+ORDER_STEP = 1024.0
+
+# Lists with a neighbour gap below this are renumbered by `rebalance_tasks`.
+REBALANCE_GAP = 1e-6
+
+
+def rebalance(user_id):
+    """Renumber a user's tasks to evenly spaced order_index values, keeping their order."""
+    now = timezone.now()
+    with transaction.atomic():
+        tasks = Task.objects.select_for_update().filter(user_id=user_id).order_by('order_index', 'id')
+        tasks = list(tasks.only('id', 'order_index'))
+        changed = []
+        for position, task in enumerate(tasks, start=1):
+            if task.order_index != position * ORDER_STEP:
+                task.order_index = position * ORDER_STEP
+                task.updated_at = now
+                changed.append(task)
+        Task.objects.bulk_update(changed, ['order_index', 'updated_at'], batch_size=500)
+        bump_user_version(user_id)
+    return len(changed)
+
+
+def users_needing_rebalance(gap=REBALANCE_GAP):
+    previous = Window(Lag('order_index'), partition_by=[F('user_id')], order_by=[F('order_index').asc(), F('id').asc()])
+    return Task.objects.annotate(gap=F('order_index') - previous).filter(gap__lt=gap).values_list('user_id', flat=True).distinct()
+
+
+def _between(low, high):
+    """A value strictly between two neighbours, or None when there is no room left."""
+    if low is None and high is None:
+        return ORDER_STEP
+    if low is None:
+        return high - ORDER_STEP
+    if high is None:
+        return low + ORDER_STEP
+    middle = (low + high) / 2
+    return middle if low < middle < high else None
+
+
+def move_task(task, prev_id=None, next_id=None):
+    """
+    Move `task` directly after the task `prev_id`, or directly before
+    `next_id`, or to the end of the list when neither is given, by writing
+    only its own row.
+
+    When the neighbours have no usable gap between them the user's list is
+    renumbered first; this is rare and is otherwise left to `rebalance_tasks`.
+    """
+    neighbours = Task.objects.filter(user_id=task.user_id).exclude(id=task.id)
+    if prev_id:
+        prev_task = neighbours.get(id=prev_id)
+        next_task = neighbours.filter(
+            Q(order_index__gt=prev_task.order_index) | Q(order_index=prev_task.order_index, id__gt=prev_task.id)
+        ).order_by('order_index', 'id').first()
+    elif next_id:
+        next_task = neighbours.get(id=next_id)
+        prev_task = neighbours.filter(
+            Q(order_index__lt=next_task.order_index) | Q(order_index=next_task.order_index, id__lt=next_task.id)
+        ).order_by('-order_index', '-id').first()
+    else:
+        prev_task, next_task = neighbours.order_by('-order_index', '-id').first(), None
+
+    position = _between(
+        prev_task.order_index if prev_task else None,
+        next_task.order_index if next_task else None,
+    )
+    if position is None:
+        rebalance(task.user_id)
+        return move_task(task, prev_id=prev_id, next_id=next_id)
+
+    task.order_index = position
+    task.save(update_fields=['order_index', 'updated_at'])
+    return task
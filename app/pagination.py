@@ -0,0 +1,68 @@
+import base64
+import json
+
+from django.db import models
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(value, pk):
+    """Encode the (sort value, id) of the last row on a page as an opaque token."""
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    raw = json.dumps([value, pk], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    return value, int(pk)
+
+
+def is_paginated(request):
+    return 'limit' in request.query_params or 'cursor' in request.query_params
+
+
+def paginate(request, queryset, field, descending=False):
+    """
+    Keyset pagination over (field, id).
+
+    Rows are ordered by the given field with id as a tie-breaker, and the
+    next page is selected with a range condition on that pair rather than
+    OFFSET, so each page is a single index range scan regardless of depth.
+    Returns the rows of the page and the cursor for the next one (or None).
+    A values() queryset works too, as long as it includes id and the field.
+    """
+    limit = int(request.query_params.get('limit', DEFAULT_PAGE_SIZE))
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    if descending:
+        queryset = queryset.order_by(f'-{field}', '-id')
+        before, pk_before = f'{field}__lt', 'id__lt'
+    else:
+        queryset = queryset.order_by(field, 'id')
+        before, pk_before = f'{field}__gt', 'id__gt'
+
+    cursor = request.query_params.get('cursor')
+    if cursor:
+        value, pk = decode_cursor(cursor)
+        value = queryset.model._meta.get_field(field).to_python(value)
+        queryset = queryset.filter(
+            models.Q(**{before: value}) | models.Q(**{field: value, pk_before: pk})
+        )
+
+    rows = list(queryset[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if isinstance(last, dict):
+            next_cursor = encode_cursor(last[field], last['id'])
+        else:
+            next_cursor = encode_cursor(getattr(last, field), last.pk)
+    return rows, next_cursor
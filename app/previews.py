@@ -0,0 +1,35 @@
+"""
+Stored previews of note bodies: a plain-text excerpt, a word count and the
+body's size in bytes, kept on the row so that lists and search never need
+to read the body itself.
+
+Bodies are HTML from the diary editor, so tags are stripped and entities
+decoded before counting words.
+"""
+import html
+import re
+
+from django.utils.html import strip_tags
+
+EXCERPT_LENGTH = 200
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def plain_text(body):
+    """The text of a note body, without markup and with whitespace collapsed."""
+    # Block-level tags would otherwise run words on either side together.
+    text = html.unescape(strip_tags(re.sub(r'<(?:br|/p|/div|/li|/h\d)\b[^>]*>', ' ', body or '', flags=re.I)))
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def note_preview(body):
+    """(excerpt, word_count, body_size) for a note body."""
+    body = body or ''
+    text = plain_text(body)
+    excerpt = text
+    if len(text) > EXCERPT_LENGTH:
+        cut = text[:EXCERPT_LENGTH - 1]
+        cut = cut.rsplit(' ', 1)[0] if ' ' in cut[EXCERPT_LENGTH // 2:] else cut
+        excerpt = cut.rstrip() + '…'
+    return excerpt, len(text.split()), len(body.encode('utf-8'))
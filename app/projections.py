@@ -0,0 +1,141 @@
+"""
+Fast read path for list endpoints: rows are fetched as values() dicts and
+formatted straight into JSON-ready primitives, with the same output as the
+ModelSerializer, but without building model instances or running DRF
+fields per row. `?fields=` selects a subset of the serializer's fields.
+"""
+from functools import cached_property
+
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from .instrumentation import phase
+from .models import NoteTag
+from .serializers import ReminderSerializer, TaskSerializer, NoteSerializer
+
+# DRF fields whose to_representation returns a values() result unchanged.
+PASSTHROUGH = (
+    serializers.CharField, serializers.IntegerField, serializers.BooleanField, serializers.FloatField,
+    serializers.ChoiceField, serializers.PrimaryKeyRelatedField,
+)
+
+
+def iso_datetime(field):
+    """
+    A converter equivalent to field.to_representation for an ISO 8601
+    DateTimeField, with the timezone looked up once instead of per value.
+    Returns None when the field needs DRF's general handling.
+    """
+    if getattr(field, 'format', api_settings.DATETIME_FORMAT).lower() != ISO_8601:
+        return None
+    tz = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if tz is None:
+        return None
+
+    def convert(value):
+        if timezone.is_naive(value):
+            return field.to_representation(value)
+        value = value.astimezone(tz).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+
+def note_tags(note_ids):
+    tags = {note_id: [] for note_id in note_ids}
+    rows = NoteTag.objects.filter(note_id__in=note_ids).order_by('id').values_list('note_id', 'tag__name')
+    for note_id, name in rows:
+        tags[note_id].append(name)
+    return tags
+
+
+class Projection:
+    """
+    The values() projection of one serializer's fields.
+
+    `computed` maps fields that are not model columns to a function taking
+    the ids of the rows being formatted and returning {id: value}, so each
+    costs one query per page rather than one per row. `deferred` fields are
+    left out unless ?fields= names them, as defer() would leave them unloaded.
+    """
+
+    def __init__(self, serializer_class, computed=None, deferred=()):
+        self.serializer_class = serializer_class
+        self.model = serializer_class.Meta.model
+        self.field_names = list(serializer_class.Meta.fields)
+        self.computed = computed or {}
+        self.default_fields = [name for name in self.field_names if name not in deferred]
+
+    @cached_property
+    def columns(self):
+        # name -> (values() key, DRF field or None when the value passes through);
+        # built on first use, once the app registry is ready
+        fields = self.serializer_class().fields
+        columns = {}
+        for name in self.field_names:
+            if name in self.computed:
+                continue
+            field = fields[name]
+            if isinstance(field, PASSTHROUGH):
+                field = None
+            columns[name] = (self.model._meta.get_field(name).attname, field)
+        return columns
+
+    def parse_fields(self, request):
+        """The fields requested with ?fields=a,b, in serializer order; all but the deferred ones by default."""
+        requested = request.query_params.get('fields')
+        if not requested:
+            return self.default_fields
+        names = {name.strip() for name in requested.split(',') if name.strip()}
+        unknown = names - set(self.field_names)
+        if unknown:
+            raise ValueError(f'Unknown fields: {", ".join(sorted(unknown))}. '
+                             f'Available: {", ".join(self.field_names)}')
+        return [name for name in self.field_names if name in names]
+
+    def values(self, queryset, fields, *extra):
+        """
+        `queryset` as values() dicts holding the columns behind `fields`, plus
+        id and any `extra` columns needed for ordering or pagination cursors.
+        """
+        keys = {'id', *extra}
+        keys.update(self.columns[name][0] for name in fields if name in self.columns)
+        return queryset.values(*keys)
+
+    def format(self, rows, fields):
+        """Turn values() rows into the dicts the serializer would have produced, limited to `fields`."""
+        with phase('serialize'):
+            rows = list(rows)
+            computed = {
+                name: self.computed[name]([row['id'] for row in rows])
+                for name in fields if name in self.computed
+            }
+            plan = []
+            for name in fields:
+                if name in computed:
+                    plan.append((name, None, None, computed[name]))
+                    continue
+                key, field = self.columns[name]
+                if isinstance(field, serializers.DateTimeField):
+                    convert = iso_datetime(field) or field.to_representation
+                else:
+                    convert = field and field.to_representation
+                plan.append((name, key, convert, None))
+            results = []
+            for row in rows:
+                item = {}
+                for name, key, convert, values in plan:
+                    if values is not None:
+                        item[name] = values[row['id']]
+                    elif convert is None:
+                        item[name] = row[key]
+                    else:
+                        value = row[key]
+                        item[name] = None if value is None else convert(value)
+                results.append(item)
+            return results
+
+
+REMINDERS = Projection(ReminderSerializer)
+TASKS = Projection(TaskSerializer)
+NOTES = Projection(NoteSerializer, computed={'tags': note_tags}, deferred=['body'])
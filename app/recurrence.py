@@ -0,0 +1,336 @@
+"""
+Expansion of Reminder.recurrence_rule.
+
+Rules use the RRULE subset of RFC 5545 that reminders need:
+
+    FREQ=DAILY|WEEKLY|MONTHLY|YEARLY   (required)
+    INTERVAL=n, COUNT=n, UNTIL=YYYYMMDD[THHMMSS[Z]]
+    BYDAY=MO,TU,... (with +n/-n ordinals for MONTHLY and YEARLY)
+    BYMONTHDAY=1,15,-1   BYMONTH=1,6
+
+Occurrences are generated on the wall clock of the reminder's timezone, so a
+09:00 daily reminder stays at 09:00 across DST changes, and are returned in
+UTC. Expansion is lazy and bucketed by calendar month; each month bucket is
+memoized in a bounded LRU so repeated and overlapping windows are cheap.
+"""
+import calendar
+import heapq
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+WEEKDAYS = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+FREQUENCIES = ['DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY']
+
+# Longest run of periods with no occurrence before a rule is treated as empty,
+# e.g. BYMONTH=2;BYMONTHDAY=30.
+MAX_EMPTY_PERIODS = 2000
+
+BUCKET_CACHE_SIZE = 4096
+
+
+class RecurrenceError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Rule:
+    freq: str
+    interval: int = 1
+    count: int = None
+    until: datetime = None
+    until_is_date: bool = False
+    by_day: tuple = ()
+    by_month_day: tuple = ()
+    by_month: tuple = ()
+
+
+def _int_list(value, name, low, high):
+    try:
+        items = tuple(int(v) for v in value.split(','))
+    except ValueError:
+        raise RecurrenceError(f'Invalid {name}: {value}')
+    for item in items:
+        if item == 0 or not low <= item <= high:
+            raise RecurrenceError(f'Invalid {name}: {value}')
+    return items
+
+
+@lru_cache(maxsize=1024)
+def parse_rule(text):
+    text = text.strip()
+    if text.upper().startswith('RRULE:'):
+        text = text[6:]
+    parts = {}
+    for part in filter(None, text.split(';')):
+        key, sep, value = part.partition('=')
+        if not sep:
+            raise RecurrenceError(f'Invalid rule part: {part}')
+        parts[key.strip().upper()] = value.strip().upper()
+
+    freq = parts.pop('FREQ', None)
+    if freq not in FREQUENCIES:
+        raise RecurrenceError(f'Unsupported FREQ: {freq}')
+    kwargs = {'freq': freq}
+
+    if 'INTERVAL' in parts:
+        kwargs['interval'] = _int_list(parts.pop('INTERVAL'), 'INTERVAL', 1, 10000)[0]
+    if 'COUNT' in parts:
+        kwargs['count'] = _int_list(parts.pop('COUNT'), 'COUNT', 1, 100000)[0]
+    if 'UNTIL' in parts:
+        value = parts.pop('UNTIL')
+        try:
+            if 'T' in value:
+                until = datetime.strptime(value.rstrip('Z'), '%Y%m%dT%H%M%S')
+                kwargs['until'] = until.replace(tzinfo=dt_timezone.utc) if value.endswith('Z') else until
+            else:
+                kwargs['until'] = datetime.strptime(value, '%Y%m%d')
+                kwargs['until_is_date'] = True
+        except ValueError:
+            raise RecurrenceError(f'Invalid UNTIL: {value}')
+    if 'BYDAY' in parts:
+        by_day = []
+        for item in parts.pop('BYDAY').split(','):
+            day, ordinal = item[-2:], item[:-2]
+            if day not in WEEKDAYS:
+                raise RecurrenceError(f'Invalid BYDAY: {item}')
+            try:
+                ordinal = int(ordinal) if ordinal else 0
+            except ValueError:
+                raise RecurrenceError(f'Invalid BYDAY: {item}')
+            if ordinal and freq not in ('MONTHLY', 'YEARLY'):
+                raise RecurrenceError('BYDAY ordinals are only valid with MONTHLY or YEARLY')
+            by_day.append((WEEKDAYS.index(day), ordinal))
+        kwargs['by_day'] = tuple(by_day)
+    if 'BYMONTHDAY' in parts:
+        kwargs['by_month_day'] = _int_list(parts.pop('BYMONTHDAY'), 'BYMONTHDAY', -31, 31)
+    if 'BYMONTH' in parts:
+        kwargs['by_month'] = _int_list(parts.pop('BYMONTH'), 'BYMONTH', 1, 12)
+    if parts:
+        raise RecurrenceError(f'Unsupported rule parts: {", ".join(sorted(parts))}')
+    return Rule(**kwargs)
+
+
+def get_zone(name):
+    try:
+        return ZoneInfo(name or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo('UTC')
+
+
+def _add_months(year, month, months):
+    index = year * 12 + month - 1 + months
+    return index // 12, index % 12 + 1
+
+
+def _month_days(rule, year, month, default_day):
+    """Days of one month selected by BYMONTHDAY/BYDAY, or the default day."""
+    days_in_month = calendar.monthrange(year, month)[1]
+    selected = None
+    if rule.by_month_day:
+        selected = {d if d > 0 else days_in_month + d + 1 for d in rule.by_month_day}
+        selected = {d for d in selected if 1 <= d <= days_in_month}
+    if rule.by_day:
+        matches = set()
+        for weekday, ordinal in rule.by_day:
+            candidates = [d for d in range(1, days_in_month + 1) if date(year, month, d).weekday() == weekday]
+            if ordinal and -len(candidates) <= ordinal <= len(candidates):
+                matches.add(candidates[ordinal - 1 if ordinal > 0 else ordinal])
+            elif not ordinal:
+                matches.update(candidates)
+        selected = matches if selected is None else selected & matches
+    if selected is None:
+        selected = {default_day} if default_day <= days_in_month else set()
+    return sorted(selected)
+
+
+def _year_days(rule, year, start):
+    """Dates of one year for FREQ=YEARLY."""
+    if rule.by_day and not rule.by_month and not rule.by_month_day:
+        # Ordinals count weekdays across the whole year, e.g. 20MO.
+        days = []
+        for weekday, ordinal in rule.by_day:
+            first = date(year, 1, 1) + timedelta(days=(weekday - date(year, 1, 1).weekday()) % 7)
+            candidates = []
+            while first.year == year:
+                candidates.append(first)
+                first += timedelta(days=7)
+            if ordinal and -len(candidates) <= ordinal <= len(candidates):
+                days.append(candidates[ordinal - 1 if ordinal > 0 else ordinal])
+            elif not ordinal:
+                days.extend(candidates)
+        return sorted(set(days))
+    months = rule.by_month or (start.month,)
+    return [date(year, month, d) for month in sorted(months) for d in _month_days(rule, year, month, start.day)]
+
+
+def _period_start(rule, start, index):
+    """First calendar date of the index-th period after the one containing `start`."""
+    step = index * rule.interval
+    if rule.freq == 'DAILY':
+        return start + timedelta(days=step)
+    if rule.freq == 'WEEKLY':
+        return start - timedelta(days=start.weekday()) + timedelta(weeks=step)
+    if rule.freq == 'MONTHLY':
+        year, month = _add_months(start.year, start.month, step)
+        return date(year, month, 1)
+    return date(start.year + step, 1, 1)
+
+
+def _period_dates(rule, start, index):
+    """Candidate dates for the index-th period after the one containing `start`."""
+    step = index * rule.interval
+    if rule.freq == 'DAILY':
+        day = start + timedelta(days=step)
+        if rule.by_month and day.month not in rule.by_month:
+            return []
+        if rule.by_month_day or rule.by_day:
+            if day.day not in _month_days(rule, day.year, day.month, day.day):
+                return []
+        return [day]
+    if rule.freq == 'WEEKLY':
+        week_start = _period_start(rule, start, index)
+        weekdays = sorted({w for w, _ in rule.by_day}) if rule.by_day else [start.weekday()]
+        days = [week_start + timedelta(days=w) for w in weekdays]
+        return [d for d in days if not rule.by_month or d.month in rule.by_month]
+    if rule.freq == 'MONTHLY':
+        year, month = _add_months(start.year, start.month, step)
+        if rule.by_month and month not in rule.by_month:
+            return []
+        return [date(year, month, d) for d in _month_days(rule, year, month, start.day)]
+    return _year_days(rule, start.year + step, start)
+
+
+def _periods_between(rule, start, target):
+    """How many whole periods lie between `start` and `target`, used to skip ahead."""
+    if rule.freq == 'DAILY':
+        span = (target - start).days
+    elif rule.freq == 'WEEKLY':
+        span = ((target - timedelta(days=target.weekday())) - (start - timedelta(days=start.weekday()))).days // 7
+    elif rule.freq == 'MONTHLY':
+        span = (target.year - start.year) * 12 + target.month - start.month
+    else:
+        span = target.year - start.year
+    return max(0, span // rule.interval - 1)
+
+
+def iter_local(rule, dtstart, until_local=None, after=None):
+    """
+    Yield occurrences as naive wall-clock datetimes in the reminder's zone,
+    starting at dtstart and stopping at COUNT, UNTIL or `until_local`.
+    Without COUNT, iteration skips straight to the period containing `after`.
+    """
+    start_date, clock = dtstart.date(), dtstart.time()
+    index = 0
+    if after is not None and rule.count is None and after > dtstart:
+        index = _periods_between(rule, start_date, after.date())
+
+    emitted = 0
+    empty_run = 0
+    while True:
+        try:
+            period_start = _period_start(rule, start_date, index)
+            days = _period_dates(rule, start_date, index)
+        except (OverflowError, ValueError):
+            return  # ran off the end of the calendar
+        if until_local is not None and datetime.combine(period_start, time.min) > until_local:
+            return
+        index += 1
+        if not days:
+            empty_run += 1
+            if empty_run > MAX_EMPTY_PERIODS:
+                return
+            continue
+        empty_run = 0
+        for day in days:
+            occurrence = datetime.combine(day, clock)
+            if occurrence < dtstart:
+                continue
+            if until_local is not None and occurrence > until_local:
+                return
+            yield occurrence
+            emitted += 1
+            if rule.count is not None and emitted >= rule.count:
+                return
+
+
+def _to_utc(local, zone):
+    return local.replace(tzinfo=zone).astimezone(dt_timezone.utc)
+
+
+@lru_cache(maxsize=BUCKET_CACHE_SIZE)
+def month_bucket(rule_text, dtstart_local, zone_name, year, month):
+    """All occurrences (aware, UTC) falling in one local calendar month."""
+    rule = parse_rule(rule_text)
+    zone = get_zone(zone_name)
+    month_start = datetime(year, month, 1)
+    next_year, next_month = _add_months(year, month, 1)
+    month_end = datetime(next_year, next_month, 1) - timedelta(microseconds=1)
+
+    stop = month_end
+    if rule.until is not None:
+        until = rule.until
+        if rule.until_is_date:
+            until = datetime.combine(until.date(), time.max)
+        elif until.tzinfo is not None:
+            until = until.astimezone(zone).replace(tzinfo=None)
+        stop = min(stop, until)
+
+    occurrences = []
+    for local in iter_local(rule, dtstart_local, until_local=stop, after=month_start):
+        if local >= month_start:
+            occurrences.append(_to_utc(local, zone))
+    return tuple(occurrences)
+
+
+def iter_occurrences(rule_text, dtstart, zone_name, start, end):
+    """
+    Lazily yield a reminder's occurrences (aware, UTC) in [start, end),
+    one memoized month bucket at a time.
+    """
+    zone = get_zone(zone_name)
+    dtstart_local = dtstart.astimezone(zone).replace(tzinfo=None)
+    if not rule_text:
+        if start <= dtstart < end:
+            yield dtstart
+        return
+
+    parse_rule(rule_text)
+    first = max(start, dtstart).astimezone(zone)
+    last = (end - timedelta(microseconds=1)).astimezone(zone)
+    year, month = first.year, first.month
+    while (year, month) <= (last.year, last.month):
+        for occurrence in month_bucket(rule_text, dtstart_local, zone.key, year, month):
+            if occurrence >= end:
+                return
+            if occurrence >= start:
+                yield occurrence
+        year, month = _add_months(year, month, 1)
+
+
+def _tagged(stream, reminder):
+    for occurs_at in stream:
+        yield occurs_at, reminder.id, reminder
+
+
+def merge_occurrences(reminders, start, end, limit):
+    """
+    Merge the occurrence streams of many reminders in time order, stopping
+    after `limit` items so a long window never materializes every instance.
+    """
+    streams = []
+    for reminder in reminders:
+        rule_text = reminder.recurrence_rule
+        try:
+            if rule_text:
+                parse_rule(rule_text)
+        except RecurrenceError:
+            rule_text = ''  # a rule stored before validation existed; show the single occurrence
+        streams.append(_tagged(iter_occurrences(rule_text, reminder.reminder_date, reminder.timezone, start, end), reminder))
+    results = []
+    for occurs_at, _, reminder in heapq.merge(*streams, key=lambda item: (item[0], item[1])):
+        results.append((occurs_at, reminder))
+        if len(results) >= limit:
+            break
+    return results
@@ -0,0 +1,84 @@
+import hashlib
+import uuid
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+RESPONSE_CACHE = 'responses'
+
+
+def version_key(user_id):
+    return f'user-version:{user_id}'
+
+
+def new_version():
+    # Random rather than incremented: two processes bumping at once must not
+    # land on the same value, and a version lost to cache eviction must not
+    # come back as one that was already handed out.
+    return uuid.uuid4().hex[:16]
+
+
+def user_version(user_id):
+    """
+    The user's current data version. It changes whenever their reminders,
+    tasks, notes or profile change, so anything keyed by it never goes stale.
+    """
+    key = version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_user_version(user_id):
+    """Start a new version for the user once the current transaction commits."""
+    transaction.on_commit(lambda: cache.set(version_key(user_id), new_version(), None))
+
+
+def cached_response(endpoint):
+    """
+    Cache a GET view's response data per (user, endpoint, params, version)
+    and answer with a strong ETag. A request whose If-None-Match still matches
+    gets a 304 after a single cache read and no database work.
+
+    Goes below @api_view; the user comes from the `user_id` URL argument or
+    query parameter, and requests without one are not cached.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            user_id = kwargs.get('user_id') or request.query_params.get('user_id')
+            if request.method != 'GET' or not user_id:
+                return view(request, *args, **kwargs)
+
+            version = user_version(user_id)
+            params = urlencode(sorted(request.query_params.lists()), doseq=True)
+            variant = f'{user_id}|{endpoint}|{sorted(kwargs.items())}|{params}|{request.accepted_renderer.format}'
+            digest = hashlib.sha256(variant.encode()).hexdigest()[:32]
+            etag = f'"{version}-{digest}"'
+
+            if etag in parse_etags(request.headers.get('If-None-Match', '')):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                responses = caches[RESPONSE_CACHE]
+                key = f'response:{user_id}:{version}:{digest}'
+                data = responses.get(key)
+                if data is None:
+                    response = view(request, *args, **kwargs)
+                    if response.status_code != status.HTTP_200_OK:
+                        return response
+                    responses.set(key, response.data)
+                else:
+                    response = Response(data)
+            response['ETag'] = etag
+            # Let browsers keep the body but revalidate it on every use.
+            response['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
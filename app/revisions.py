@@ -0,0 +1,161 @@
+"""
+Revisioned note body edits.
+
+Each body change bumps Note.revision. An edit names the revision it was
+made against and carries only the changed spans, so an autosave of a long
+entry sends a few bytes rather than the whole body, and an edit made
+against a body that has since changed is refused instead of overwriting it.
+
+History is kept as one NoteRevision row per revision: usually the patch
+from the previous revision, and a full snapshot every
+NOTE_SNAPSHOT_INTERVAL revisions (or when the patch would be no smaller),
+so rebuilding any revision replays at most that many patches.
+"""
+import json
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Note, NoteRevision
+from .previews import note_preview
+from .response_cache import bump_user_version
+
+
+class PatchError(ValueError):
+    pass
+
+
+class RevisionConflict(Exception):
+    def __init__(self, revision):
+        super().__init__(f'Note is at revision {revision}')
+        self.revision = revision
+
+
+def apply_patch(text, patch):
+    """
+    Apply a patch, a list of [start, end, insert] splices, to `text`.
+
+    Offsets are in UTF-16 code units, as JavaScript string indices are, and
+    refer to the original text; splices must be in order and not overlap.
+    """
+    if not isinstance(patch, list):
+        raise PatchError('patch must be a list of [start, end, text] splices')
+    units = text.encode('utf-16-le')
+    length = len(units) // 2
+    parts = []
+    position = 0
+    for splice in patch:
+        if (not isinstance(splice, list) or len(splice) != 3
+                or not all(isinstance(n, int) and not isinstance(n, bool) for n in splice[:2])
+                or not isinstance(splice[2], str)):
+            raise PatchError('Each splice must be [start, end, text]')
+        start, end, insert = splice
+        if not position <= start <= end <= length:
+            raise PatchError(f'Splice [{start}, {end}] is out of order or outside the text ({length} units)')
+        parts += [units[position * 2:start * 2], insert.encode('utf-16-le')]
+        position = end
+    parts.append(units[position * 2:])
+    try:
+        return b''.join(parts).decode('utf-16-le')
+    except UnicodeDecodeError:
+        raise PatchError('Splice splits a surrogate pair')
+
+
+def _units(text):
+    data = text.encode('utf-16-le')
+    return [int.from_bytes(data[i:i + 2], 'little') for i in range(0, len(data), 2)]
+
+
+def _is_high_surrogate(unit):
+    return 0xD800 <= unit <= 0xDBFF
+
+
+def diff_patch(old, new):
+    """A patch turning `old` into `new`: one splice covering just the span that differs."""
+    a, b = _units(old), _units(new)
+    start = 0
+    while start < min(len(a), len(b)) and a[start] == b[start]:
+        start += 1
+    if start and _is_high_surrogate(a[start - 1]):
+        start -= 1
+    end = 0
+    while end < min(len(a), len(b)) - start and a[len(a) - 1 - end] == b[len(b) - 1 - end]:
+        end += 1
+    if end and _is_high_surrogate(a[len(a) - end - 1]):
+        end -= 1
+    if start == len(a) - end == len(b) - end:
+        return []
+    insert = new.encode('utf-16-le')[start * 2:(len(b) - end) * 2].decode('utf-16-le')
+    return [[start, len(a) - end, insert]]
+
+
+def _revision_row(note_id, revision, body, patch=None):
+    interval = getattr(settings, 'NOTE_SNAPSHOT_INTERVAL', 50)
+    data = None if patch is None else json.dumps(patch, separators=(',', ':'), ensure_ascii=False)
+    if data is None or revision % interval == 0 or len(data) >= len(body):
+        return NoteRevision(note_id=note_id, revision=revision, kind='snapshot', data=body)
+    return NoteRevision(note_id=note_id, revision=revision, kind='delta', data=data)
+
+
+def snapshot(note):
+    """A snapshot row for the note's current revision, for body writes made without a patch."""
+    return _revision_row(note.id, note.revision, note.body)
+
+
+def edit_note(note_id, base, patch, title=None):
+    """
+    Apply `patch` to the body of the note at revision `base`, and set its
+    title if given. Returns the updated note; raises RevisionConflict if
+    the note is no longer at `base`, and Note.DoesNotExist.
+    """
+    with transaction.atomic():
+        note = Note.objects.only('id', 'user_id', 'title', 'body', 'revision').get(id=note_id, is_archived=False)
+        if note.revision != base:
+            raise RevisionConflict(note.revision)
+        body = apply_patch(note.body, patch)
+        if body == note.body and (title is None or title == note.title):
+            return note
+
+        changes = {'updated_at': timezone.now()}
+        if title is not None:
+            changes['title'] = note.title = title
+        if body != note.body:
+            changes['body'] = body
+            changes['revision'] = base + 1
+            changes['excerpt'], changes['word_count'], changes['body_size'] = note_preview(body)
+        # Conditional on the revision, so an edit that raced past the check above loses
+        if not Note.objects.filter(id=note_id, revision=base).update(**changes):
+            raise RevisionConflict(Note.objects.values_list('revision', flat=True).get(id=note_id))
+
+        if body != note.body:
+            rows = [_revision_row(note_id, base + 1, body, patch)]
+            if base == 0:
+                # Notes start out without history; keep the body the first patch applies to
+                rows.insert(0, _revision_row(note_id, 0, note.body))
+            NoteRevision.objects.bulk_create(rows, ignore_conflicts=True)
+        for name, value in changes.items():
+            setattr(note, name, value)
+        bump_user_version(note.user_id)
+    return note
+
+
+def body_at(note, revision):
+    """The note's body as of `revision`, or None when that revision is not in its history."""
+    if revision == note.revision:
+        return note.body
+    if not 0 <= revision < note.revision:
+        return None
+    base = NoteRevision.objects.filter(note=note, kind='snapshot', revision__lte=revision).order_by(
+        '-revision').values_list('revision', 'data').first()
+    if base is None:
+        return None
+    start, body = base
+    deltas = NoteRevision.objects.filter(
+        note=note, kind='delta', revision__gt=start, revision__lte=revision,
+    ).order_by('revision').values_list('data', flat=True)
+    count = 0
+    for data in deltas:
+        body = apply_patch(body, json.loads(data))
+        count += 1
+    return body if count == revision - start else None
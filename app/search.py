@@ -0,0 +1,161 @@
+import html
+import re
+
+from django.db import connections, OperationalError
+
+from .models import Note
+from .previews import plain_text
+from .serializers import NoteSerializer
+
+FTS_TABLE = 'app_note_fts'
+
+# FTS5 index over the plain text of live (non-archived) notes. Bodies are
+# editor HTML, so the index keeps its own copy of the text, made by the
+# note_text() SQL function that install_functions() registers on every
+# connection. The triggers keep it in step with every insert, update and
+# archive, including writes made through bulk_create or queryset.update().
+CREATE_FTS_TABLE = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    title, body,
+    tokenize='unicode61 remove_diacritics 2'
+)
+"""
+
+CREATE_FTS_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON app_note
+    WHEN new.is_archived = 0 BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, note_text(new.body));
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON app_note
+    WHEN old.is_archived = 0 BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON app_note
+    WHEN old.title IS NOT new.title OR old.body IS NOT new.body OR old.is_archived IS NOT new.is_archived BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        INSERT INTO {FTS_TABLE}(rowid, title, body)
+            SELECT new.id, new.title, note_text(new.body) WHERE new.is_archived = 0;
+    END
+    """,
+]
+
+POPULATE_FTS = f"""
+INSERT INTO {FTS_TABLE}(rowid, title, body) SELECT id, title, note_text(body) FROM app_note WHERE is_archived = 0
+"""
+
+# Snippet highlights are marked with control characters, which never occur in
+# indexed text, so the rest of the snippet can be escaped before they become <mark>.
+MARK_START, MARK_END = '\x02', '\x03'
+_MARKS = str.maketrans('', '', MARK_START + MARK_END)
+
+# bm25 column weights: a hit in the title counts ten times a hit in the body
+RANK_WEIGHTS = (10.0, 1.0)
+
+_fts_available = {}
+
+
+def note_text(body):
+    return plain_text(body).translate(_MARKS)
+
+
+def install_functions(sender, connection, **kwargs):
+    """connection_created receiver registering the SQL functions the FTS triggers call."""
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function('note_text', 1, note_text, deterministic=True)
+
+
+def highlight(snippet):
+    """HTML for an FTS snippet: its text escaped, its highlights in <mark>."""
+    return html.escape(snippet).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+def install_fts(schema_editor):
+    """
+    Create the FTS index and its triggers, returning whether it exists.
+    Does nothing on databases other than SQLite or SQLite builds compiled
+    without FTS5.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return False
+    _fts_available.pop(schema_editor.connection.alias, None)
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute(CREATE_FTS_TABLE)
+        except OperationalError:
+            return False
+        for sql in CREATE_FTS_TRIGGERS:
+            cursor.execute(sql)
+    return True
+
+
+def fts_available(using='default'):
+    if using not in _fts_available:
+        connection = connections[using]
+        _fts_available[using] = (
+            connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_available[using]
+
+
+def build_match_query(query):
+    """
+    Turn free text into an FTS5 query: every word must match, and each one
+    is treated as a prefix so results update while the user is still typing.
+    User input never reaches the FTS5 query syntax unquoted.
+    """
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_notes(user_id, query, tags=None, limit=50, using='default'):
+    """
+    Ranked full-text search over a user's live notes.
+
+    Returns notes in relevance order, each with `rank` (lower is better) and
+    `snippet` (escaped HTML of the matching text with <mark> highlights) attributes set, or
+    None when the query has no searchable words.
+    """
+    match = build_match_query(query)
+    if not match:
+        return None
+
+    sql = f"""
+        SELECT n.id, bm25({FTS_TABLE}, %s, %s) AS rank,
+               snippet({FTS_TABLE}, -1, char(2), char(3), '…', 16)
+        FROM {FTS_TABLE} JOIN app_note n ON n.id = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH %s AND n.user_id = %s AND n.is_archived = 0
+    """
+    params = [*RANK_WEIGHTS, match, user_id]
+    if tags:
+        placeholders = ', '.join(['%s'] * len(tags))
+        sql += f"""
+          AND n.id IN (
+            SELECT nt.note_id FROM app_notetag nt JOIN app_tag t ON t.id = nt.tag_id
+            WHERE t.user_id = %s AND t.name IN ({placeholders})
+            GROUP BY nt.note_id HAVING COUNT(*) = %s
+          )
+        """
+        params += [user_id, *tags, len(tags)]
+    sql += ' ORDER BY rank LIMIT %s'
+    params.append(limit)
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+        hits = cursor.fetchall()
+
+    notes = Note.objects.using(using).filter(id__in=[hit[0] for hit in hits]).defer('body')
+    notes = NoteSerializer.prefetch_tags(notes)
+    notes_by_id = {note.id: note for note in notes}
+    results = []
+    for note_id, rank, snippet in hits:
+        note = notes_by_id.get(note_id)
+        if note is not None:
+            note.rank = rank
+            note.snippet = highlight(snippet)
+            results.append(note)
+    return results
@@ -1,43 +1,73 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
+from .instrumentation import phase
 from .models import User, Reminder, Task, Note, Tag, NoteTag, Attachment, Notification
 
-class UserSerializer(serializers.ModelSerializer):
+class TimedModelSerializer(serializers.ModelSerializer):
+    """ModelSerializer whose to_representation time is reported as the request's serialize phase."""
+
+    def to_representation(self, instance):
+        with phase('serialize'):
+            return super().to_representation(instance)
+
+class UserSerializer(TimedModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'name', 'email', 'timezone', 'dark_mode']
 
-class ReminderSerializer(serializers.ModelSerializer):
+class ReminderSerializer(TimedModelSerializer):
     class Meta:
         model = Reminder
         fields = ['id', 'user', 'title', 'description', 'reminder_date', 'timezone', 'recurrence_rule', 'status', 'category', 'created_at', 'updated_at']
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(TimedModelSerializer):
     class Meta:
         model = Task
         fields = ['id', 'user', 'title', 'description', 'due_date', 'priority', 'status', 'parent_task', 'order_index', 'created_at', 'updated_at']
 
-class NoteSerializer(serializers.ModelSerializer):
+class NoteSerializer(TimedModelSerializer):
     tags = serializers.SerializerMethodField()
 
     class Meta:
         model = Note
-        fields = ['id', 'user', 'title', 'body', 'is_pinned', 'is_archived', 'tags', 'created_at', 'updated_at']
+        fields = ['id', 'user', 'title', 'body', 'excerpt', 'word_count', 'body_size', 'revision', 'is_pinned',
+                  'is_archived', 'tags', 'created_at', 'updated_at']
+        read_only_fields = [*Note.PREVIEW_FIELDS, 'revision']
+
+    @staticmethod
+    def tag_prefetch():
+        return Prefetch('tags', queryset=NoteTag.objects.select_related('tag').order_by('id'))
+
+    @staticmethod
+    def prefetch_tags(queryset):
+        """Load tag names for a whole queryset in one extra query instead of one per note."""
+        return queryset.prefetch_related(NoteSerializer.tag_prefetch())
 
     def get_tags(self, obj):
-        tags = NoteTag.objects.filter(note=obj).values_list('tag__name', flat=True)
+        if 'tags' in getattr(obj, '_prefetched_objects_cache', {}):
+            return [note_tag.tag.name for note_tag in obj.tags.all()]
+        tags = NoteTag.objects.filter(note=obj).order_by('id').values_list('tag__name', flat=True)
         return list(tags)
 
-class TagSerializer(serializers.ModelSerializer):
+class NotePreviewSerializer(NoteSerializer):
+    """A note without its body, for lists and search results; note_detail returns the whole note."""
+
+    class Meta(NoteSerializer.Meta):
+        fields = [name for name in NoteSerializer.Meta.fields if name != 'body']
+
+class TagSerializer(TimedModelSerializer):
     class Meta:
         model = Tag
         fields = ['id', 'user', 'name']
 
-class AttachmentSerializer(serializers.ModelSerializer):
+class AttachmentSerializer(TimedModelSerializer):
+    sha256 = serializers.CharField(source='blob.sha256', read_only=True, default=None)
+
     class Meta:
         model = Attachment
-        fields = ['id', 'owner_type', 'owner_id', 'file', 'mime_type', 'size', 'created_at']
+        fields = ['id', 'owner_type', 'owner_id', 'file', 'filename', 'mime_type', 'size', 'sha256', 'created_at']
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(TimedModelSerializer):
     class Meta:
         model = Notification
         fields = ['id', 'user', 'reminder', 'notify_at', 'channel', 'status', 'created_at']
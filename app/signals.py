@@ -0,0 +1,43 @@
+from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.dispatch import receiver
+
+from .attachments import release
+from .models import User, Reminder, Task, Note, Attachment
+from .response_cache import bump_user_version
+from .sync import record_deletion
+from .thumbnails import pregenerate
+
+
+@receiver([post_save, post_delete], sender=Reminder)
+@receiver([post_save, post_delete], sender=Task)
+@receiver([post_save, post_delete], sender=Note)
+def invalidate_user_caches(sender, instance, **kwargs):
+    bump_user_version(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_profile(sender, instance, **kwargs):
+    bump_user_version(instance.id)
+
+
+@receiver(post_delete, sender=Reminder)
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Note)
+def record_tombstone(sender, instance, origin=None, **kwargs):
+    # Nothing to sync once the whole account is gone.
+    if isinstance(origin, User):
+        return
+    record_deletion(instance)
+
+
+@receiver(post_delete, sender=Attachment)
+def release_blob(sender, instance, **kwargs):
+    if instance.blob_id is not None:
+        release(instance.blob_id)
+
+
+@receiver(post_save, sender=Attachment)
+def pregenerate_thumbnails(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: pregenerate(instance))
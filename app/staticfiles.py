@@ -0,0 +1,247 @@
+"""
+collectstatic pipeline: minify CSS and JS, fingerprint every file with
+ManifestStaticFilesStorage, then write a gzip variant next to each text asset.
+"""
+import gzip
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.files.base import ContentFile
+
+COMPRESSIBLE = ('.css', '.js', '.html', '.svg', '.json', '.txt', '.ico', '.map')
+# gzip output that does not save at least this much is not worth a variant
+MIN_SAVING = 0.05
+
+
+def _is_word(char):
+    return char.isalnum() or char in '_$\\' or ord(char) > 127
+
+
+# A '/' after one of these starts a regex literal rather than a division.
+REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+REGEX_KEYWORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void', 'throw', 'instanceof'}
+# A newline after one of these, or before one of the next set, cannot be
+# where automatic semicolon insertion ends a statement, so it can go.
+NO_ASI_AFTER = set('{;,([=:?&|!<>*%^~')
+NO_ASI_BEFORE = set('})],;:.?=&|')
+
+
+def minify_js(source):
+    """
+    Strip comments and redundant whitespace from JavaScript, in the manner of
+    JSMin. String, template and regex literals are copied untouched, and a
+    line break is kept wherever automatic semicolon insertion could depend
+    on it.
+    """
+    out = []
+    i, n = 0, len(source)
+    pending = ''  # '', ' ' or '\n': whitespace seen since the last token
+    templates = []  # brace depth inside each open template literal's ${ }
+
+    def last_char():
+        return out[-1][-1] if out else ''
+
+    def last_word():
+        match = re.search(r'[\w$]+$', out[-1]) if out else None
+        return match.group(0) if match else ''
+
+    def emit(text):
+        nonlocal pending
+        prev = last_char()
+        if pending == '\n' and prev and prev not in NO_ASI_AFTER and text[0] not in NO_ASI_BEFORE:
+            out.append('\n')
+        elif pending and prev and (
+            (_is_word(prev) and _is_word(text[0]))
+            or (prev in '+-' and text[0] == prev)
+            or (prev.isdigit() and text[0] == '.')
+        ):
+            out.append(' ')
+        pending = ''
+        out.append(text)
+
+    def read_quoted(start, quote):
+        j = start + 1
+        while j < n and source[j] != quote:
+            j += 2 if source[j] == '\\' else 1
+        return j + 1
+
+    def read_template_chunk(start):
+        # From just after ` or }, up to and including the closing ` or ${
+        j = start
+        while j < n:
+            if source[j] == '\\':
+                j += 2
+            elif source[j] == '`':
+                return j + 1, True
+            elif source.startswith('${', j):
+                return j + 2, False
+            else:
+                j += 1
+        return n, True
+
+    while i < n:
+        char = source[i]
+        if char in ' \t\r\n\f\v':
+            if char == '\n' or pending == '\n':
+                pending = '\n'
+            else:
+                pending = pending or ' '
+            i += 1
+        elif source.startswith('//', i):
+            end = source.find('\n', i)
+            i = n if end == -1 else end
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            chunk = source[i:n if end == -1 else end]
+            if '\n' in chunk:
+                pending = '\n'
+            else:
+                pending = pending or ' '
+            i = n if end == -1 else end + 2
+        elif char in '"\'':
+            end = read_quoted(i, char)
+            emit(source[i:end])
+            i = end
+        elif char == '`':
+            end, closed = read_template_chunk(i + 1)
+            emit(source[i:end])
+            if not closed:
+                templates.append(0)
+            i = end
+        elif char == '}' and templates and templates[-1] == 0:
+            templates.pop()
+            end, closed = read_template_chunk(i + 1)
+            pending = ''
+            out.append(source[i:end])
+            if not closed:
+                templates.append(0)
+            i = end
+        elif char == '/' and (not last_char() or last_char() in REGEX_PRECEDERS or last_word() in REGEX_KEYWORDS):
+            j, in_class = i + 1, False
+            while j < n:
+                if source[j] == '\\':
+                    j += 2
+                    continue
+                if source[j] == '[':
+                    in_class = True
+                elif source[j] == ']':
+                    in_class = False
+                elif source[j] == '/' and not in_class:
+                    break
+                j += 1
+            j += 1
+            while j < n and _is_word(source[j]):
+                j += 1
+            emit(source[i:j])
+            i = j
+        else:
+            if templates:
+                if char == '{':
+                    templates[-1] += 1
+                elif char == '}':
+                    templates[-1] -= 1
+            j = i + 1
+            if _is_word(char):
+                while j < n and _is_word(source[j]):
+                    j += 1
+            emit(source[i:j])
+            i = j
+    return ''.join(out) + '\n'
+
+
+CSS_TOKENS = re.compile(r'/\*.*?\*/|"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|[^"\'/]+|/', re.S)
+
+
+def minify_css(source):
+    """Drop comments, collapse whitespace and trim it around punctuation, leaving strings alone."""
+    parts = []
+    for token in CSS_TOKENS.findall(source):
+        if token.startswith('/*'):
+            parts.append(' ')
+        elif token[0] in '"\'':
+            parts.append(token)
+        else:
+            token = re.sub(r'\s+', ' ', token)
+            token = re.sub(r'\s*([{};,>])\s*', r'\1', token)
+            token = re.sub(r':\s+', ':', token)
+            token = token.replace(';}', '}')
+            parts.append(token)
+    return ''.join(parts).strip() + '\n'
+
+
+MINIFIERS = {'.js': minify_js, '.css': minify_css}
+
+
+def _is_project_asset(storage):
+    """Whether a finder storage is one of STATICFILES_DIRS rather than an app's static/ directory."""
+    dirs = {os.path.abspath(d[1] if isinstance(d, (list, tuple)) else d) for d in settings.STATICFILES_DIRS}
+    return os.path.abspath(getattr(storage, 'location', '')) in dirs
+
+
+class MinifiedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Minifies CSS and JS before they are fingerprinted, so the hash in each
+    name reflects what is served, and adds a .gz beside every text file
+    for the static view to send to clients that accept gzip.
+
+    Only the project's own STATICFILES_DIRS assets are minified; files
+    shipped by installed apps such as the admin are hashed as they come.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            yield from super().post_process(paths, dry_run=dry_run, **options)
+            return
+
+        paths = dict(paths)
+        for name in list(paths):
+            minify = MINIFIERS.get(name[name.rfind('.'):])
+            source_storage, source_path = paths[name]
+            if minify is None or name.endswith(('.min.js', '.min.css')) or not _is_project_asset(source_storage):
+                continue
+            with source_storage.open(source_path) as f:
+                minified = minify(f.read().decode('utf-8'))
+            self.delete(name)
+            self._save(name, ContentFile(minified.encode('utf-8')))
+            # Hash the minified copy in STATIC_ROOT rather than the original.
+            paths[name] = (self, name)
+
+        for name, hashed_name, processed in super().post_process(paths, dry_run=dry_run, **options):
+            if isinstance(processed, Exception):
+                yield name, hashed_name, processed
+                continue
+            for stored_name in {name, hashed_name}:
+                if stored_name and stored_name.endswith(COMPRESSIBLE):
+                    self._write_gzip(stored_name)
+            yield name, hashed_name, processed
+
+    def _write_gzip(self, name):
+        with self.open(name) as f:
+            content = f.read()
+        compressed = gzip.compress(content, compresslevel=9, mtime=0)
+        if len(compressed) <= len(content) * (1 - MIN_SAVING):
+            gz_name = name + '.gz'
+            if self.exists(gz_name):
+                self.delete(gz_name)
+            self._save(gz_name, ContentFile(compressed))
+
+
+GZIP_REFUSED = re.compile(r'\bgzip\s*;\s*q=0(\.0*)?\s*(,|$)')
+
+
+def accepts_gzip(request):
+    header = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    return 'gzip' in header and not GZIP_REFUSED.search(header)
+
+
+_hashed_names = None
+
+
+def is_hashed(name):
+    """Whether `name` is a fingerprinted file from the collectstatic manifest."""
+    global _hashed_names
+    if _hashed_names is None:
+        _hashed_names = set(staticfiles_storage.hashed_files.values())
+    return name in _hashed_names
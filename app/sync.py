@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import User, Reminder, Task, Note, Tombstone
+from .serializers import ReminderSerializer, TaskSerializer, NoteSerializer
+
+# Rows committed just before a token was issued can carry an updated_at a
+# little older than the token, so each delta re-reads this much history.
+# Clients apply rows as idempotent upserts, so the overlap is harmless.
+SYNC_OVERLAP = timedelta(seconds=5)
+
+SYNCED_MODELS = {
+    'reminder': Reminder,
+    'task': Task,
+    'note': Note,
+}
+
+
+def encode_token(moment):
+    return str(int(moment.timestamp() * 1_000_000))
+
+
+def decode_token(token):
+    try:
+        return datetime.fromtimestamp(int(token) / 1_000_000, tz=dt_timezone.utc)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError('Invalid sync token')
+
+
+def tombstone_retention():
+    return timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+
+
+def record_deletion(instance):
+    model = next(name for name, cls in SYNCED_MODELS.items() if isinstance(instance, cls))
+    Tombstone.objects.create(user_id=instance.user_id, model=model, object_id=instance.pk)
+
+
+def changes_since(user_id, since=None):
+    """
+    Rows changed and deleted since a sync token, plus the token to use next.
+
+    Without a token, or with one older than the tombstone retention window
+    or the user's last workspace import (imported rows keep their old
+    updated_at), the full workspace is returned with `full` set so the
+    client replaces its cache instead of patching it.
+    """
+    now = timezone.now()
+    full = since is None or since < now - tombstone_retention()
+    if not full:
+        imported_at = User.objects.filter(id=user_id).values_list('imported_at', flat=True).first()
+        full = imported_at is not None and since <= imported_at
+    Tombstone.objects.filter(user_id=user_id, deleted_at__lt=now - tombstone_retention()).delete()
+
+    reminders = Reminder.objects.filter(user_id=user_id)
+    tasks = Task.objects.filter(user_id=user_id)
+    notes = Note.objects.filter(user_id=user_id)
+    deleted = {'reminders': [], 'tasks': [], 'notes': []}
+
+    if full:
+        notes = notes.filter(is_archived=False)
+    else:
+        changed_after = since - SYNC_OVERLAP
+        reminders = reminders.filter(updated_at__gt=changed_after)
+        tasks = tasks.filter(updated_at__gt=changed_after)
+        notes = notes.filter(updated_at__gt=changed_after)
+        tombstones = Tombstone.objects.filter(user_id=user_id, deleted_at__gt=changed_after)
+        for model, object_id in tombstones.values_list('model', 'object_id'):
+            deleted[f'{model}s'].append(object_id)
+
+    return {
+        'token': encode_token(now),
+        'full': full,
+        'reminders': ReminderSerializer(reminders.order_by('id'), many=True).data,
+        'tasks': TaskSerializer(tasks.order_by('id'), many=True).data,
+        'notes': NoteSerializer(NoteSerializer.prefetch_tags(notes.order_by('id')), many=True).data,
+        'deleted': deleted,
+    }
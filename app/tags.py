@@ -0,0 +1,47 @@
+from django.db import transaction
+
+from .models import Tag, NoteTag
+from .response_cache import bump_user_version
+
+
+def clean_tag_names(names):
+    """Strip, drop empties and de-duplicate tag names, keeping their order."""
+    seen = {}
+    for name in names or []:
+        name = str(name).strip()
+        if name:
+            seen.setdefault(name, None)
+    return list(seen)
+
+
+def get_or_create_tags(user_id, names):
+    """Return a {name: Tag} map for the user, inserting any missing tags in one statement."""
+    tags = {tag.name: tag for tag in Tag.objects.filter(user_id=user_id, name__in=names)}
+    missing = [name for name in names if name not in tags]
+    if missing:
+        Tag.objects.bulk_create([Tag(user_id=user_id, name=name) for name in missing], ignore_conflicts=True)
+        tags.update((tag.name, tag) for tag in Tag.objects.filter(user_id=user_id, name__in=missing))
+    return tags
+
+
+def set_note_tags(note, names, replace=True):
+    """
+    Make the note's tags exactly `names` using set-based writes.
+
+    Tags are upserted with one bulk insert, stale links are removed with a
+    single delete and new links are added with one bulk insert, all inside
+    one transaction. Bulk writes send no signals, so the user's cached
+    responses are invalidated here.
+    """
+    names = clean_tag_names(names)
+    with transaction.atomic():
+        tags = get_or_create_tags(note.user_id, names) if names else {}
+        tag_ids = [tags[name].id for name in names]
+        if replace:
+            NoteTag.objects.filter(note=note).exclude(tag_id__in=tag_ids).delete()
+        if tag_ids:
+            NoteTag.objects.bulk_create(
+                [NoteTag(note=note, tag_id=tag_id) for tag_id in tag_ids],
+                ignore_conflicts=True,
+            )
+        bump_user_version(note.user_id)
@@ -0,0 +1,745 @@
+import asyncio
+import os
+import shutil
+import smtplib
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+from django.core.cache import caches
+from django.core.mail import EmailMessage
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+
+from . import (attachments, authentication, events, mailer, notifier, ordering, recurrence, revisions, search, staticfiles, sync,
+               thumbnails, tree, workspace)
+from .models import User, Reminder, Task, Note, NoteTag, Notification, TokenBlacklist, UploadSession
+from .tags import set_note_tags
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-default'},
+    'responses': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-responses'},
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class NoteQueryCountTests(TestCase):
+    """Listing and searching notes costs a fixed number of queries however many notes and tags there are."""
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create(name='Test', email='test@example.com', password_hash='!')
+        for i in range(10):
+            note = Note.objects.create(user=self.user, title=f'Diary {i}', body=f'<p>Entry number {i}</p>')
+            set_note_tags(note, ['daily', f'tag{i}', f'group{i % 3}'])
+        # Looked up once per process; keep it out of the counts
+        search.fts_available()
+
+    def get(self, path, **params):
+        response = self.client.get(path, {'user_id': self.user.id, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_note_list(self):
+        with self.assertNumQueries(2):
+            notes = self.get('/api/notes')
+        self.assertEqual(len(notes), 10)
+        self.assertTrue(all(len(note['tags']) == 3 for note in notes))
+
+    def test_note_list_paginated(self):
+        with self.assertNumQueries(2):
+            page = self.get('/api/notes', limit=5)
+        self.assertEqual(len(page['results']), 5)
+        self.assertTrue(all(len(note['tags']) == 3 for note in page['results']))
+
+    def test_search_notes(self):
+        # Ranked ids from the FTS index, then the notes, then their tags
+        with self.assertNumQueries(3):
+            notes = self.get('/api/notes/search', q='entry')
+        self.assertEqual(len(notes), 10)
+        self.assertTrue(all(len(note['tags']) == 3 for note in notes))
+
+    def test_search_notes_by_tag(self):
+        with self.assertNumQueries(2):
+            notes = self.get('/api/notes/search', q='', tags='group1')
+        self.assertEqual(len(notes), 3)
+        self.assertTrue(all('group1' in note['tags'] for note in notes))
+
+
+class NoteSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(name='Test', email='test@example.com', password_hash='!')
+        Note.objects.create(user=self.user, title='Diary',
+                            body='<p>Coffee with <strong>Sam</strong>, 1 &lt; 2 <img src=x onerror=alert(1)></p>')
+
+    def test_markup_is_not_indexed(self):
+        for query in ('p', 'strong', 'img', 'onerror'):
+            with self.subTest(query=query):
+                self.assertEqual(search.search_notes(self.user.id, query), [])
+
+    def test_snippet_is_escaped_except_highlights(self):
+        [note] = search.search_notes(self.user.id, 'sam')
+        self.assertEqual(note.snippet, 'Coffee with <mark>Sam</mark>, 1 &lt; 2')
+
+
+class MaterializeTests(TestCase):
+    def test_skips_reminders_past_max_lateness(self):
+        user = User.objects.create(name='Test', email='test@example.com', password_hash='!')
+        now = timezone.now()
+        due = Reminder.objects.create(user=user, title='Due', reminder_date=now - timedelta(hours=1))
+        Reminder.objects.create(user=user, title='Stale', reminder_date=now - timedelta(days=400))
+        with self.settings(NOTIFICATION_CHANNELS=['web'], NOTIFICATION_MAX_LATENESS_HOURS=24):
+            self.assertEqual(notifier.materialize(now=now), 1)
+        self.assertEqual(list(Notification.objects.values_list('reminder_id', flat=True)), [due.id])
+
+
+    def test_notifies_each_occurrence_of_a_recurring_reminder(self):
+        user = User.objects.create(name='Test', email='test@example.com', password_hash='!')
+        start = datetime(2026, 3, 1, 9, tzinfo=dt_timezone.utc)
+        reminder = Reminder.objects.create(user=user, title='Stretch', reminder_date=start,
+                                           recurrence_rule='FREQ=DAILY;COUNT=5')
+        with self.settings(NOTIFICATION_CHANNELS=['web'], NOTIFICATION_MAX_LATENESS_HOURS=24):
+            self.assertEqual(notifier.materialize(now=start), 1)
+            self.assertEqual(notifier.materialize(now=start + timedelta(hours=12)), 0)
+            # Two days later: the occurrence a day ago is still in the window, the one two days ago is not
+            self.assertEqual(notifier.materialize(now=start + timedelta(days=2)), 2)
+            self.assertEqual(notifier.materialize(now=start + timedelta(days=30)), 0)
+        self.assertEqual(
+            list(Notification.objects.filter(reminder=reminder).order_by('notify_at').values_list('notify_at', flat=True)),
+            [start, start + timedelta(days=1), start + timedelta(days=2)],
+        )
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+class RecurrenceTests(TestCase):
+    cases = [
+        # (rule, dtstart, timezone, expected occurrences in UTC)
+        ('FREQ=MONTHLY', utc(2026, 1, 31, 9), 'UTC',
+         [utc(2026, 1, 31, 9), utc(2026, 3, 31, 9), utc(2026, 5, 31, 9), utc(2026, 7, 31, 9)]),
+        ('FREQ=MONTHLY;BYMONTHDAY=-1', utc(2026, 1, 31, 9), 'UTC',
+         [utc(2026, 1, 31, 9), utc(2026, 2, 28, 9), utc(2026, 3, 31, 9), utc(2026, 4, 30, 9)]),
+        ('FREQ=YEARLY;COUNT=3', utc(2024, 2, 29, 9), 'UTC',
+         [utc(2024, 2, 29, 9), utc(2028, 2, 29, 9), utc(2032, 2, 29, 9)]),
+        ('FREQ=YEARLY;BYMONTH=2;BYMONTHDAY=-1', utc(2024, 2, 29, 9), 'UTC',
+         [utc(2024, 2, 29, 9), utc(2025, 2, 28, 9), utc(2026, 2, 28, 9), utc(2027, 2, 28, 9)]),
+        ('FREQ=MONTHLY;BYDAY=-1FR', utc(2026, 1, 1, 9), 'UTC',
+         [utc(2026, 1, 30, 9), utc(2026, 2, 27, 9), utc(2026, 3, 27, 9), utc(2026, 4, 24, 9)]),
+        ('FREQ=MONTHLY;BYDAY=-2MO', utc(2026, 1, 1, 9), 'UTC',
+         [utc(2026, 1, 19, 9), utc(2026, 2, 16, 9), utc(2026, 3, 23, 9), utc(2026, 4, 20, 9)]),
+        ('FREQ=YEARLY;BYDAY=-1SU', utc(2026, 1, 1, 9), 'UTC',
+         [utc(2026, 12, 27, 9), utc(2027, 12, 26, 9), utc(2028, 12, 31, 9)]),
+        # 09:00 in London on both sides of the spring change; UNTIL is 09:00 BST on the last day, inclusive
+        ('FREQ=DAILY;UNTIL=20260331T080000Z', utc(2026, 3, 27, 9), 'Europe/London',
+         [utc(2026, 3, 27, 9), utc(2026, 3, 28, 9), utc(2026, 3, 29, 8), utc(2026, 3, 30, 8), utc(2026, 3, 31, 8)]),
+        # And across the autumn change, with a date-only UNTIL covering the whole local day
+        ('FREQ=DAILY;UNTIL=20261026', utc(2026, 10, 24, 8), 'Europe/London',
+         [utc(2026, 10, 24, 8), utc(2026, 10, 25, 9), utc(2026, 10, 26, 9)]),
+        ('FREQ=WEEKLY;COUNT=3;BYDAY=MO,FR', utc(2026, 1, 1, 9), 'UTC',
+         [utc(2026, 1, 2, 9), utc(2026, 1, 5, 9), utc(2026, 1, 9, 9)]),
+    ]
+
+    def test_occurrences(self):
+        for rule, dtstart, zone, expected in self.cases:
+            with self.subTest(rule=rule, dtstart=dtstart):
+                occurrences = recurrence.iter_occurrences(rule, dtstart, zone, dtstart, utc(2033, 1, 1))
+                self.assertEqual([next(occurrences, None) for _ in expected], expected)
+                if 'COUNT' in rule or 'UNTIL' in rule:
+                    self.assertIsNone(next(occurrences, None))
+
+    def test_window_skips_ahead(self):
+        occurrences = recurrence.iter_occurrences('FREQ=MONTHLY;BYDAY=-1FR', utc(2020, 1, 1, 9), 'UTC',
+                                                  utc(2026, 5, 1), utc(2026, 7, 1))
+        self.assertEqual(list(occurrences), [utc(2026, 5, 29, 9), utc(2026, 6, 26, 9)])
+
+    def test_invalid_rules(self):
+        for rule in ('FREQ=HOURLY', 'FREQ=WEEKLY;BYDAY=1MO', 'FREQ=DAILY;BYMONTHDAY=0', 'FREQ=DAILY;UNTIL=2026'):
+            with self.subTest(rule=rule):
+                with self.assertRaises(recurrence.RecurrenceError):
+                    recurrence.parse_rule(rule)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create(name='Test', email='test@example.com', password_hash='!')
+        self.note = Note.objects.create(user=self.user, title='Diary', body='Entry')
+
+    def test_tag_change_invalidates_note_list(self):
+        first = self.client.get('/api/notes', {'user_id': self.user.id})
+        self.assertEqual(first.json()[0]['tags'], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            set_note_tags(self.note, ['work'])
+
+        revalidated = self.client.get('/api/notes', {'user_id': self.user.id}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(revalidated.status_code, 200)
+        self.assertEqual(revalidated.json()[0]['tags'], ['work'])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class WorkspaceRoundTripTests(TestCase):
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.source = User.objects.create(name='Source', email='source@example.com', password_hash='!')
+        self.target = User.objects.create(name='Target', email='target@example.com', password_hash='!')
+
+    def test_import_keeps_exported_timestamps(self):
+        long_ago = timezone.now() - timedelta(days=400)
+        Reminder.objects.create(user=self.source, title='Renew passport', reminder_date=long_ago)
+        Task.objects.create(user=self.source, title='Pack')
+        for i in range(3):
+            note = Note.objects.create(user=self.source, title=f'Diary {i}', body='Entry')
+            set_note_tags(note, ['daily'])
+        for i, model in enumerate((Reminder, Task, Note)):
+            for j, pk in enumerate(model.objects.filter(user=self.source).values_list('id', flat=True)):
+                model.objects.filter(id=pk).update(created_at=long_ago + timedelta(days=i * 10 + j),
+                                                   updated_at=long_ago + timedelta(days=i * 10 + j, hours=1))
+
+        lines = b''.join(workspace.export_lines(self.source.id)).decode().splitlines()
+        workspace.import_lines(self.target.id, lines)
+
+        for model in (Reminder, Task, Note):
+            exported = list(model.objects.filter(user=self.source).order_by('id').values_list(
+                'title', 'created_at', 'updated_at'))
+            imported = list(model.objects.filter(user=self.target).order_by('id').values_list(
+                'title', 'created_at', 'updated_at'))
+            self.assertEqual(imported, exported)
+        self.assertEqual(
+            list(Note.objects.filter(user=self.target).order_by('-created_at').values_list('title', flat=True)),
+            ['Diary 2', 'Diary 1', 'Diary 0'],
+        )
+
+    def test_import_forces_full_sync(self):
+        token = sync.encode_token(timezone.now())
+        Note.objects.create(user=self.source, title='Old', body='Entry')
+        Note.objects.filter(user=self.source).update(updated_at=timezone.now() - timedelta(days=400))
+        workspace.import_lines(self.target.id, b''.join(workspace.export_lines(self.source.id)).decode().splitlines())
+
+        changes = sync.changes_since(self.target.id, sync.decode_token(token))
+        self.assertTrue(changes['full'])
+        self.assertEqual([note['title'] for note in changes['notes']], ['Old'])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class NoteCreateTests(TestCase):
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create(name='Test', email='test@example.com', password_hash='!')
+
+    def test_note_and_tags_are_one_write(self):
+        with mock.patch('app.views.write', side_effect=lambda fn, *args, **kwargs: fn(*args, **kwargs)) as write:
+            response = self.client.post('/api/notes', {'user_id': self.user.id, 'title': 'Plan',
+                                                       'body': 'Ship it', 'tags': ['work', ' work', 'q3']},
+                                        format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        write.assert_called_once()
+        note = Note.objects.get(id=response.json()['id'])
+        self.assertEqual(sorted(NoteTag.objects.filter(note=note).values_list('tag__name', flat=True)), ['q3', 'work'])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class NotePatchTests(TestCase):
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create(name='Test', email='test@example.com', password_hash='!')
+        self.note = Note.objects.create(user=self.user, title='Diary', body='Dear diary 😀, today')
+
+    def patch(self, **data):
+        return self.client.patch(f'/api/notes/{self.note.id}', data, format='json')
+
+    def test_body_patch_records_revision(self):
+        response = self.patch(body='Dear diary 😀, yesterday', revision=0)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['revision'], 1)
+        self.note.refresh_from_db()
+        self.assertEqual(revisions.body_at(self.note, 0), 'Dear diary 😀, today')
+        self.assertEqual(revisions.body_at(self.note, 1), 'Dear diary 😀, yesterday')
+
+    def test_concurrent_body_patch_conflicts(self):
+        # Both requests read the note at revision 0 before either writes
+        stale = Note.objects.get(id=self.note.id)
+        self.assertEqual(self.patch(body='First', revision=0).status_code, 200)
+        with mock.patch.object(Note.objects, 'get', return_value=stale):
+            response = self.patch(body='Second', revision=0)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['revision'], 1)
+        self.note.refresh_from_db()
+        self.assertEqual((self.note.body, self.note.revision), ('First', 1))
+
+    def test_title_patch_keeps_concurrent_body(self):
+        stale = Note.objects.get(id=self.note.id)
+        self.assertEqual(self.patch(body='Rewritten').status_code, 200)
+        with mock.patch.object(Note.objects, 'get', return_value=stale):
+            self.assertEqual(self.patch(title='Renamed').status_code, 200)
+        self.note.refresh_from_db()
+        self.assertEqual((self.note.title, self.note.body, self.note.revision), ('Renamed', 'Rewritten', 1))
+
+
+    def test_conflicting_patch_leaves_tags(self):
+        set_note_tags(self.note, ['draft'])
+        stale = Note.objects.get(id=self.note.id)
+        self.assertEqual(self.patch(body='First', revision=0).status_code, 200)
+        with mock.patch.object(Note.objects, 'get', return_value=stale):
+            response = self.patch(body='Second', revision=0, tags=['final'])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(list(self.note.tags.values_list('tag__name', flat=True)), ['draft'])
+
+    def test_archive_keeps_concurrent_body(self):
+        stale = Note.objects.get(id=self.note.id)
+        self.assertEqual(self.patch(body='Rewritten').status_code, 200)
+        with mock.patch.object(Note.objects, 'get', return_value=stale):
+            self.assertEqual(self.client.delete(f'/api/notes/{self.note.id}').status_code, 204)
+        self.note.refresh_from_db()
+        self.assertEqual((self.note.is_archived, self.note.body, self.note.revision), (True, 'Rewritten', 1))
+
+
+class DiffPatchTests(TestCase):
+    def test_diff_patch_round_trips(self):
+        cases = [('', 'new'), ('same', 'same'), ('abc', 'abXc'), ('a😀b', 'a😃b'), ('😀', ''), ('x😀', 'x😀😀')]
+        for old, new in cases:
+            with self.subTest(old=old, new=new):
+                self.assertEqual(revisions.apply_patch(old, revisions.diff_patch(old, new)), new)
+
+
+class UploadTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.enterContext(self.settings(MEDIA_ROOT=media))
+        self.client = APIClient()
+
+    def test_cancelled_upload_leaves_no_part_file(self):
+        response = self.client.post('/api/attachments/uploads',
+                                    {'owner_type': 'note', 'owner_id': 1, 'filename': 'a.txt', 'size': 10},
+                                    format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        upload_id = response.json()['id']
+        self.client.put(f'/api/attachments/uploads/{upload_id}', b'hello', content_type='application/octet-stream',
+                        HTTP_CONTENT_RANGE='bytes 0-4/10')
+        part = attachments.part_path(upload_id)
+        self.assertTrue(os.path.exists(part))
+
+        self.assertEqual(self.client.delete(f'/api/attachments/uploads/{upload_id}').status_code, 204)
+        self.assertFalse(os.path.exists(part))
+        self.assertFalse(UploadSession.objects.exists())
+
+
+class UserUpdateTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create(name='Test', email='test@example.com', password_hash='!')
+
+    def test_password_change(self):
+        response = self.client.patch(f'/api/users/{self.user.id}/update', {'name': 'Renamed', 'password': 'hunter22'},
+                                     format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['name'], 'Renamed')
+        self.user.refresh_from_db()
+        self.assertTrue(check_password('hunter22', self.user.password_hash))
+
+    def test_rejects_bad_token(self):
+        response = self.client.patch(f'/api/users/{self.user.id}/update', {'name': 'Renamed'}, format='json',
+                                     HTTP_AUTHORIZATION='Bearer not-a-token')
+        self.assertEqual(response.status_code, 401)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, 'Test')
+
+
+class TokenRevocationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(name='Test', email='test@example.com', password_hash='!')
+        self.token = authentication.generate_tokens(self.user.id)['access']
+        self.index = authentication.RevocationIndex(capacity=100, refresh_interval=5)
+        self.enterContext(mock.patch.object(authentication, 'revocations', self.index))
+        self.enterContext(mock.patch.object(authentication, 'verified_tokens', authentication.LRUCache(100)))
+
+    def test_revoked_here(self):
+        verified = authentication.verify_token(self.token)
+        authentication.revoke_token(verified)
+        with self.assertRaisesMessage(AuthenticationFailed, 'revoked'):
+            authentication.verify_token(self.token)
+
+    def test_revoked_by_another_worker(self):
+        verified = authentication.verify_token(self.token)
+        # Written straight to the table, as another process would
+        TokenBlacklist.objects.create(user=self.user, jti=verified.jti, expires_at=verified.expires_at)
+        # Until this worker's next refresh the token still passes, within the documented bound
+        authentication.verify_token(self.token)
+        self.index.next_refresh = 0.0
+        with self.assertRaisesMessage(AuthenticationFailed, 'revoked'):
+            authentication.verify_token(self.token)
+
+    def test_false_positive_falls_back_to_database(self):
+        authentication.verify_token(self.token)
+        with mock.patch.object(authentication.BloomFilter, '__contains__', return_value=True):
+            with self.assertNumQueries(1):
+                verified = authentication.verify_token(self.token)
+        self.assertEqual(verified.user_id, self.user.id)
+
+    def test_refresh_queries_outside_the_lock(self):
+        load = self.index._load
+
+        def checked_load(*args):
+            self.assertFalse(self.index.lock.locked())
+            return load(*args)
+
+        with mock.patch.object(self.index, '_load', side_effect=checked_load) as loaded:
+            self.assertFalse(self.index.maybe_revoked('some-jti'))
+        loaded.assert_called_once()
+
+
+@override_settings(CACHES=TEST_CACHES)
+class BatchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create(name='Test', email='test@example.com', password_hash='!')
+        self.task = Task.objects.create(user=self.user, title='Pack')
+
+    def batch(self, *operations):
+        return self.client.post('/api/batch', {'user_id': self.user.id, 'operations': list(operations)}, format='json')
+
+    def test_applies_every_operation(self):
+        response = self.batch(
+            {'op': 'update', 'type': 'task', 'id': self.task.id, 'data': {'status': 'completed'}},
+            {'op': 'create', 'type': 'note', 'data': {'title': 'Hi', 'body': '<p>Hello</p>', 'tags': ['x']}},
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual([result['status'] for result in response.json()['results']], [200, 201])
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, 'completed')
+        note = Note.objects.get(user=self.user)
+        self.assertEqual((note.excerpt, list(note.tags.values_list('tag__name', flat=True))), ('Hello', ['x']))
+
+    def test_bad_operation_applies_nothing(self):
+        response = self.batch(
+            {'op': 'update', 'type': 'task', 'id': self.task.id, 'data': {'title': 'Unpack'}},
+            {'op': 'create', 'type': 'note', 'data': {'title': 'Hi'}},
+            {'op': 'delete', 'type': 'task', 'id': self.task.id + 100},
+            {'op': 'update', 'type': 'task', 'id': self.task.id, 'data': {'owner': 'someone'}},
+        )
+        self.assertEqual(response.status_code, 400)
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results], [424, 424, 404, 400])
+        self.assertIn('owner', results[3]['error'])
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.title, 'Pack')
+        self.assertFalse(Note.objects.exists())
+
+    def test_failed_write_rolls_back_earlier_ones(self):
+        with mock.patch('app.batch.set_note_tags', side_effect=RuntimeError('disk full')):
+            response = self.batch(
+                {'op': 'update', 'type': 'task', 'id': self.task.id, 'data': {'title': 'Unpack'}},
+                {'op': 'create', 'type': 'note', 'data': {'title': 'Hi', 'tags': ['x']}},
+                {'op': 'delete', 'type': 'task', 'id': self.task.id},
+            )
+        self.assertEqual(response.status_code, 400)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.title, 'Pack')
+        self.assertFalse(Note.objects.exists())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TaskOrderingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(name='Test', email='test@example.com', password_hash='!')
+        self.tasks = [Task.objects.create(user=self.user, title=title, order_index=(i + 1) * ordering.ORDER_STEP)
+                      for i, title in enumerate('ABCD')]
+
+    def titles(self):
+        return ''.join(Task.objects.filter(user=self.user).order_by('order_index', 'id').values_list('title', flat=True))
+
+    def test_moves(self):
+        a, b, c, d = self.tasks
+        ordering.move_task(d, prev_id=a.id)
+        self.assertEqual(self.titles(), 'ADBC')
+        ordering.move_task(a, next_id=c.id)
+        self.assertEqual(self.titles(), 'DBAC')
+        ordering.move_task(d)
+        self.assertEqual(self.titles(), 'BACD')
+
+    def test_rebalances_when_a_gap_runs_out(self):
+        a, b, c, d = self.tasks
+        # Moving tasks back and forth into the slot after A halves the gap each time
+        with mock.patch.object(ordering, 'rebalance', wraps=ordering.rebalance) as rebalance:
+            for i in range(80):
+                ordering.move_task(c if i % 2 else d, prev_id=a.id)
+        rebalance.assert_called()
+        self.assertEqual(self.titles(), 'ACDB')
+        indexes = list(Task.objects.filter(user=self.user).order_by('order_index').values_list('order_index', flat=True))
+        self.assertTrue(all(high - low > ordering.REBALANCE_GAP for low, high in zip(indexes, indexes[1:])))
+
+    def test_rebalance_renumbers_crowded_lists(self):
+        Task.objects.filter(id=self.tasks[1].id).update(order_index=ordering.ORDER_STEP + 1e-9)
+        self.assertEqual(list(ordering.users_needing_rebalance()), [self.user.id])
+        self.assertEqual(ordering.rebalance(self.user.id), 1)
+        self.assertEqual(self.titles(), 'ABCD')
+        self.assertEqual(list(ordering.users_needing_rebalance()), [])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TaskTreeTests(TestCase):
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create(name='Test', email='test@example.com', password_hash='!')
+        other = User.objects.create(name='Other', email='other@example.com', password_hash='!')
+        self.trip = Task.objects.create(user=self.user, title='Trip', order_index=1)
+        self.pack = Task.objects.create(user=self.user, title='Pack', parent_task=self.trip, order_index=2)
+        Task.objects.create(user=self.user, title='Socks', parent_task=self.pack, status='completed', order_index=3)
+        Task.objects.create(user=self.user, title='Tickets', parent_task=self.trip, status='completed', order_index=4)
+        Task.objects.create(user=self.user, title='Laundry', order_index=5)
+        self.foreign = Task.objects.create(user=other, title='Not mine', parent_task=self.pack)
+
+    def get(self, **params):
+        response = self.client.get('/api/tasks/tree', {'user_id': self.user.id, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_whole_tree(self):
+        with self.assertNumQueries(1):
+            roots = self.get()
+        self.assertEqual([root['title'] for root in roots], ['Trip', 'Laundry'])
+        trip = roots[0]
+        self.assertEqual([task['title'] for task in trip['subtasks']], ['Pack', 'Tickets'])
+        self.assertEqual((trip['subtask_count'], trip['completed_count']), (3, 2))
+        self.assertEqual([task['title'] for task in trip['subtasks'][0]['subtasks']], ['Socks'])
+
+    def test_rows_are_formatted_like_the_task_list(self):
+        Task.objects.filter(id=self.trip.id).update(due_date=utc(2026, 5, 1, 9))
+        for zone in ('UTC', 'Europe/London'):
+            with self.subTest(zone=zone), self.settings(TIME_ZONE=zone):
+                caches['responses'].clear()
+                listed = {task['id']: task for task in self.client.get('/api/tasks', {'user_id': self.user.id}).json()}
+                rows = {row['id']: row for row in tree.fetch_tasks(self.user.id)}
+                for task_id, row in rows.items():
+                    for name in ('created_at', 'updated_at', 'due_date'):
+                        self.assertEqual(row[name], listed[task_id][name])
+        self.assertEqual(rows[self.trip.id]['due_date'], '2026-05-01T10:00:00+01:00')
+
+    def test_subtree(self):
+        with self.assertNumQueries(1):
+            pack = self.get(root=self.pack.id)
+        self.assertEqual((pack['title'], pack['subtask_count'], pack['completed_count']), ('Pack', 1, 1))
+        self.assertEqual([task['title'] for task in pack['subtasks']], ['Socks'])
+
+    def test_other_users_subtree_is_not_found(self):
+        response = self.client.get('/api/tasks/tree', {'user_id': self.user.id, 'root': self.foreign.id})
+        self.assertEqual(response.status_code, 404)
+
+    def test_cycle_is_cut(self):
+        Task.objects.filter(id=self.trip.id).update(parent_task=self.pack)
+        rows = tree.fetch_tasks(self.user.id, self.trip.id)
+        [root] = tree.build_tree(rows, self.trip.id)
+        self.assertEqual((root['title'], root['subtask_count']), ('Trip', 3))
+
+
+@override_settings(THUMBNAIL_PREGENERATE=False, THUMBNAIL_SIZES=(64,), THUMBNAIL_FORMAT='JPEG')
+class ThumbnailCacheTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        self.enterContext(self.settings(MEDIA_ROOT=self.media))
+        self.cache = thumbnails.DiskCache()
+        self.enterContext(mock.patch.object(thumbnails, 'disk_cache', self.cache))
+
+    def thumbnail(self, name, size, age):
+        path = os.path.join(self.cache.root(), name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+        os.utime(path, (time.time() - age, time.time() - age))
+        return path
+
+    def test_evicts_least_recently_used(self):
+        old = self.thumbnail('aa/old.jpg', 400, age=300)
+        touched = self.thumbnail('aa/touched.jpg', 400, age=200)
+        middle = self.thumbnail('aa/middle.jpg', 400, age=100)
+        self.cache.touch(touched)
+        with self.settings(THUMBNAIL_CACHE_MAX_BYTES=1000):
+            self.cache.added(middle)
+            self.assertEqual(self.cache.total, 800)
+            # Evicts down to 90% of the limit, oldest first
+            self.cache.added(self.thumbnail('bb/new.jpg', 400, age=0))
+        self.assertEqual(sorted(os.listdir(os.path.dirname(old))), ['touched.jpg'])
+        self.assertTrue(os.path.exists(os.path.join(self.cache.root(), 'bb/new.jpg')))
+        self.assertEqual(self.cache.total, 800)
+
+    def test_renders_once_and_reuses(self):
+        source = os.path.join(self.media, 'photo.png')
+        Image.new('RGB', (300, 200), 'red').save(source)
+        attachment = mock.Mock(id=1, blob_id=None, mime_type='image/png', file=mock.Mock(path=source))
+        with mock.patch.object(thumbnails, 'render', wraps=thumbnails.render) as render:
+            thumbnails.open_thumbnail(attachment, 64).close()
+            with thumbnails.open_thumbnail(attachment, 64) as f:
+                self.assertEqual(Image.open(f).size, (64, 43))
+        render.assert_called_once()
+        with self.assertRaises(thumbnails.ThumbnailError):
+            thumbnails.open_thumbnail(attachment, 512)
+
+
+class MinifierTests(TestCase):
+    js_cases = [
+        # Strings keep their spacing and anything that looks like a comment
+        ('var a = "a  // not a comment";  // comment', 'var a="a  // not a comment";'),
+        ("var s = 'it\\'s   /* kept */';", "var s='it\\'s   /* kept */';"),
+        # Regex literals, including an escaped slash and a slash in a class, against division
+        ('x = /ab+c\\/ d[/]/g.test(s);', 'x=/ab+c\\/ d[/]/g.test(s);'),
+        ('function f(s) {\n  return /x y/.test(s);\n}', 'function f(s){return/x y/.test(s);}'),
+        ('a = b / c / d;', 'a=b/c/d;'),
+        # Line breaks that automatic semicolon insertion depends on are kept
+        ('let a = 1\nlet b = 2\n', 'let a=1\nlet b=2'),
+        ('return\nx', 'return\nx'),
+        ('a\n++b', 'a\n++b'),
+        ('/* block\n comment */ if (a) {\n  b();\n}\nelse {\n  c()\n}', 'if(a){b();}\nelse{c()}'),
+        # Spaces that keep tokens apart
+        ('a + +b; c - -d;', 'a+ +b;c- -d;'),
+        ('x = 1 .toString()', 'x=1 .toString()'),
+        ('const t = `a  ${ b + `c ${ {k: 1}.k }` }  e`;', 'const t=`a  ${b+`c ${{k:1}.k}`}  e`;'),
+    ]
+
+    def test_minify_js(self):
+        for source, expected in self.js_cases:
+            with self.subTest(source=source):
+                self.assertEqual(staticfiles.minify_js(source), expected + '\n')
+
+    def test_minify_css(self):
+        source = 'a  {  color: red ;  content: "a  ;  b" }\nb > c , d { margin : 0 ; }'
+        self.assertEqual(staticfiles.minify_css(source), 'a{color:red;content:"a  ;  b"}b>c,d{margin :0}\n')
+
+    @skipUnless(shutil.which('node'), 'needs node')
+    def test_minified_app_js_parses(self):
+        with open(os.path.join(settings.BASE_DIR, 'static', 'js', 'app.js')) as f:
+            minified = staticfiles.minify_js(f.read())
+        with tempfile.NamedTemporaryFile('w', suffix='.js') as f:
+            f.write(minified)
+            f.flush()
+            result = subprocess.run(['node', '--check', f.name], capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+
+class EventReplayTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create(name='Test', email='test@example.com', password_hash='!')
+        other = User.objects.create(name='Other', email='other@example.com', password_hash='!')
+        reminder = Reminder.objects.create(user=self.user, title='Call Sam', reminder_date=timezone.now())
+        now = timezone.now()
+        self.seen = Notification.objects.create(user=self.user, reminder=reminder, notify_at=now)
+        self.missed = Notification.objects.create(user=self.user, reminder=reminder, notify_at=now + timedelta(seconds=1))
+        Notification.objects.create(user=self.user, reminder=reminder, notify_at=now, channel='email')
+        Notification.objects.create(user=other, notify_at=now)
+        Notification.objects.create(user=self.user, notify_at=now + timedelta(seconds=2), status='failed')
+        self.token = authentication.generate_tokens(self.user.id)['access']
+
+    def event_ids(self, body):
+        return [int(line[4:]) for line in body.splitlines() if line.startswith('id: ')]
+
+    def test_replays_missed_events_after_last_event_id(self):
+        response = self.client.get('/api/events', HTTP_AUTHORIZATION=f'Bearer {self.token}',
+                                   HTTP_LAST_EVENT_ID=str(self.seen.id))
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertEqual(self.event_ids(body), [self.missed.id])
+        self.assertIn('"title":"Call Sam"', body)
+
+    def test_first_connection_gets_an_id_to_resume_from(self):
+        response = self.client.get('/api/events', {'token': self.token})
+        body = response.content.decode()
+        self.assertIn('event: ready', body)
+        self.assertEqual(self.event_ids(body), [Notification.objects.latest('id').id])
+
+    async def test_stream_replays_then_goes_live(self):
+        with self.settings(EVENTS_POLL_SECONDS=0, EVENTS_HEARTBEAT_SECONDS=5, EVENTS_STREAM_SECONDS=5):
+            stream = events.stream(self.user.id, last_event_id=self.seen.id)
+            try:
+                self.assertTrue((await anext(stream)).startswith('retry:'))
+                self.assertEqual(self.event_ids(await anext(stream)), [self.missed.id])
+                live = await Notification.objects.acreate(user_id=self.user.id, notify_at=timezone.now())
+                self.assertEqual(self.event_ids(await asyncio.wait_for(anext(stream), 5)), [live.id])
+            finally:
+                await stream.aclose()
+
+    def test_rejects_bad_token(self):
+        self.assertEqual(self.client.get('/api/events', {'token': 'nope'}).status_code, 401)
+
+
+class FakeSMTPConnection:
+    """Stands in for an SMTP backend, failing sends as `failures` says: one entry per send, None to deliver."""
+
+    def __init__(self, failures, sent, **kwargs):
+        self.failures = failures
+        self.sent = sent
+        self.closed = False
+
+    def open(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def send_messages(self, messages):
+        failure = self.failures.pop(0) if self.failures else None
+        if failure is not None:
+            raise failure
+        self.sent.extend((id(self), message.to[0]) for message in messages)
+        return len(messages)
+
+
+class DigestRetryTests(TestCase):
+    def setUp(self):
+        self.backend = mailer.EmailDigestBackend('email')
+        self.addCleanup(self.backend.close)
+        self.failures = []
+        self.sent = []
+        self.backend.pool = mailer.ConnectionPool(
+            max_messages=100, idle_seconds=60,
+            factory=lambda **kwargs: FakeSMTPConnection(self.failures, self.sent, **kwargs),
+        )
+
+    def digests(self, *recipients):
+        return [(EmailMessage('Reminder', 'Due now', 'keizen@example.com', [to]), [n])
+                for n, to in enumerate(recipients, 1)]
+
+    def test_disconnect_is_retried_on_a_new_connection(self):
+        self.failures[:] = [smtplib.SMTPServerDisconnected('idle timeout')]
+        failed = self.backend.send_run(self.digests('a@example.com', 'b@example.com'))
+        self.assertEqual(failed, set())
+        self.assertEqual([to for _, to in self.sent], ['a@example.com', 'b@example.com'])
+        self.assertEqual(len({connection for connection, _ in self.sent}), 1)
+        self.assertEqual(self.backend.pool.opened, 2)
+
+    def test_refusal_fails_only_that_message(self):
+        self.failures[:] = [None, smtplib.SMTPRecipientsRefused({'b@example.com': (550, b'No such user')}), None]
+        with self.assertLogs('app.mailer', 'WARNING'):
+            failed = self.backend.send_run(self.digests('a@example.com', 'b@example.com', 'c@example.com'))
+        self.assertEqual(failed, {2})
+        self.assertEqual([to for _, to in self.sent], ['a@example.com', 'c@example.com'])
+        self.assertEqual(self.backend.pool.opened, 1)
+
+    def test_second_disconnect_fails_the_message(self):
+        self.failures[:] = [smtplib.SMTPServerDisconnected('gone'), smtplib.SMTPServerDisconnected('gone')]
+        with self.assertLogs('app.mailer', 'WARNING'):
+            failed = self.backend.send_run(self.digests('a@example.com', 'b@example.com'))
+        self.assertEqual(failed, {1})
+        self.assertEqual([to for _, to in self.sent], ['b@example.com'])
+        self.assertEqual(self.backend.pool.opened, 3)
@@ -0,0 +1,181 @@
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIR = 'thumbnails'
+FORMATS = {'WEBP': ('webp', 'image/webp'), 'JPEG': ('jpg', 'image/jpeg')}
+
+
+class ThumbnailError(Exception):
+    pass
+
+
+def sizes():
+    return getattr(settings, 'THUMBNAIL_SIZES', (128, 512))
+
+
+def output_format():
+    return getattr(settings, 'THUMBNAIL_FORMAT', 'WEBP')
+
+
+def is_image(attachment):
+    return attachment.mime_type.startswith('image/')
+
+
+def cache_name(attachment, size):
+    # Blob-backed thumbnails are shared by every attachment with the same bytes.
+    source = attachment.blob.sha256 if attachment.blob_id else f'attachment-{attachment.id}'
+    extension = FORMATS[output_format()][0]
+    return f'{THUMBNAIL_DIR}/{source[:2]}/{source}-{size}.{extension}'
+
+
+def content_type():
+    return FORMATS[output_format()][1]
+
+
+def render(source_path, target_path, size):
+    """
+    Write a thumbnail of the image at `source_path` that fits in a size x size box.
+
+    draft() lets the JPEG decoder scale down by up to 8x while decoding, so
+    a large photo is never fully decoded just to be shrunk.
+    """
+    temp_path = f'{target_path}.{uuid.uuid4().hex}.tmp'
+    try:
+        with Image.open(source_path) as image:
+            image.draft('RGB', (size, size))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            if output_format() == 'JPEG' and image.mode != 'RGB':
+                image = image.convert('RGB')
+            elif image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            image.save(temp_path, output_format(), quality=80)
+        os.replace(temp_path, target_path)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise ThumbnailError(f'Cannot make a thumbnail: {e}')
+
+
+class DiskCache:
+    """
+    Size bound for the thumbnail directory with least-recently-used eviction.
+
+    Recency is the file's mtime, refreshed on every hit. The running total
+    is kept per process and recounted from disk whenever it crosses the limit,
+    so other workers' additions are picked up at eviction time.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.total = None
+
+    def root(self):
+        return default_storage.path(THUMBNAIL_DIR)
+
+    def _scan(self):
+        entries = []
+        for directory, _, files in os.walk(self.root()):
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def touch(self, path):
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+    def added(self, path):
+        limit = getattr(settings, 'THUMBNAIL_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+        with self.lock:
+            if self.total is None:
+                self.total = sum(size for _, size, _ in self._scan())
+            else:
+                self.total += os.path.getsize(path)
+            if self.total <= limit:
+                return
+            # Evict down to 90% so the next few additions don't each trigger a scan.
+            entries = sorted(self._scan())
+            self.total = sum(size for _, size, _ in entries)
+            for _, size, old_path in entries:
+                if self.total <= limit * 0.9:
+                    break
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    continue
+                self.total -= size
+
+
+disk_cache = DiskCache()
+
+
+def open_thumbnail(attachment, size):
+    """
+    Open the attachment's thumbnail at `size`, generating it on first use.
+
+    Returns an open file rather than a path: eviction in this or another
+    process may delete the file at any time, and an open handle survives that.
+    """
+    if size not in sizes():
+        raise ThumbnailError(f'size must be one of {", ".join(str(s) for s in sizes())}')
+    if not is_image(attachment):
+        raise ThumbnailError('Attachment is not an image')
+    path = default_storage.path(cache_name(attachment, size))
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        pass
+    else:
+        disk_cache.touch(path)
+        return f
+    if not os.path.exists(attachment.file.path):
+        raise FileNotFoundError(attachment.file.path)
+    render(attachment.file.path, path, size)
+    f = open(path, 'rb')
+    disk_cache.added(path)
+    return f
+
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='thumbnails')
+    return _executor
+
+
+def _pregenerate(attachment):
+    for size in sizes():
+        try:
+            open_thumbnail(attachment, size).close()
+        except ThumbnailError as e:
+            logger.info('No thumbnail for attachment %s: %s', attachment.id, e)
+            return
+        except Exception:
+            logger.exception('Thumbnail generation failed for attachment %s', attachment.id)
+            return
+
+
+def pregenerate(attachment):
+    """Render every configured size in the background, so the first view is already cached."""
+    if is_image(attachment) and getattr(settings, 'THUMBNAIL_PREGENERATE', True):
+        get_executor().submit(_pregenerate, attachment)
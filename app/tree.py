@@ -0,0 +1,79 @@
+from django.db.models.expressions import RawSQL
+
+from .models import Task
+from .projections import TASKS
+
+SUBTREE_IDS = """
+    WITH RECURSIVE subtree(id) AS (
+        SELECT id FROM app_task WHERE id = %s AND user_id = %s
+        UNION
+        SELECT t.id FROM app_task t JOIN subtree s ON t.parent_task_id = s.id
+    )
+    SELECT id FROM subtree
+"""
+
+
+def fetch_tasks(user_id, root_id=None):
+    """
+    All of a user's tasks, or one task and its descendants, in a single query.
+    The subtree is walked with a recursive CTE over the parent_task index.
+    Rows are formatted like every other task endpoint's.
+    """
+    tasks = Task.objects.filter(user_id=user_id)
+    if root_id is not None:
+        tasks = tasks.filter(id__in=RawSQL(SUBTREE_IDS, (root_id, user_id)))
+    fields = TASKS.field_names
+    return TASKS.format(TASKS.values(tasks.order_by('order_index', 'id'), fields), fields)
+
+
+def build_tree(rows, root_id=None):
+    """
+    Nest flat task rows under their parents in O(n) and roll up, for every
+    node, how many descendants it has and how many of them are completed.
+    Rows keep their order_index order among siblings.
+    """
+    nodes = {}
+    for row in rows:
+        row['subtasks'] = []
+        row['subtask_count'] = 0
+        row['completed_count'] = 0
+        nodes[row['id']] = row
+
+    roots = []
+    for row in rows:
+        parent = nodes.get(row['parent_task'])
+        if parent is None or row['id'] == root_id:
+            roots.append(row)
+        else:
+            parent['subtasks'].append(row)
+
+    # Iterative walk from the roots. Rows caught in a parent_task cycle
+    # (possible through a bad PATCH) are unreachable from any root, so the
+    # cycle is cut at its first row, which becomes a root itself.
+    visited = set()
+    order = []
+
+    def walk(root):
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node['id'] in visited:
+                continue
+            visited.add(node['id'])
+            order.append(node)
+            stack.extend(node['subtasks'])
+
+    for root in roots:
+        walk(root)
+    for row in rows:
+        if row['id'] not in visited:
+            nodes[row['parent_task']]['subtasks'].remove(row)
+            roots.append(row)
+            walk(row)
+
+    for node in reversed(order):
+        for child in node['subtasks']:
+            node['subtask_count'] += 1 + child['subtask_count']
+            node['completed_count'] += (child['status'] == 'completed') + child['completed_count']
+
+    return roots
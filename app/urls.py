@@ -8,17 +8,35 @@ urlpatterns = [
     path('auth/admin-password-reset', views.admin_password_reset, name='admin_password_reset'),
     
     path('reminders', views.reminder_list, name='reminder_list'),
+    path('reminders/occurrences', views.reminder_occurrences, name='reminder_occurrences'),
     path('reminders/<int:reminder_id>', views.reminder_detail, name='reminder_detail'),
     
     path('tasks', views.task_list, name='task_list'),
+    path('tasks/tree', views.task_tree, name='task_tree'),
     path('tasks/<int:task_id>', views.task_detail, name='task_detail'),
+    path('tasks/<int:task_id>/reorder', views.task_reorder, name='task_reorder'),
     
     path('notes', views.note_list, name='note_list'),
     path('notes/<int:note_id>', views.note_detail, name='note_detail'),
+    path('notes/<int:note_id>/edits', views.note_edit, name='note_edit'),
+    path('notes/<int:note_id>/revisions', views.note_revisions, name='note_revisions'),
     path('notes/search', views.search_notes, name='search_notes'),
     
+    path('_metrics', views.metrics, name='metrics'),
+    path('events', views.event_stream, name='event_stream'),
+    path('dashboard', views.dashboard, name='dashboard'),
+    path('sync', views.sync, name='sync'),
+    path('batch', views.batch, name='batch'),
+    path('export', views.workspace_export, name='workspace_export'),
+    path('import', views.workspace_import, name='workspace_import'),
+    
     path('users/<int:user_id>', views.user_profile, name='user_profile'),
     path('users/<int:user_id>/update', views.user_update, name='user_update'),
     
     path('attachments/upload', views.upload_attachment, name='upload_attachment'),
+    path('attachments/uploads', views.upload_start, name='upload_start'),
+    path('attachments/uploads/<uuid:upload_id>', views.upload_detail, name='upload_detail'),
+    path('attachments/<int:attachment_id>', views.attachment_detail, name='attachment_detail'),
+    path('attachments/<int:attachment_id>/download', views.attachment_download, name='attachment_download'),
+    path('attachments/<int:attachment_id>/thumbnail', views.attachment_thumbnail, name='attachment_thumbnail'),
 ]
@@ -2,56 +2,99 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from django.contrib.auth.hashers import make_password, check_password
+from rest_framework.exceptions import AuthenticationFailed
+from asgiref.sync import sync_to_async
 from django.utils import timezone
-from django.db import models
-from django.shortcuts import render
-from datetime import timedelta
-import jwt
-import os
+from django.db import models, transaction
+from django.conf import settings
+from django.contrib.staticfiles.views import serve as staticfiles_serve
+from django.core.handlers.asgi import ASGIRequest
+from django.core.exceptions import SuspiciousFileOperation
+from django.template.loader import render_to_string
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header, parse_etags
+from django.utils._os import safe_join
+from django.views.decorators.http import require_safe
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time, timedelta
+import gzip
+import hashlib
+import hmac
 import json
+import mimetypes
+import os
 
-from .models import User, Reminder, Task, Note, Tag, NoteTag, Attachment, Notification, TokenBlacklist
-from .serializers import UserSerializer, ReminderSerializer, TaskSerializer, NoteSerializer, TagSerializer, AttachmentSerializer, NotificationSerializer
+from .models import User, Reminder, Task, Note, NoteRevision, Tag, NoteTag, Attachment, Notification, UploadSession
+from .serializers import UserSerializer, ReminderSerializer, TaskSerializer, NoteSerializer, NotePreviewSerializer, TagSerializer, AttachmentSerializer, NotificationSerializer
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, is_paginated, paginate
+from .tags import clean_tag_names, set_note_tags
+from . import search
+from .dashboard import get_dashboard
+from .recurrence import merge_occurrences, parse_rule
+from .sync import changes_since, decode_token
+from .batch import run_batch
+from .ordering import move_task
+from .tree import build_tree, fetch_tasks
+from .authentication import JWTAuthentication, generate_tokens, prune_revoked_tokens, revoke_token, verify_token
+from .hashing import ahash_password, averify
+from .response_cache import cached_response
+from .write_queue import write
+from . import attachments
+from . import events
+from . import revisions
+from . import thumbnails
+from . import staticfiles
+from . import instrumentation
+from . import projections
+from . import workspace
 
-SECRET_KEY = os.environ.get('SECRET_KEY', 'django-insecure-test-key')
+def _auth_payload(request):
+    if request.content_type == 'application/json':
+        data = json.loads(request.body or b'{}')
+        if not isinstance(data, dict):
+            raise ValueError('Expected a JSON object')
+        return data
+    return request.POST
 
-def generate_tokens(user_id):
-    import jwt
-    import datetime
-    payload = {
-        'user_id': user_id,
-        'iat': datetime.datetime.utcnow(),
-        'exp': datetime.datetime.utcnow() + datetime.timedelta(days=7)
-    }
-    access_token = jwt.encode(payload, SECRET_KEY, algorithm='HS256')
-    return {'access': access_token, 'refresh': access_token}
 
-@api_view(['POST'])
-@permission_classes([AllowAny])
-def register(request):
+def _auth_view(view):
+    # Plain Django async views: DRF's api_view does not run coroutines, and
+    # the password hash is awaited on app.hashing's pool instead of blocking.
+    async def wrapper(request):
+        if request.method != 'POST':
+            return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+        try:
+            data = _auth_payload(request)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return await view(request, data)
+    wrapper.__name__ = view.__name__
+    wrapper.csrf_exempt = True
+    return wrapper
+
+
+@_auth_view
+async def register(request, data):
     try:
-        data = request.data
-        
         # Validate required fields
         required_fields = ['name', 'email', 'password']
         for field in required_fields:
             if not data.get(field):
-                return Response({'error': f'Missing required field: {field}'}, status=status.HTTP_400_BAD_REQUEST)
+                return JsonResponse({'error': f'Missing required field: {field}'}, status=status.HTTP_400_BAD_REQUEST)
         
-        if User.objects.filter(email=data.get('email')).exists():
-            return Response({'error': 'Email already exists'}, status=status.HTTP_400_BAD_REQUEST)
+        if await User.objects.filter(email=data.get('email')).aexists():
+            return JsonResponse({'error': 'Email already exists'}, status=status.HTTP_400_BAD_REQUEST)
         
-        user = User.objects.create(
+        user = await User.objects.acreate(
             name=data.get('name'),
             email=data.get('email'),
-            password_hash=make_password(data.get('password')),
+            password_hash=await ahash_password(data.get('password')),
             timezone=data.get('timezone', 'UTC')
         )
         
         tokens = generate_tokens(user.id)
         
-        return Response({
+        return JsonResponse({
             'access': tokens['access'],
             'refresh': tokens['refresh'],
             'user': UserSerializer(user).data
@@ -60,67 +103,77 @@ def register(request):
         print(f'Registration error: {str(e)}')
         import traceback
         traceback.print_exc()
-        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-@api_view(['POST'])
-@permission_classes([AllowAny])
-def login(request):
+@_auth_view
+async def login(request, data):
     try:
-        data = request.data
-        
         # Validate required fields
         if not data.get('email'):
-            return Response({'error': 'Missing required field: email'}, status=status.HTTP_400_BAD_REQUEST)
+            return JsonResponse({'error': 'Missing required field: email'}, status=status.HTTP_400_BAD_REQUEST)
         if not data.get('password'):
-            return Response({'error': 'Missing required field: password'}, status=status.HTTP_400_BAD_REQUEST)
+            return JsonResponse({'error': 'Missing required field: password'}, status=status.HTTP_400_BAD_REQUEST)
         
-        user = User.objects.get(email=data.get('email'))
+        user = await User.objects.aget(email=data.get('email'))
         
-        if not check_password(data.get('password'), user.password_hash):
-            return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
+        valid, new_hash = await averify(data.get('password'), user.password_hash)
+        if not valid:
+            return JsonResponse({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
+        if new_hash:
+            # Stored hash predates the current hasher settings; upgrade it now that we know the password.
+            await User.objects.filter(id=user.id, password_hash=user.password_hash).aupdate(password_hash=new_hash)
         
         tokens = generate_tokens(user.id)
         
-        return Response({
+        return JsonResponse({
             'access': tokens['access'],
             'refresh': tokens['refresh'],
             'user': UserSerializer(user).data
         }, status=status.HTTP_200_OK)
     except User.DoesNotExist:
-        return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+        return JsonResponse({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         print(f'Login error: {str(e)}')
         import traceback
         traceback.print_exc()
-        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def logout(request):
     try:
-        token = request.auth
-        user_id = request.user.id if hasattr(request, 'user') else jwt.decode(str(token), SECRET_KEY, algorithms=['HS256']).get('user_id')
-        TokenBlacklist.objects.create(user_id=user_id, token=str(token))
+        revoke_token(request.auth)
+        prune_revoked_tokens()
         return Response({'message': 'Logged out successfully'}, status=status.HTTP_200_OK)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['GET', 'POST'])
+@cached_response('reminders')
 def reminder_list(request):
     try:
         user_id = request.query_params.get('user_id') if request.method == 'GET' else request.data.get('user_id')
         
         if request.method == 'GET':
-            reminders = Reminder.objects.filter(user_id=user_id).order_by('-reminder_date')
-            serializer = ReminderSerializer(reminders, many=True)
-            return Response(serializer.data)
+            fields = projections.REMINDERS.parse_fields(request)
+            reminders = projections.REMINDERS.values(Reminder.objects.filter(user_id=user_id), fields, 'reminder_date')
+            if is_paginated(request):
+                page, next_cursor = paginate(request, reminders, 'reminder_date', descending=True)
+                return Response({'results': projections.REMINDERS.format(page, fields), 'next': next_cursor})
+            return Response(projections.REMINDERS.format(reminders.order_by('-reminder_date'), fields))
         
-        reminder = Reminder.objects.create(
+        recurrence_rule = request.data.get('recurrence_rule', '')
+        if recurrence_rule:
+            parse_rule(recurrence_rule)
+        
+        reminder = write(
+            Reminder.objects.create,
             user_id=user_id,
             title=request.data.get('title'),
             description=request.data.get('description', ''),
             reminder_date=request.data.get('reminder_date'),
             timezone=request.data.get('timezone', 'UTC'),
+            recurrence_rule=recurrence_rule,
             category=request.data.get('category', 'personal')
         )
         return Response(ReminderSerializer(reminder).data, status=status.HTTP_201_CREATED)
@@ -135,30 +188,80 @@ def reminder_detail(request, reminder_id):
         if request.method == 'GET':
             return Response(ReminderSerializer(reminder).data)
         elif request.method == 'PATCH':
+            if request.data.get('recurrence_rule'):
+                parse_rule(request.data['recurrence_rule'])
             for field, value in request.data.items():
                 if hasattr(reminder, field):
                     setattr(reminder, field, value)
-            reminder.save()
+            write(reminder.save)
             return Response(ReminderSerializer(reminder).data)
         elif request.method == 'DELETE':
-            reminder.delete()
+            write(reminder.delete)
             return Response(status=status.HTTP_204_NO_CONTENT)
     except Reminder.DoesNotExist:
         return Response({'error': 'Reminder not found'}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+MAX_OCCURRENCE_WINDOW = timedelta(days=366)
+MAX_OCCURRENCES = 2000
+
+def parse_window_bound(value, default):
+    if not value:
+        return default
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid date: {value}')
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.utc)
+    return parsed
+
+@api_view(['GET'])
+def reminder_occurrences(request):
+    try:
+        user_id = request.query_params.get('user_id')
+        start = parse_window_bound(request.query_params.get('start'), timezone.now())
+        end = parse_window_bound(request.query_params.get('end'), start + timedelta(days=30))
+        if end <= start or end - start > MAX_OCCURRENCE_WINDOW:
+            return Response({'error': 'Window must be positive and at most 366 days'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(int(request.query_params.get('limit', 500)), MAX_OCCURRENCES))
+        
+        # Recurring reminders can fire in the window whenever they started;
+        # one-off reminders only if their own date falls inside it.
+        reminders = Reminder.objects.filter(user_id=user_id, reminder_date__lt=end).filter(
+            ~models.Q(recurrence_rule='') | models.Q(reminder_date__gte=start)
+        ).only('id', 'title', 'category', 'status', 'reminder_date', 'timezone', 'recurrence_rule')
+        
+        occurrences = merge_occurrences(reminders, start, end, limit)
+        return Response([{
+            'reminder_id': reminder.id,
+            'title': reminder.title,
+            'category': reminder.category,
+            'status': reminder.status,
+            'occurs_at': occurs_at,
+        } for occurs_at, reminder in occurrences])
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
 @api_view(['GET', 'POST'])
+@cached_response('tasks')
 def task_list(request):
     try:
         user_id = request.query_params.get('user_id') if request.method == 'GET' else request.data.get('user_id')
         
         if request.method == 'GET':
-            tasks = Task.objects.filter(user_id=user_id).order_by('order_index')
-            serializer = TaskSerializer(tasks, many=True)
-            return Response(serializer.data)
+            fields = projections.TASKS.parse_fields(request)
+            tasks = projections.TASKS.values(Task.objects.filter(user_id=user_id), fields, 'order_index')
+            if is_paginated(request):
+                page, next_cursor = paginate(request, tasks, 'order_index')
+                return Response({'results': projections.TASKS.format(page, fields), 'next': next_cursor})
+            return Response(projections.TASKS.format(tasks.order_by('order_index'), fields))
         
-        task = Task.objects.create(
+        task = write(
+            Task.objects.create,
             user_id=user_id,
             title=request.data.get('title'),
             description=request.data.get('description', ''),
@@ -181,37 +284,72 @@ def task_detail(request, task_id):
             for field, value in request.data.items():
                 if hasattr(task, field):
                     setattr(task, field, value)
-            task.save()
+            write(task.save)
             return Response(TaskSerializer(task).data)
         elif request.method == 'DELETE':
-            task.delete()
+            write(task.delete)
             return Response(status=status.HTTP_204_NO_CONTENT)
     except Task.DoesNotExist:
         return Response({'error': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['GET'])
+@cached_response('task-tree')
+def task_tree(request):
+    try:
+        user_id = request.query_params.get('user_id')
+        root_id = request.query_params.get('root')
+        root_id = int(root_id) if root_id else None
+        rows = fetch_tasks(user_id, root_id)
+        if root_id is not None and not rows:
+            return Response({'error': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
+        tree = build_tree(rows, root_id)
+        return Response(tree[0] if root_id is not None else tree)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['POST'])
+def task_reorder(request, task_id):
+    try:
+        task = Task.objects.get(id=task_id)
+        move_task(task, prev_id=request.data.get('prev_id'), next_id=request.data.get('next_id'))
+        return Response(TaskSerializer(task).data)
+    except Task.DoesNotExist:
+        return Response({'error': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
 @api_view(['GET', 'POST'])
+@cached_response('notes')
 def note_list(request):
     try:
         user_id = request.query_params.get('user_id') if request.method == 'GET' else request.data.get('user_id')
         
         if request.method == 'GET':
-            notes = Note.objects.filter(user_id=user_id, is_archived=False).order_by('-created_at')
-            serializer = NoteSerializer(notes, many=True)
-            return Response(serializer.data)
-        
-        note = Note.objects.create(
-            user_id=user_id,
-            title=request.data.get('title'),
-            body=request.data.get('body', '')
-        )
+            # Bodies stay out of the query unless ?fields= asks for them; the
+            # stored excerpt stands in, and note_detail returns the whole note.
+            fields = projections.NOTES.parse_fields(request)
+            notes = projections.NOTES.values(Note.objects.filter(user_id=user_id, is_archived=False), fields, 'created_at')
+            if is_paginated(request):
+                page, next_cursor = paginate(request, notes, 'created_at', descending=True)
+                return Response({'results': projections.NOTES.format(page, fields), 'next': next_cursor})
+            return Response(projections.NOTES.format(notes.order_by('-created_at'), fields))
         
         tags = request.data.get('tags', [])
-        for tag_name in tags:
-            tag, created = Tag.objects.get_or_create(user_id=user_id, name=tag_name)
-            NoteTag.objects.create(note=note, tag=tag)
         
+        def create_note():
+            # One write, so the coalescer commits the note and its tags together
+            note = Note.objects.create(
+                user_id=user_id,
+                title=request.data.get('title'),
+                body=request.data.get('body', '')
+            )
+            if tags:
+                set_note_tags(note, tags, replace=False)
+            return note
+        
+        note = write(create_note)
         return Response(NoteSerializer(note).data, status=status.HTTP_201_CREATED)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -224,26 +362,136 @@ def note_detail(request, note_id):
         if request.method == 'GET':
             return Response(NoteSerializer(note).data)
         elif request.method == 'PATCH':
+            # An optional `revision` makes the write conditional on the note not having changed since
+            base = request.data.get('revision')
+            base = note.revision if base is None else int(base)
+            if base != note.revision:
+                return Response({'error': 'Revision conflict', 'revision': note.revision},
+                                status=status.HTTP_409_CONFLICT)
+            changed = {'updated_at'}
             for field, value in request.data.items():
-                if field == 'tags':
-                    NoteTag.objects.filter(note=note).delete()
-                    for tag_name in value:
-                        tag, created = Tag.objects.get_or_create(user_id=note.user_id, name=tag_name)
-                        NoteTag.objects.create(note=note, tag=tag)
+                if field in ('body', 'revision', 'tags', *Note.PREVIEW_FIELDS):
+                    continue
                 elif hasattr(note, field):
                     setattr(note, field, value)
-            note.save()
+                    changed.add(field)
+            with transaction.atomic():
+                if 'body' in request.data:
+                    # Through the revisioned path, which re-checks `base` in a conditional UPDATE
+                    patch = revisions.diff_patch(note.body, str(request.data['body'] or ''))
+                    revisions.edit_note(note.id, base, patch)
+                # Only the fields sent, so a concurrent body edit is never overwritten
+                note.save(update_fields=list(changed))
+                # After the revision check, so a 409 leaves the tags as they were too
+                if 'tags' in request.data:
+                    set_note_tags(note, request.data['tags'])
+            note.refresh_from_db()
             return Response(NoteSerializer(note).data)
         elif request.method == 'DELETE':
             note.is_archived = True
-            note.save()
+            # Not the body or revision read above, which a revisioned edit may have moved past
+            note.save(update_fields=['is_archived', 'updated_at'])
             return Response(status=status.HTTP_204_NO_CONTENT)
+    except revisions.RevisionConflict as e:
+        return Response({'error': 'Revision conflict', 'revision': e.revision}, status=status.HTTP_409_CONFLICT)
     except Note.DoesNotExist:
         return Response({'error': 'Note not found'}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['POST'])
+def note_edit(request, note_id):
+    """
+    Apply a patch to a note's body: {"revision": <base>, "patch": [[start, end, text], ...], "title"?}.
+    Answers with just the new revision, or 409 with the current one.
+    """
+    try:
+        title = request.data.get('title')
+        note = revisions.edit_note(note_id, int(request.data.get('revision')), request.data.get('patch'),
+                                   title=None if title is None else str(title))
+        return Response({'id': note.id, 'revision': note.revision, 'updated_at': note.updated_at})
+    except revisions.RevisionConflict as e:
+        return Response({'error': 'Revision conflict', 'revision': e.revision}, status=status.HTTP_409_CONFLICT)
+    except Note.DoesNotExist:
+        return Response({'error': 'Note not found'}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['GET'])
+def note_revisions(request, note_id):
+    try:
+        note = Note.objects.get(id=note_id)
+        revision = request.query_params.get('revision')
+        if revision is None:
+            history = NoteRevision.objects.filter(note=note).order_by('-revision').values(
+                'revision', 'kind', 'created_at')
+            return Response({'revision': note.revision, 'history': list(history)})
+        body = revisions.body_at(note, int(revision))
+        if body is None:
+            return Response({'error': 'Revision not in history'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'id': note.id, 'revision': int(revision), 'body': body})
+    except Note.DoesNotExist:
+        return Response({'error': 'Note not found'}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['GET'])
+def dashboard(request):
+    try:
+        user_id = request.query_params.get('user_id')
+        return Response(get_dashboard(int(user_id)))
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['GET'])
+def sync(request):
+    try:
+        user_id = request.query_params.get('user_id')
+        since = request.query_params.get('since')
+        return Response(changes_since(user_id, decode_token(since) if since else None))
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['POST'])
+def batch(request):
+    try:
+        user_id = request.data.get('user_id')
+        ok, results = run_batch(int(user_id), request.data.get('operations'))
+        return Response({'results': results}, status=status.HTTP_200_OK if ok else status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
 @api_view(['GET'])
+def workspace_export(request):
+    """The user's tags, reminders, tasks and notes as a streamed NDJSON download."""
+    try:
+        user_id = int(request.query_params.get('user_id'))
+        if not User.objects.filter(id=user_id).exists():
+            return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+    except (TypeError, ValueError):
+        return Response({'error': 'user_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+    response = StreamingHttpResponse(workspace.export_lines(user_id), content_type='application/x-ndjson')
+    response['Content-Disposition'] = content_disposition_header(True, f'remonal-workspace-{user_id}.ndjson')
+    return response
+
+@api_view(['POST'])
+def workspace_import(request):
+    """Load an NDJSON export into the user's workspace, reading the body line by line."""
+    try:
+        user_id = int(request.query_params.get('user_id'))
+        if not User.objects.filter(id=user_id).exists():
+            return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+        if request.stream is None:
+            raise ValueError('Request body is empty')
+        counts = workspace.import_lines(user_id, iter(request.stream.readline, b''))
+        return Response({'imported': counts}, status=status.HTTP_201_CREATED)
+    except workspace.WorkspaceImportError as e:
+        return Response({'error': str(e), 'errors': e.errors}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['GET'])
+@cached_response('profile')
 def user_profile(request, user_id):
     try:
         user = User.objects.get(id=user_id)
@@ -251,31 +499,59 @@ def user_profile(request, user_id):
     except User.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
-@api_view(['PATCH'])
-def user_update(request, user_id):
+async def user_update(request, user_id):
+    # A plain async view, like register and login, so a password change
+    # awaits its hash on app.hashing's pool instead of holding the worker.
+    if request.method != 'PATCH':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
     try:
-        user = User.objects.get(id=user_id)
-        for field, value in request.data.items():
+        # What DRF's authentication would have done: a bad token is still a 401
+        await sync_to_async(JWTAuthentication().authenticate)(request)
+    except AuthenticationFailed as e:
+        response = JsonResponse({'detail': str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+        response['WWW-Authenticate'] = JWTAuthentication().authenticate_header(request)
+        return response
+    try:
+        data = _auth_payload(request)
+        user = await User.objects.aget(id=user_id)
+        for field, value in data.items():
             if field == 'password':
-                user.password_hash = make_password(value)
+                user.password_hash = await ahash_password(value)
             elif hasattr(user, field):
                 setattr(user, field, value)
-        user.save()
-        return Response(UserSerializer(user).data)
+        await user.asave()
+        return JsonResponse(UserSerializer(user).data)
     except User.DoesNotExist:
-        return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+        return JsonResponse({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
-        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+user_update.csrf_exempt = True
 
 @api_view(['GET'])
 def search_notes(request):
     try:
         user_id = request.query_params.get('user_id')
         query = request.query_params.get('q', '')
+        tags = clean_tag_names(request.query_params.get('tags', '').split(','))
+
+        if query.strip() and search.fts_available():
+            limit = min(int(request.query_params.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+            notes = search.search_notes(user_id, query, tags=tags, limit=limit)
+            if notes is not None:
+                data = NotePreviewSerializer(notes, many=True).data
+                for item, note in zip(data, notes):
+                    item['rank'] = note.rank
+                    item['snippet'] = note.snippet
+                return Response(data)
+
         notes = Note.objects.filter(user_id=user_id, is_archived=False).filter(
             models.Q(title__icontains=query) | models.Q(body__icontains=query)
-        ).order_by('-created_at')
-        serializer = NoteSerializer(notes, many=True)
+        )
+        for tag in tags:
+            notes = notes.filter(tags__tag__name=tag)
+        notes = NoteSerializer.prefetch_tags(notes.defer('body').order_by('-created_at'))
+        serializer = NotePreviewSerializer(notes, many=True)
         return Response(serializer.data)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -287,19 +563,246 @@ def upload_attachment(request):
         owner_type = request.data.get('owner_type')
         owner_id = request.data.get('owner_id')
         
-        attachment = Attachment.objects.create(
-            owner_type=owner_type,
-            owner_id=owner_id,
-            file=file,
-            mime_type=file.content_type,
-            size=file.size
-        )
+        attachment = attachments.save_uploaded_file(file, owner_type, owner_id)
         return Response(AttachmentSerializer(attachment).data, status=status.HTTP_201_CREATED)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+def upload_state(session, attachment=None):
+    return {
+        'id': str(session.id),
+        'size': session.size,
+        'offset': session.received,
+        'attachment': AttachmentSerializer(attachment).data if attachment else None,
+    }
+
+@api_view(['POST'])
+def upload_start(request):
+    try:
+        session = attachments.start_upload(
+            owner_type=request.data.get('owner_type'),
+            owner_id=int(request.data.get('owner_id')),
+            filename=request.data.get('filename', ''),
+            mime_type=request.data.get('mime_type', ''),
+            size=int(request.data.get('size')),
+        )
+        attachment = attachments.finish_upload(session) if session.size == 0 else None
+        return Response(upload_state(session, attachment), status=status.HTTP_201_CREATED)
+    except attachments.UploadError as e:
+        return Response({'error': str(e)}, status=e.status)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['GET', 'PUT', 'DELETE'])
+def upload_detail(request, upload_id):
+    try:
+        session = UploadSession.objects.get(id=upload_id)
+        
+        if request.method == 'GET':
+            return Response(upload_state(session))
+        elif request.method == 'PUT':
+            start, end = attachments.parse_content_range(request.headers.get('Content-Range'), session)
+            attachment = attachments.append_chunk(session, start, end, request.stream)
+            return Response(upload_state(session, attachment),
+                            status=status.HTTP_201_CREATED if attachment else status.HTTP_200_OK)
+        elif request.method == 'DELETE':
+            attachments.cancel_upload(session)
+            attachments.prune_uploads()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+    except UploadSession.DoesNotExist:
+        return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+    except attachments.UploadError as e:
+        return Response({'error': str(e), 'offset': session.received}, status=e.status)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['GET', 'DELETE'])
+def attachment_detail(request, attachment_id):
+    try:
+        attachment = Attachment.objects.select_related('blob').get(id=attachment_id)
+        
+        if request.method == 'GET':
+            return Response(AttachmentSerializer(attachment).data)
+        elif request.method == 'DELETE':
+            attachment.delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+    except Attachment.DoesNotExist:
+        return Response({'error': 'Attachment not found'}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+@require_safe
+def attachment_download(request, attachment_id):
+    """
+    Serve an attachment's bytes with single-range Range support. Whole-file
+    responses go through FileResponse, which the WSGI server can hand to
+    sendfile; ranges are streamed a chunk at a time.
+    """
+    try:
+        attachment = Attachment.objects.select_related('blob').get(id=attachment_id)
+        path = attachment.file.path
+        size = os.path.getsize(path)
+    except (Attachment.DoesNotExist, FileNotFoundError):
+        return JsonResponse({'error': 'Attachment not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    filename = attachment.filename or os.path.basename(path)
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'Content-Disposition': content_disposition_header(False, filename),
+    }
+    etag = f'"{attachment.blob.sha256}"' if attachment.blob_id else None
+    if etag:
+        # Content-addressed, so an attachment's bytes never change.
+        headers['ETag'] = etag
+        headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    byte_range = None
+    if etag is None or request.headers.get('If-Range', etag) == etag:
+        try:
+            byte_range = attachments.parse_range(request.headers.get('Range'), size)
+        except ValueError:
+            return HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                                headers={**headers, 'Content-Range': f'bytes */{size}'})
+
+    if byte_range is None:
+        status_code, start, length = status.HTTP_200_OK, 0, size
+    else:
+        start, end = byte_range
+        status_code, length = status.HTTP_206_PARTIAL_CONTENT, end - start + 1
+        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+
+    if request.method == 'HEAD':
+        response = HttpResponse(status=status_code, content_type=attachment.mime_type, headers=headers)
+    elif byte_range is None:
+        response = FileResponse(open(path, 'rb'), filename=filename, status=status_code,
+                                content_type=attachment.mime_type, headers=headers)
+    else:
+        response = StreamingHttpResponse(attachments.iter_range(path, start, length), status=status_code,
+                                         content_type=attachment.mime_type, headers=headers)
+    response['Content-Length'] = str(length)
+    return response
+
+@require_safe
+def attachment_thumbnail(request, attachment_id):
+    """A resized copy of an image attachment, rendered on first request and then served from disk."""
+    try:
+        attachment = Attachment.objects.select_related('blob').get(id=attachment_id)
+        size = int(request.GET.get('size', thumbnails.sizes()[0]))
+    except Attachment.DoesNotExist:
+        return JsonResponse({'error': 'Attachment not found'}, status=status.HTTP_404_NOT_FOUND)
+    except ValueError:
+        return JsonResponse({'error': 'size must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+    etag = f'"{os.path.basename(thumbnails.cache_name(attachment, size))}"'
+    headers = {'ETag': etag, 'Cache-Control': 'private, max-age=31536000, immutable'}
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    try:
+        thumbnail = thumbnails.open_thumbnail(attachment, size)
+    except thumbnails.ThumbnailError as e:
+        return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except FileNotFoundError:
+        return JsonResponse({'error': 'Attachment not found'}, status=status.HTTP_404_NOT_FOUND)
+    return FileResponse(thumbnail, content_type=thumbnails.content_type(), headers=headers)
+
+_index_page = None
+
+def _render_index():
+    # The page has no per-request content, so outside DEBUG it is rendered
+    # once per process, with the hashed asset names baked in.
+    global _index_page
+    if _index_page is None or settings.DEBUG:
+        body = render_to_string('index.html').encode('utf-8')
+        _index_page = {
+            'body': body,
+            'gzip': gzip.compress(body, compresslevel=9, mtime=0),
+            'etag': f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+        }
+    return _index_page
+
+@require_safe
 def index(request):
-    return render(request, 'index.html')
+    page = _render_index()
+    # no-cache: browsers revalidate, so a deploy's new asset names show up at once.
+    headers = {'ETag': page['etag'], 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+    if page['etag'] in parse_etags(request.headers.get('If-None-Match', '')):
+        return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if staticfiles.accepts_gzip(request):
+        response = HttpResponse(page['gzip'], content_type='text/html; charset=utf-8', headers=headers)
+        response['Content-Encoding'] = 'gzip'
+        return response
+    return HttpResponse(page['body'], content_type='text/html; charset=utf-8', headers=headers)
+
+@require_safe
+def metrics(request):
+    """Per-route request metrics of this process, in Prometheus text format."""
+    token = settings.METRICS_TOKEN
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return JsonResponse({'error': 'Invalid metrics token'}, status=status.HTTP_401_UNAUTHORIZED)
+    return HttpResponse(instrumentation.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+async def event_stream(request):
+    """
+    Server-Sent Events of the user's due reminders (see app/events.py).
+
+    EventSource cannot send headers, so the token may also come as ?token=,
+    and the last seen event as ?last_event_id= when resuming after a reload.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    auth = request.headers.get('Authorization', '').split()
+    token = auth[1] if len(auth) == 2 and auth[0].lower() == 'bearer' else request.GET.get('token')
+    if not token:
+        return JsonResponse({'error': 'Authentication credentials were not provided.'}, status=status.HTTP_401_UNAUTHORIZED)
+    try:
+        verified = await sync_to_async(verify_token)(token)
+    except AuthenticationFailed as e:
+        return JsonResponse({'error': str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+
+    last_event_id = events.parse_last_event_id(
+        request.headers.get('Last-Event-ID') or request.GET.get('last_event_id'))
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(events.stream(verified.user_id, last_event_id),
+                                         content_type='text/event-stream')
+    else:
+        # A WSGI worker thread must not be held open: answer now and let the client reconnect
+        response = HttpResponse(await events.pending(verified.user_id, last_event_id),
+                                content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@require_safe
+def static_file(request, path):
+    """
+    Serve a collected static file, preferring its precompressed .gz variant.
+
+    Fingerprinted names never change content, so they are cached for
+    STATIC_MAX_AGE without revalidation. In DEBUG files come straight from
+    the source directories, as runserver does.
+    """
+    if settings.DEBUG:
+        return staticfiles_serve(request, path)
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Static file not found')
+    if not os.path.isfile(full_path):
+        raise Http404('Static file not found')
+
+    content_type, _ = mimetypes.guess_type(full_path)
+    headers = {'Vary': 'Accept-Encoding'}
+    if staticfiles.is_hashed(path):
+        headers['Cache-Control'] = f'public, max-age={settings.STATIC_MAX_AGE}, immutable'
+    else:
+        headers['Cache-Control'] = 'public, max-age=300'
+    if staticfiles.accepts_gzip(request) and os.path.isfile(full_path + '.gz'):
+        full_path += '.gz'
+        headers['Content-Encoding'] = 'gzip'
+    return FileResponse(open(full_path, 'rb'), content_type=content_type or 'application/octet-stream',
+                        headers=headers)
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
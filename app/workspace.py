@@ -0,0 +1,249 @@
+"""
+Whole-workspace export and import as NDJSON: one JSON object per line, each
+with a "type" of workspace, tag, reminder, task or note.
+
+Export walks each model with iterator() and formats rows in chunks through
+the list projections, so memory stays flat whatever the workspace size.
+Import validates each record as batch creates are validated and writes
+them with bulk_create in batches, in one transaction that is rolled back if
+any record is invalid.
+"""
+import json
+from datetime import timezone as dt_timezone
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from . import projections
+from .batch import READ_ONLY_FIELDS, REQUIRED_ON_CREATE, OperationError, apply_data
+from .models import User, Reminder, Task, Note, Tag, NoteTag
+from .response_cache import bump_user_version
+from .serializers import ReminderSerializer, TaskSerializer, NoteSerializer
+from .tags import clean_tag_names, get_or_create_tags
+
+FORMAT_VERSION = 1
+EXPORT_CHUNK = 2000
+IMPORT_BATCH = 2000
+MAX_ERRORS = 20
+TIMESTAMP_FIELDS = ('created_at', 'updated_at')
+
+TYPES = {
+    'reminder': (Reminder, ReminderSerializer, projections.REMINDERS),
+    'task': (Task, TaskSerializer, projections.TASKS),
+    'note': (Note, NoteSerializer, projections.NOTES),
+}
+
+
+class WorkspaceImportError(Exception):
+    def __init__(self, errors):
+        super().__init__(errors[0])
+        self.errors = errors
+
+
+def _line(record):
+    return json.dumps(record, separators=(',', ':'), ensure_ascii=False) + '\n'
+
+
+def export_lines(user_id):
+    """
+    Yield the user's workspace as NDJSON, one encoded chunk of lines at a time.
+
+    Records keep their ids so that a task's parent_task can be matched up on
+    import; the ids themselves are not reused.
+    """
+    yield _line({'type': 'workspace', 'format': FORMAT_VERSION, 'exported_at': timezone.now().isoformat()}).encode()
+
+    names = Tag.objects.filter(user_id=user_id).order_by('name').values_list('name', flat=True)
+    tag_rows = names.iterator(chunk_size=EXPORT_CHUNK)
+    while chunk := list(islice(tag_rows, EXPORT_CHUNK)):
+        yield ''.join(_line({'type': 'tag', 'name': name}) for name in chunk).encode()
+
+    for type_name, (model, _, projection) in TYPES.items():
+        # Note previews and revisions are left out: imported notes derive
+        # them from body again and start a new history.
+        fields = [name for name in projection.field_names if name not in ('user', 'revision', *Note.PREVIEW_FIELDS)]
+        rows = projection.values(model.objects.filter(user_id=user_id), fields).order_by('id')
+        rows = rows.iterator(chunk_size=EXPORT_CHUNK)
+        while chunk := list(islice(rows, EXPORT_CHUNK)):
+            yield ''.join(_line({'type': type_name, **item}) for item in projection.format(chunk, fields)).encode()
+
+
+def exported_timestamps(instance, record):
+    """The record's created_at and updated_at, to be restored after the insert stamps its own."""
+    timestamps = {}
+    for name in TIMESTAMP_FIELDS:
+        value = record.get(name)
+        if value in (None, ''):
+            continue
+        try:
+            value = instance._meta.get_field(name).to_python(value)
+        except ValidationError as e:
+            raise OperationError(f'{name}: {" ".join(e.messages)}')
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value, dt_timezone.utc)
+        timestamps[name] = value
+    return timestamps
+
+
+class Importer:
+    """Accumulates validated records and writes them in bulk batches."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.pending = {type_name: [] for type_name in TYPES}
+        self.counts = {'tag': 0, **{type_name: 0 for type_name in TYPES}}
+        self.tag_names = {}
+        self.task_ids = {}  # exported task id -> new id
+        self.task_parents = []  # (task, exported parent id)
+        # Set once a record fails: the rest are still validated, but writing
+        # them is pointless as the transaction will be rolled back.
+        self.failed = False
+
+    def add(self, record):
+        if not isinstance(record, dict):
+            raise OperationError('Record must be a JSON object')
+        type_name = record.pop('type', None)
+        if type_name == 'workspace':
+            if record.get('format', FORMAT_VERSION) != FORMAT_VERSION:
+                raise OperationError(f'Unsupported export format: {record.get("format")}')
+            return
+        if type_name == 'tag':
+            names = clean_tag_names([record.get('name')])
+            if not names:
+                raise OperationError('Tag name is required')
+            self.tag_names.setdefault(names[0], None)
+            return
+        if type_name not in TYPES:
+            raise OperationError(f'Unknown type: {type_name}')
+
+        model, serializer_class, _ = TYPES[type_name]
+        missing = [name for name in REQUIRED_ON_CREATE[type_name] if record.get(name) in (None, '')]
+        if missing:
+            raise OperationError(f'Missing required field: {missing[0]}')
+        exported_id = record.get('id')
+        parent_id = record.pop('parent_task', None) if type_name == 'task' else None
+        tags = record.get('tags') or []
+        if type_name == 'note' and not isinstance(tags, list):
+            raise OperationError('tags must be a list')
+
+        instance = model(user_id=self.user_id)
+        apply_data(instance, serializer_class, {
+            name: value for name, value in record.items() if name not in READ_ONLY_FIELDS or name == 'tags'
+        })
+        if type_name == 'note':
+            instance.update_preview()
+        timestamps = exported_timestamps(instance, record)
+        self.pending[type_name].append((instance, exported_id, parent_id, clean_tag_names(tags), timestamps))
+        if len(self.pending[type_name]) >= IMPORT_BATCH:
+            self.flush(type_name)
+
+    def flush(self, type_name):
+        pending, self.pending[type_name] = self.pending[type_name], []
+        if not pending or self.failed:
+            return
+        model = TYPES[type_name][0]
+        model.objects.bulk_create([instance for instance, *_ in pending])
+        self.counts[type_name] += len(pending)
+
+        # bulk_create stamps auto_now(_add) fields with the import time; bulk_update does not
+        restored = []
+        for instance, *_, timestamps in pending:
+            if timestamps:
+                for name, value in timestamps.items():
+                    setattr(instance, name, value)
+                restored.append(instance)
+        if restored:
+            model.objects.bulk_update(restored, TIMESTAMP_FIELDS, batch_size=500)
+
+        if type_name == 'task':
+            for instance, exported_id, parent_id, *_ in pending:
+                if exported_id is not None:
+                    self.task_ids[exported_id] = instance.id
+                if parent_id is not None:
+                    self.task_parents.append((instance, parent_id))
+        elif type_name == 'note':
+            names = clean_tag_names(name for _, _, _, tags, _ in pending for name in tags)
+            if names:
+                tags = get_or_create_tags(self.user_id, names)
+                NoteTag.objects.bulk_create([
+                    NoteTag(note_id=instance.id, tag_id=tags[name].id)
+                    for instance, _, _, note_tags, _ in pending for name in note_tags
+                ])
+                self.tag_names.update(dict.fromkeys(names))
+
+    def finish(self):
+        for type_name in TYPES:
+            self.flush(type_name)
+        if self.tag_names:
+            get_or_create_tags(self.user_id, list(self.tag_names))
+        self.counts['tag'] = len(self.tag_names)
+
+        errors = []
+        for instance, parent_id in self.task_parents:
+            if parent_id not in self.task_ids:
+                errors.append(f'Task "{instance.title}": parent_task {parent_id} is not in the import')
+            instance.parent_task_id = self.task_ids.get(parent_id)
+        if not errors:
+            errors = [f'Task "{instance.title}": parent_task chain loops' for instance in _cycles(self.task_parents)]
+        if errors:
+            raise WorkspaceImportError(errors[:MAX_ERRORS])
+        Task.objects.bulk_update([instance for instance, _ in self.task_parents], ['parent_task'], batch_size=500)
+        return self.counts
+
+
+def _cycles(task_parents):
+    """Tasks whose chain of parents runs into a loop."""
+    parents = {instance.id: instance.parent_task_id for instance, _ in task_parents}
+    acyclic = set()
+    found = []
+    for instance, _ in task_parents:
+        chain, node = set(), instance.id
+        while node in parents and node not in acyclic:
+            if node in chain:
+                found.append(instance)
+                break
+            chain.add(node)
+            node = parents[node]
+        else:
+            acyclic.update(chain)
+    return found[:MAX_ERRORS]
+
+
+def import_lines(user_id, lines):
+    """
+    Import NDJSON records (an iterable of lines) into the user's workspace.
+    Records keep their exported created_at and updated_at.
+
+    Everything is written in one transaction: if any record is invalid,
+    WorkspaceImportError lists the first MAX_ERRORS problems by line number
+    and nothing is kept. Returns the number of records imported per type.
+    """
+    importer = Importer(user_id)
+    errors = []
+    with transaction.atomic():
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                importer.failed = True
+                errors.append(f'line {number}: invalid JSON ({getattr(e, "msg", e)})')
+                if len(errors) >= MAX_ERRORS:
+                    break
+                continue
+            try:
+                importer.add(record)
+            except (ValueError, OperationError) as e:
+                importer.failed = True
+                errors.append(f'line {number}: {e}')
+                if len(errors) >= MAX_ERRORS:
+                    break
+        if errors:
+            raise WorkspaceImportError(errors)
+        counts = importer.finish()
+        User.objects.filter(id=user_id).update(imported_at=timezone.now())
+        bump_user_version(user_id)
+    return counts
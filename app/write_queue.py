@@ -0,0 +1,92 @@
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+MAX_GROUP = 64
+
+
+class WriteCoalescer:
+    """
+    Runs write functions on one background thread, committing whatever has
+    queued up meanwhile in a single transaction.
+
+    SQLite allows one writer at a time and every commit pays for a WAL sync,
+    so many request threads each doing a tiny write mostly wait on each
+    other. Funnelling them through one thread removes that contention inside
+    the process and shares each commit across the group. Every write runs in
+    its own savepoint: a failing one raises in its caller and leaves the rest
+    of the group unaffected. Callers only return once the group has committed.
+    """
+
+    def __init__(self, max_group=MAX_GROUP):
+        self.max_group = max_group
+        self.queue = queue.SimpleQueue()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        self.queue.put((future, fn, args, kwargs))
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='write-coalescer', daemon=True)
+                self.thread.start()
+        return future
+
+    def _next_group(self):
+        group = [self.queue.get()]
+        while len(group) < self.max_group:
+            try:
+                group.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return group
+
+    def _run(self):
+        while True:
+            group = self._next_group()
+            close_old_connections()
+            outcomes = []
+            try:
+                with transaction.atomic():
+                    for future, fn, args, kwargs in group:
+                        if not future.set_running_or_notify_cancel():
+                            continue
+                        try:
+                            with transaction.atomic():
+                                outcomes.append((future, fn(*args, **kwargs), None))
+                        except Exception as e:
+                            outcomes.append((future, None, e))
+            except Exception as e:
+                logger.exception('Write group of %s failed to commit', len(group))
+                for future, _, _, _ in group:
+                    if future.running():
+                        future.set_exception(e)
+                continue
+            for future, result, error in outcomes:
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+
+coalescer = WriteCoalescer()
+
+
+def write(fn, *args, **kwargs):
+    """
+    Call fn(*args, **kwargs), through the write coalescer when
+    SQLITE_WRITE_COALESCING is on, and return its result.
+
+    Inside an open transaction the call runs inline: the caller already holds
+    the write lock the coalescer thread would have to wait for.
+    """
+    if not getattr(settings, 'SQLITE_WRITE_COALESCING', False) or connection.in_atomic_block:
+        return fn(*args, **kwargs)
+    return coalescer.submit(fn, *args, **kwargs).result()
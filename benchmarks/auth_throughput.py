@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+Measure login throughput and its effect on other endpoints' latency.
+
+Threads stand in for a threaded gunicorn worker: some post to /api/auth/login
+in a loop while one probe thread times GET /api/tasks. Each run caps the
+password-hashing pool at a different size; a pool as large as the number of
+login threads behaves like hashing inline. Uses a throwaway database file:
+
+    python benchmarks/auth_throughput.py --login-threads 8 --hash-workers 1,2,8
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sojibWebApp.settings')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from django.conf import settings
+
+# Threads need a database they can share, which ':memory:' is not.
+DB_FILE = tempfile.NamedTemporaryFile(suffix='.sqlite3', delete=False).name
+settings.DATABASES['default']['NAME'] = DB_FILE
+django.setup()
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.test import Client
+
+from app import hashing
+from app.models import User, Task
+
+PASSWORD = 'benchmark-password'
+
+
+def seed(task_count):
+    user = User.objects.create(name='Bench', email='bench@example.com', password_hash=make_password(PASSWORD))
+    Task.objects.bulk_create([Task(user=user, title=f'Task {i}', order_index=i) for i in range(task_count)])
+    return user
+
+
+def percentile(samples, fraction):
+    return round(samples[min(len(samples) - 1, int(len(samples) * fraction))], 2)
+
+
+def run(user, login_threads, duration):
+    stop = threading.Event()
+    logins = []
+    probe = []
+
+    def log_in():
+        client = Client()
+        count = 0
+        while not stop.is_set():
+            response = client.post('/api/auth/login', {'email': user.email, 'password': PASSWORD},
+                                   content_type='application/json')
+            assert response.status_code == 200, response.content
+            count += 1
+        logins.append(count)
+
+    def time_tasks():
+        client = Client()
+        while not stop.is_set():
+            start = time.perf_counter()
+            client.get(f'/api/tasks?user_id={user.id}')
+            probe.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=log_in) for _ in range(login_threads)]
+    threads.append(threading.Thread(target=time_tasks))
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    probe.sort()
+    return {
+        'logins_per_s': round(sum(logins) / duration, 1),
+        'tasks_p50_ms': round(statistics.median(probe), 2),
+        'tasks_p95_ms': percentile(probe, 0.95),
+        'tasks_p99_ms': percentile(probe, 0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--login-threads', type=int, default=8)
+    parser.add_argument('--hash-workers', default='1,2,8', help='comma-separated pool sizes to compare')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per run')
+    parser.add_argument('--tasks', type=int, default=200)
+    args = parser.parse_args()
+
+    try:
+        call_command('migrate', verbosity=0)
+        user = seed(args.tasks)
+        print(f'Profile {settings.PASSWORD_HASHER_PROFILE}, {args.login_threads} login threads, '
+              f'{os.cpu_count()} CPUs')
+        print('no logins:', run(user, 0, min(args.duration, 3.0)))
+        for workers in [int(w) for w in args.hash_workers.split(',')]:
+            settings.PASSWORD_HASH_WORKERS = workers
+            hashing._executor = None
+            print(f'hash workers {workers}:', run(user, args.login_threads, args.duration))
+    finally:
+        os.unlink(DB_FILE)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+"""
+Send email notification digests to a local SMTP stand-in and report messages per second.
+
+Starts a minimal SMTP server on 127.0.0.1 that accepts and discards mail,
+seeds users with due reminders, and runs the notifier over the `email`
+channel with a new connection per message, one reused connection, and a
+pool of reused connections. Runs against a throwaway in-memory database,
+never db.sqlite3:
+
+    python benchmarks/email_digest.py --users 500 --reminders 3 --latency-ms 10
+
+--latency-ms delays the greeting and each message's reply, as a remote
+server would; --fail-rate makes the server turn away that fraction of
+messages with a temporary error, to exercise retries.
+"""
+import argparse
+import json
+import os
+import random
+import socketserver
+import sys
+import threading
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sojibWebApp.settings')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from django.conf import settings
+
+settings.DATABASES['default']['NAME'] = ':memory:'
+django.setup()
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from app import loadtest, notifier
+from app.models import Reminder, Notification
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        time.sleep(server.latency)
+        self.reply('220 localhost stand-in ESMTP')
+        while line := self.rfile.readline():
+            command = line[:4].upper()
+            if command in (b'EHLO', b'HELO'):
+                self.reply('250 localhost')
+            elif command in (b'MAIL', b'RCPT', b'RSET', b'NOOP'):
+                self.reply('250 OK')
+            elif command == b'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while (line := self.rfile.readline()) and line != b'.\r\n':
+                    pass
+                time.sleep(server.latency)
+                with server.lock:
+                    rejected = server.random.random() < server.fail_rate
+                    server.messages += not rejected
+                self.reply('451 Try again later' if rejected else '250 Queued')
+            elif command == b'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency, fail_rate):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.random = random.Random(0)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--reminders', type=int, default=3, help='Due reminders per user.')
+    parser.add_argument('--batch-size', type=int, default=500, help='Notifications claimed per batch.')
+    parser.add_argument('--latency-ms', type=float, default=10.0)
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = SMTPStandIn(args.latency_ms / 1000, args.fail_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+    settings.EMAIL_HOST, settings.EMAIL_PORT = server.server_address
+    settings.EMAIL_USE_TLS = settings.EMAIL_USE_SSL = False
+    settings.EMAIL_HOST_USER = settings.EMAIL_HOST_PASSWORD = ''
+    settings.NOTIFICATION_CHANNELS = ['email']
+    settings.NOTIFICATION_BACKENDS = {**settings.NOTIFICATION_BACKENDS, 'email': 'app.mailer.EmailDigestBackend'}
+    # Retries fall due at once, so each run also drains them
+    settings.NOTIFICATION_RETRY_BASE_SECONDS = 0
+
+    call_command('migrate', verbosity=0)
+    print(f'Seeding {args.users} users with {args.reminders} due reminders each...')
+    loadtest.seed(users=args.users, reminders=args.reminders, tasks=0, notes=0, tags=0)
+    Reminder.objects.update(reminder_date=timezone.now(), status='pending')
+
+    cases = [
+        ('new connection per message', 1, 1),
+        ('one reused connection', 1, 1000),
+        (f'pool of {settings.EMAIL_POOL_SIZE} reused connections', settings.EMAIL_POOL_SIZE, 1000),
+    ]
+    for name, pool_size, max_messages in cases:
+        Notification.objects.all().delete()
+        settings.EMAIL_POOL_SIZE = pool_size
+        settings.EMAIL_MAX_MESSAGES_PER_CONNECTION = max_messages
+        server.connections = server.messages = 0
+        metrics = notifier.Metrics()
+
+        started = time.perf_counter()
+        notifier.run_once(batch_size=args.batch_size, metrics=metrics)
+        notifier.close_backends()
+        elapsed = time.perf_counter() - started
+
+        report = metrics.report()
+        print(f'{name}:', json.dumps({
+            'notifications': report['sent'] + report['failed'],
+            'messages': server.messages,
+            'connections': server.connections,
+            'retried': report['retried'],
+            'failed': report['failed'],
+            'seconds': round(elapsed, 2),
+            'messages_per_second': round(server.messages / elapsed, 1),
+        }))
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
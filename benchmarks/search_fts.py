@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Compare FTS5 note search with the LIKE fallback.
+
+Runs against a throwaway in-memory database, never db.sqlite3:
+
+    python benchmarks/search_fts.py --notes 100000 --queries 50
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sojibWebApp.settings')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from django.conf import settings
+
+settings.DATABASES['default']['NAME'] = ':memory:'
+django.setup()
+
+from django.core.management import call_command
+from django.db import models
+
+from app import search
+from app.models import User, Note
+
+SYLLABLES = 'ka lo mi re su ta ne vo ri pa de lu gi mo sa te'.split()
+VOCABULARY_SIZE = 20000
+
+
+def build_vocabulary(rng):
+    """Synthetic words with Zipf-like frequencies, so some terms are common and most are rare."""
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add(''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    words = sorted(words)
+    rng.shuffle(words)
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+    return words, weights
+
+
+def seed(note_count, words, weights, rng):
+    user = User.objects.create(name='Bench', email='bench@example.com', password_hash='!')
+    batch = []
+    for i in range(note_count):
+        batch.append(Note(
+            user=user,
+            title=' '.join(rng.choices(words, weights, k=4)),
+            body=' '.join(rng.choices(words, weights, k=rng.randint(40, 200))),
+        ))
+        if len(batch) == 5000:
+            Note.objects.bulk_create(batch)
+            batch = []
+    Note.objects.bulk_create(batch)
+    return user
+
+
+def timed(fn, queries):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'p50_ms': round(statistics.median(samples), 2),
+        'p99_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 2),
+        'mean_ms': round(statistics.mean(samples), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--notes', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=50)
+    args = parser.parse_args()
+
+    call_command('migrate', verbosity=0)
+    if not search.fts_available():
+        sys.exit('This SQLite build has no FTS5 support.')
+
+    rng = random.Random(42)
+    words, weights = build_vocabulary(rng)
+    print(f'Seeding {args.notes} notes...')
+    user = seed(args.notes, words, weights, rng)
+
+    # Search terms drawn from the middle and tail of the vocabulary, as users
+    # search for the distinctive words in an entry rather than stop words.
+    queries = [rng.choice(words[100:]) for _ in range(args.queries)]
+
+    def like(query):
+        return list(Note.objects.filter(user=user, is_archived=False).filter(
+            models.Q(title__icontains=query) | models.Q(body__icontains=query)
+        ).order_by('-created_at'))
+
+    def fts(query):
+        return search.search_notes(user.id, query, limit=50)
+
+    print('LIKE:', timed(like, queries))
+    print('FTS5:', timed(fts, queries))
+
+
+if __name__ == '__main__':
+    main()
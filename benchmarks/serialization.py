@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""
+Compare the ModelSerializer list path with the values() projection path.
+
+Each variant fetches one page of a user's rows and renders it to JSON bytes,
+as the list endpoints do. Runs against a throwaway in-memory database, never
+db.sqlite3:
+
+    python benchmarks/serialization.py --rows 5000 --page 200 --repeat 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sojibWebApp.settings')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from django.conf import settings
+
+settings.DATABASES['default']['NAME'] = ':memory:'
+django.setup()
+
+from django.core.management import call_command
+from rest_framework.renderers import JSONRenderer
+
+from app import loadtest, projections
+from app.models import Reminder, Task, Note
+from app.serializers import ReminderSerializer, TaskSerializer, NoteSerializer
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'p50_ms': round(statistics.median(samples), 2),
+        'p99_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000, help='Reminders, tasks and notes per user.')
+    parser.add_argument('--page', type=int, default=200, help='Rows rendered per request.')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    call_command('migrate', verbosity=0)
+    print(f'Seeding {args.rows} reminders, tasks and notes...')
+    dataset = loadtest.seed(users=1, reminders=args.rows, tasks=args.rows, notes=args.rows, tags=10)
+    user_id = dataset['user_ids'][0]
+    renderer = JSONRenderer()
+
+    cases = [
+        ('reminders', Reminder.objects.filter(user_id=user_id), '-reminder_date', ReminderSerializer,
+         projections.REMINDERS, None),
+        ('tasks', Task.objects.filter(user_id=user_id), 'order_index', TaskSerializer, projections.TASKS, None),
+        ('notes', Note.objects.filter(user_id=user_id, is_archived=False), '-created_at', NoteSerializer,
+         projections.NOTES, ['id', 'title', 'is_pinned', 'tags', 'updated_at']),
+    ]
+    for name, queryset, order, serializer_class, projection, sparse in cases:
+        def serializer():
+            if serializer_class is NoteSerializer:
+                page = NoteSerializer.prefetch_tags(queryset).order_by(order)[:args.page]
+            else:
+                page = queryset.order_by(order)[:args.page]
+            return renderer.render(serializer_class(page, many=True).data)
+
+        def values(fields=projection.field_names):
+            page = projection.values(queryset, fields, order.lstrip('-')).order_by(order)[:args.page]
+            return renderer.render(projection.format(page, fields))
+
+        assert serializer() == values(), f'{name}: outputs differ'
+        print(f'{name} ModelSerializer:', timed(serializer, args.repeat))
+        print(f'{name} values():', timed(values, args.repeat))
+        if projection.default_fields != projection.field_names:
+            print(f'{name} values() default fields:', timed(lambda: values(projection.default_fields), args.repeat))
+        if sparse:
+            print(f'{name} values() ?fields={",".join(sparse)}:', timed(lambda: values(sparse), args.repeat))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""
+Compare SQLite write throughput and latency across database profiles.
+
+Starts several worker processes, like `gunicorn -w 4 --threads 4`, whose
+threads PATCH their own task in a loop while one reader per process GETs a
+task. Each profile runs on a fresh throwaway database file:
+
+    python benchmarks/sqlite_concurrency.py --processes 4 --threads 4 --duration 10
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+PROFILES = {
+    'default': {'DB_PROFILE': 'development', 'SQLITE_WRITE_COALESCING': 'False'},
+    'production': {'DB_PROFILE': 'production', 'SQLITE_WRITE_COALESCING': 'False'},
+    'production+coalescing': {'DB_PROFILE': 'production', 'SQLITE_WRITE_COALESCING': 'True'},
+}
+
+
+def setup_django(db_file):
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sojibWebApp.settings')
+    sys.path.insert(0, ROOT)
+    from django.conf import settings
+
+    settings.DATABASES['default']['NAME'] = db_file
+    django.setup()
+
+
+def seed(db_file, users):
+    setup_django(db_file)
+    from django.core.management import call_command
+    from app.models import User, Task
+
+    call_command('migrate', verbosity=0)
+    for i in range(users):
+        user = User.objects.create(name=f'Bench {i}', email=f'bench{i}@example.com', password_hash='!')
+        Task.objects.create(user=user, title='Task', order_index=1)
+
+
+def load(db_file, first_task, threads, start_at, duration):
+    """One worker process: `threads` writers plus a reader, printing raw timings as JSON."""
+    setup_django(db_file)
+    from django.test import Client
+
+    write_ms, read_ms, errors = [], [], []
+
+    def writer(task_id):
+        client = Client()
+        n = 0
+        while time.time() < start_at + duration:
+            n += 1
+            start = time.perf_counter()
+            response = client.patch(f'/api/tasks/{task_id}', {'title': f'Task {n}'}, content_type='application/json')
+            write_ms.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                errors.append(response.json().get('error'))
+
+    def reader():
+        client = Client()
+        while time.time() < start_at + duration:
+            start = time.perf_counter()
+            client.get(f'/api/tasks/{first_task}')
+            read_ms.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.005)
+
+    workers = [threading.Thread(target=writer, args=(first_task + i,)) for i in range(threads)]
+    workers.append(threading.Thread(target=reader))
+    time.sleep(max(0.0, start_at - time.time()))
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    json.dump({'write_ms': write_ms, 'read_ms': read_ms, 'errors': errors}, sys.stdout)
+
+
+def percentile(samples, fraction):
+    return round(samples[min(len(samples) - 1, int(len(samples) * fraction))], 1) if samples else None
+
+
+def run_profile(name, args):
+    workdir = tempfile.mkdtemp(prefix='sqlite-bench-')
+    db_file = os.path.join(workdir, 'db.sqlite3')
+    env = {**os.environ, **PROFILES[name], 'DEBUG': 'False', 'CACHE_DIR': os.path.join(workdir, 'cache')}
+    try:
+        users = args.processes * args.threads
+        subprocess.run([sys.executable, __file__, '--role', 'seed', '--db', db_file, '--users', str(users)],
+                       env=env, check=True)
+        start_at = time.time() + 3
+        procs = [
+            subprocess.Popen(
+                [sys.executable, __file__, '--role', 'load', '--db', db_file, '--first-task', str(1 + p * args.threads),
+                 '--threads', str(args.threads), '--start-at', str(start_at), '--duration', str(args.duration)],
+                env=env, stdout=subprocess.PIPE,
+            )
+            for p in range(args.processes)
+        ]
+        results = [json.loads(proc.communicate()[0]) for proc in procs]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    writes = sorted(ms for r in results for ms in r['write_ms'])
+    reads = sorted(ms for r in results for ms in r['read_ms'])
+    errors = [e for r in results for e in r['errors']]
+    summary = {
+        'writes_per_s': round((len(writes) - len(errors)) / args.duration, 1),
+        'write_p50_ms': round(statistics.median(writes), 1) if writes else None,
+        'write_p99_ms': percentile(writes, 0.99),
+        'read_p99_ms': percentile(reads, 0.99),
+        'errors': len(errors),
+    }
+    if errors:
+        summary['first_error'] = errors[0]
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per profile')
+    parser.add_argument('--profiles', default=','.join(PROFILES))
+    parser.add_argument('--role', choices=['seed', 'load'], help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    parser.add_argument('--users', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--first-task', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--start-at', type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.role == 'seed':
+        return seed(args.db, args.users)
+    if args.role == 'load':
+        return load(args.db, args.first_task, args.threads, args.start_at, args.duration)
+
+    print(f'{args.processes} processes x {args.threads} writer threads, {args.duration}s per profile')
+    for name in args.profiles.split(','):
+        print(f'{name}:', run_profile(name, args))
+
+
+if __name__ == '__main__':
+    main()
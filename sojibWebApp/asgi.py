@@ -0,0 +1,16 @@
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sojibWebApp.settings')
+
+django_application = get_asgi_application()
+
+from app import events  # noqa: E402  (needs the app registry loaded above)
+
+
+async def application(scope, receive, send):
+    # Event streams bypass Django's handler so an open stream holds no thread (see app/events.py)
+    if scope['type'] == 'http' and scope['path'] == '/api/events':
+        return await events.asgi_app(scope, receive, send)
+    return await django_application(scope, receive, send)
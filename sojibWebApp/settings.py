@@ -1,4 +1,5 @@
 import os
+from datetime import timedelta
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -22,6 +23,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app.instrumentation.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -59,6 +61,136 @@ DATABASES = {
     }
 }
 
+# 'production' tunes SQLite for several gunicorn workers sharing one file:
+# WAL lets reads proceed alongside a writer, IMMEDIATE transactions and
+# busy_timeout make writers queue for the lock instead of failing with
+# "database is locked", and connections are kept open between requests.
+DB_PROFILE = os.environ.get('DB_PROFILE', 'development' if DEBUG else 'production')
+if DB_PROFILE == 'production':
+    DATABASES['default'].update({
+        'ENGINE': 'app.backends.sqlite3',
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA busy_timeout=5000;'
+                'PRAGMA mmap_size=134217728;'
+                'PRAGMA cache_size=-20000;'
+                'PRAGMA temp_store=MEMORY'
+            ),
+        },
+    })
+
+# Funnel small writes from request threads through one thread per process
+# that commits them in groups (see app/write_queue.py).
+SQLITE_WRITE_COALESCING = os.environ.get('SQLITE_WRITE_COALESCING', 'False') == 'True'
+
+# File-based so that invalidation in one gunicorn worker is seen by the others
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', os.path.join(BASE_DIR, '.cache')),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # Serialized GET responses (see app/response_cache.py). Entries are keyed
+    # by the user's data version, which lives in the shared default cache, so
+    # a per-process cache never serves data another worker has changed.
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    },
+}
+
+DASHBOARD_CACHE_TIMEOUT = 300
+
+# Note body history keeps a full snapshot every this many revisions and the
+# patch between them otherwise (see app/revisions.py)
+NOTE_SNAPSHOT_INTERVAL = 50
+
+# How long deletions are remembered for /api/sync; older tokens get a full resync
+SYNC_TOMBSTONE_RETENTION_DAYS = 30
+
+# Channels a Notification is created on for each due reminder, and the
+# backend class that delivers each channel (see app/notifier.py)
+NOTIFICATION_CHANNELS = ['web']
+NOTIFICATION_BACKENDS = {
+    'web': 'app.notifier.WebBackend',
+    'email': 'app.mailer.EmailDigestBackend',
+    'push': 'app.notifier.LoggingBackend',
+}
+
+# Pending reminders overdue by more than this get no notification (say,
+# old ones on a first deploy or from a workspace import)
+NOTIFICATION_MAX_LATENESS_HOURS = 24
+
+# A notification whose delivery fails is retried after
+# NOTIFICATION_RETRY_BASE_SECONDS, doubling each time up to
+# NOTIFICATION_RETRY_MAX_SECONDS, and marked failed after
+# NOTIFICATION_MAX_ATTEMPTS tries
+NOTIFICATION_MAX_ATTEMPTS = 5
+NOTIFICATION_RETRY_BASE_SECONDS = 30
+NOTIFICATION_RETRY_MAX_SECONDS = 3600
+
+# Outbound SMTP for email notifications (see app/mailer.py). Up to
+# EMAIL_POOL_SIZE connections stay open between batches and send in
+# parallel, EMAIL_BATCH_SIZE messages per connection at a time.
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 25))
+EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'False') == 'True'
+EMAIL_TIMEOUT = 10
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'Keizen <noreply@localhost>')
+EMAIL_POOL_SIZE = 4
+EMAIL_BATCH_SIZE = 50
+EMAIL_MAX_MESSAGES_PER_CONNECTION = 100
+EMAIL_POOL_IDLE_SECONDS = 60
+
+# Server-Sent Events at /api/events (see app/events.py). Streams stay open
+# only under an ASGI server; WSGI workers answer at once and the browser
+# polls every EVENTS_WSGI_RETRY_MS instead.
+EVENTS_POLL_SECONDS = 2
+EVENTS_HEARTBEAT_SECONDS = 15
+EVENTS_STREAM_SECONDS = 300
+EVENTS_QUEUE_SIZE = 100
+EVENTS_REPLAY_HOURS = 24
+EVENTS_RETRY_MS = 3000
+EVENTS_WSGI_RETRY_MS = 10000
+
+# Verified JWTs kept in memory per process, and the revocation bloom filter
+# (see app/authentication.py). A token revoked through another worker is
+# rejected here within JWT_REVOCATION_REFRESH_SECONDS.
+JWT_CACHE_SIZE = 10000
+JWT_REVOCATION_BLOOM_CAPACITY = 100000
+JWT_REVOCATION_REFRESH_SECONDS = 5
+
+# Password hashing (see app/hashing.py). The first hasher of the profile hashes
+# new passwords; hashes made with another hasher or older parameters are still
+# accepted and are replaced on the user's next successful login.
+PASSWORD_HASHER_PROFILE = os.environ.get('PASSWORD_HASHER_PROFILE', 'pbkdf2')
+PASSWORD_HASHERS = {
+    'pbkdf2': ['app.hashing.ConfiguredPBKDF2PasswordHasher', 'app.hashing.ConfiguredScryptPasswordHasher'],
+    'scrypt': ['app.hashing.ConfiguredScryptPasswordHasher', 'app.hashing.ConfiguredPBKDF2PasswordHasher'],
+}[PASSWORD_HASHER_PROFILE] + [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 600000))
+PASSWORD_SCRYPT_WORK_FACTOR = int(os.environ.get('PASSWORD_SCRYPT_WORK_FACTOR', 2 ** 14))
+# Threads per process that run password hashing; logins beyond this queue
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -78,17 +210,52 @@ STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
+# collectstatic minifies CSS/JS, fingerprints every file name and writes .gz
+# variants (see app/staticfiles.py); hashed files are served as immutable
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'app.staticfiles.MinifiedManifestStaticFilesStorage'},
+}
+STATIC_MAX_AGE = 60 * 60 * 24 * 365
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Largest attachment accepted, and how long an unfinished chunked upload is
+# kept before its partial file is removed (see app/attachments.py)
+ATTACHMENT_MAX_SIZE = 100 * 1024 * 1024
+ATTACHMENT_UPLOAD_TTL = timedelta(days=1)
+
+# Thumbnail widths served by /api/attachments/<id>/thumbnail, rendered in the
+# background on upload and kept on disk up to THUMBNAIL_CACHE_MAX_BYTES
+THUMBNAIL_SIZES = (128, 512)
+THUMBNAIL_FORMAT = 'WEBP'
+THUMBNAIL_CACHE_MAX_BYTES = 256 * 1024 * 1024
+THUMBNAIL_PREGENERATE = True
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'app.authentication.JWTAuthentication',
+    ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'app.instrumentation.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+# Request instrumentation (see app/instrumentation.py): Server-Timing headers,
+# slow request/query logs, and per-route metrics at /api/_metrics, which
+# requires "Authorization: Bearer <METRICS_TOKEN>" when that is set
+SERVER_TIMING = os.environ.get('SERVER_TIMING', 'True') == 'True'
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 1000))
+SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', 200))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://localhost:8000",
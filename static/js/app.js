@@ -9,6 +9,11 @@ let allReminders = [];
 let allTasks = [];
 let allNotes = [];
 
+// Keyset pagination state: next cursor per list, null when fully loaded
+const PAGE_SIZE = 50;
+const nextCursors = { reminders: null, tasks: null, notes: null };
+const loadingMore = { reminders: false, tasks: false, notes: false };
+
 function showPage(pageId) {
     document.querySelectorAll('.page').forEach(p => p.classList.remove('active'));
     document.getElementById(pageId).classList.add('active');
@@ -118,6 +123,7 @@ async function register() {
             localStorage.setItem('currentUser', JSON.stringify(currentUser));
             showPage('dashboard-page');
             document.getElementById('user-name').textContent = currentUser.name;
+            connectReminderEvents();
         } else {
             console.error('Registration error response:', response.status, data);
             alert(data.error || `Registration failed: ${response.status}`);
@@ -149,6 +155,7 @@ async function login() {
             localStorage.setItem('currentUser', JSON.stringify(currentUser));
             showPage('dashboard-page');
             document.getElementById('user-name').textContent = currentUser.name;
+            connectReminderEvents();
 
             const darkMode = localStorage.getItem('darkMode') === 'true';
             if (darkMode) {
@@ -166,6 +173,18 @@ async function login() {
 }
 
 function logout() {
+    if (accessToken) {
+        fetch(`${API_URL}/auth/logout`, {
+            method: 'POST',
+            headers: { 'Authorization': `Bearer ${accessToken}` }
+        }).catch(error => console.error('Logout error:', error));
+    }
+    endSession();
+}
+
+function endSession() {
+    disconnectReminderEvents();
+    clearTimeout(diaryAutosaveTimer);
     localStorage.removeItem('accessToken');
     localStorage.removeItem('currentUser');
     accessToken = null;
@@ -175,6 +194,73 @@ function logout() {
     document.getElementById('register-form').reset();
 }
 
+// Authenticated API calls go through here. A 401 means the saved token has
+// expired or was revoked (say, by logging out in another tab): drop the
+// session and go back to the login page rather than failing every call.
+async function apiFetch(url, options) {
+    const token = accessToken;
+    const response = await fetch(url, options);
+    if (response.status === 401 && token && token === accessToken) {
+        endSession();
+        showNotification('Your session has expired. Please log in again.');
+    }
+    return response;
+}
+
+// Due reminders pushed by the server as Server-Sent Events
+let reminderEvents = null;
+
+function connectReminderEvents() {
+    disconnectReminderEvents();
+    if (!accessToken || !currentUser || !window.EventSource) return;
+
+    // EventSource resends the last id itself on reconnects; keep it for page reloads too
+    const lastIdKey = `lastEventId:${currentUser.id}`;
+    const lastId = localStorage.getItem(lastIdKey);
+    let url = `${API_URL}/events?token=${encodeURIComponent(accessToken)}`;
+    if (lastId) url += `&last_event_id=${encodeURIComponent(lastId)}`;
+    reminderEvents = new EventSource(url);
+
+    reminderEvents.onerror = () => {
+        // EventSource retries on its own unless the server refused the stream,
+        // as it does for an expired token; a cheap call tells which it was
+        if (reminderEvents && reminderEvents.readyState === EventSource.CLOSED && currentUser) {
+            reminderEvents = null;
+            apiFetch(`${API_URL}/users/${currentUser.id}`, {
+                headers: { 'Authorization': `Bearer ${accessToken}` }
+            }).then(response => {
+                if (response.ok) setTimeout(connectReminderEvents, 10000);
+            }).catch(() => setTimeout(connectReminderEvents, 10000));
+        }
+    };
+    reminderEvents.addEventListener('ready', event => {
+        localStorage.setItem(lastIdKey, event.lastEventId);
+    });
+    reminderEvents.addEventListener('reminder', event => {
+        localStorage.setItem(lastIdKey, event.lastEventId);
+        const data = JSON.parse(event.data);
+        const title = data.reminder ? data.reminder.title : 'Reminder';
+        showNotification(`Reminder: ${title}`);
+        if (window.Notification && Notification.permission === 'granted') {
+            new Notification('Reminder', { body: title, tag: `reminder-${data.id}` });
+        }
+        if (document.getElementById('reminders-page').classList.contains('active')) {
+            loadReminders();
+        }
+    });
+
+    if (window.Notification && Notification.permission === 'default') {
+        Notification.requestPermission();
+    }
+}
+
+function disconnectReminderEvents() {
+    if (reminderEvents) {
+        reminderEvents.close();
+        reminderEvents = null;
+    }
+}
+
 function openReminderModal() {
     document.getElementById('reminder-modal').classList.add('active');
 }
@@ -218,7 +304,7 @@ async function saveReminder(event) {
     const category = document.getElementById('reminder-category').value;
 
     try {
-        const response = await fetch(`${API_URL}/reminders`, {
+        const response = await apiFetch(`${API_URL}/reminders`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -257,7 +343,7 @@ async function saveTask(event) {
     const priority = document.getElementById('task-priority').value;
 
     try {
-        const response = await fetch(`${API_URL}/tasks`, {
+        const response = await apiFetch(`${API_URL}/tasks`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -295,7 +381,7 @@ async function saveNote(event) {
     const tags = tagsInput ? tagsInput.split(',').map(t => t.trim()) : [];
 
     try {
-        const response = await fetch(`${API_URL}/notes`, {
+        const response = await apiFetch(`${API_URL}/notes`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -325,7 +411,7 @@ async function deleteReminder(reminderId) {
     if (!confirm('Delete this reminder?')) return;
 
     try {
-        const response = await fetch(`${API_URL}/reminders/${reminderId}`, {
+        const response = await apiFetch(`${API_URL}/reminders/${reminderId}`, {
             method: 'DELETE',
             headers: { 'Authorization': `Bearer ${accessToken}` }
         });
@@ -344,7 +430,7 @@ async function deleteTask(taskId) {
     if (!confirm('Delete this task?')) return;
 
     try {
-        const response = await fetch(`${API_URL}/tasks/${taskId}`, {
+        const response = await apiFetch(`${API_URL}/tasks/${taskId}`, {
             method: 'DELETE',
             headers: { 'Authorization': `Bearer ${accessToken}` }
         });
@@ -363,7 +449,7 @@ async function deleteNote(noteId) {
     if (!confirm('Delete this note?')) return;
 
     try {
-        const response = await fetch(`${API_URL}/notes/${noteId}`, {
+        const response = await apiFetch(`${API_URL}/notes/${noteId}`, {
             method: 'DELETE',
             headers: { 'Authorization': `Bearer ${accessToken}` }
         });
@@ -380,7 +466,7 @@ async function deleteNote(noteId) {
 
 async function completeReminder(reminderId) {
     try {
-        const response = await fetch(`${API_URL}/reminders/${reminderId}`, {
+        const response = await apiFetch(`${API_URL}/reminders/${reminderId}`, {
             method: 'PATCH',
             headers: {
                 'Content-Type': 'application/json',
@@ -399,7 +485,7 @@ async function completeReminder(reminderId) {
 
 async function completeTask(taskId) {
     try {
-        const response = await fetch(`${API_URL}/tasks/${taskId}`, {
+        const response = await apiFetch(`${API_URL}/tasks/${taskId}`, {
             method: 'PATCH',
             headers: {
                 'Content-Type': 'application/json',
@@ -418,7 +504,7 @@ async function completeTask(taskId) {
 
 async function toggleNotePin(noteId, isPinned) {
     try {
-        const response = await fetch(`${API_URL}/notes/${noteId}`, {
+        const response = await apiFetch(`${API_URL}/notes/${noteId}`, {
             method: 'PATCH',
             headers: {
                 'Content-Type': 'application/json',
@@ -435,15 +521,68 @@ async function toggleNotePin(noteId, isPinned) {
     }
 }
 
+async function fetchPage(resource, cursor = null) {
+    let url = `${API_URL}/${resource}?user_id=${currentUser.id}&limit=${PAGE_SIZE}`;
+    if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
+
+    const response = await apiFetch(url, {
+        headers: { 'Authorization': `Bearer ${accessToken}` }
+    });
+    const data = await response.json();
+    nextCursors[resource] = data.next;
+    return data.results;
+}
+
+async function loadMore(resource) {
+    if (!currentUser || !nextCursors[resource] || loadingMore[resource]) return;
+
+    loadingMore[resource] = true;
+    try {
+        const rows = await fetchPage(resource, nextCursors[resource]);
+        if (resource === 'reminders') {
+            allReminders = allReminders.concat(rows);
+            filterReminders();
+        } else if (resource === 'tasks') {
+            allTasks = allTasks.concat(rows);
+            filterTasks();
+        } else if (resource === 'notes') {
+            allNotes = allNotes.concat(rows);
+            if (!document.getElementById('note-search').value.trim()) {
+                renderNotes(allNotes);
+            }
+        }
+    } catch (error) {
+        console.error(`Error loading more ${resource}:`, error);
+    } finally {
+        loadingMore[resource] = false;
+    }
+}
+
+// Load the next page once the end of a list scrolls into view
+const listObservers = {};
+
+function observeListEnd(containerId, resource) {
+    if (listObservers[resource]) listObservers[resource].disconnect();
+    if (!nextCursors[resource]) return;
+
+    const container = document.getElementById(containerId);
+    const last = container.lastElementChild;
+    if (!last) return;
+
+    listObservers[resource] = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) {
+            listObservers[resource].disconnect();
+            loadMore(resource);
+        }
+    });
+    listObservers[resource].observe(last);
+}
+
 async function loadReminders() {
     if (!currentUser) return;
 
     try {
-        const response = await fetch(`${API_URL}/reminders?user_id=${currentUser.id}`, {
-            headers: { 'Authorization': `Bearer ${accessToken}` }
-        });
-
-        allReminders = await response.json();
+        allReminders = await fetchPage('reminders');
         renderReminders(allReminders);
     } catch (error) {
         console.error('Error loading reminders:', error);
@@ -454,11 +593,7 @@ async function loadTasks() {
     if (!currentUser) return;
 
     try {
-        const response = await fetch(`${API_URL}/tasks?user_id=${currentUser.id}`, {
-            headers: { 'Authorization': `Bearer ${accessToken}` }
-        });
-
-        allTasks = await response.json();
+        allTasks = await fetchPage('tasks');
         renderTasks(allTasks);
     } catch (error) {
         console.error('Error loading tasks:', error);
@@ -469,11 +604,7 @@ async function loadNotes() {
     if (!currentUser) return;
 
     try {
-        const response = await fetch(`${API_URL}/notes?user_id=${currentUser.id}`, {
-            headers: { 'Authorization': `Bearer ${accessToken}` }
-        });
-
-        allNotes = await response.json();
+        allNotes = await fetchPage('notes');
         renderNotes(allNotes);
     } catch (error) {
         console.error('Error loading notes:', error);
@@ -513,6 +644,8 @@ function renderReminders(reminders) {
 
         container.insertAdjacentHTML('beforeend', html);
     });
+
+    observeListEnd('reminders-list', 'reminders');
 }
 
 function renderTasks(tasks) {
@@ -548,6 +681,15 @@ function renderTasks(tasks) {
 
         container.insertAdjacentHTML('beforeend', html);
     });
+
+    observeListEnd('tasks-list', 'tasks');
+}
+
+// Stored excerpts are plain text; search snippets arrive as escaped HTML
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text || '';
+    return div.innerHTML;
 }
 
 function renderNotes(notes) {
@@ -574,7 +716,7 @@ function renderNotes(notes) {
                     <div>
                         <div class="card-title">${note.title}</div>
                         <div class="card-meta">${createdDate}</div>
-                        <p>${note.body.substring(0, 100)}...</p>
+                        <p>${note.snippet || escapeHtml(note.excerpt)}</p>
                         ${tagsHtml}
                     </div>
                 </div>
@@ -588,6 +730,8 @@ function renderNotes(notes) {
 
         container.insertAdjacentHTML('beforeend', html);
     });
+
+    observeListEnd('notes-list', 'notes');
 }
 
 function filterReminders() {
@@ -624,52 +768,59 @@ function filterTasks() {
     renderTasks(filtered);
 }
 
+let noteSearchTimer = null;
+let noteSearchResults = [];
+
 function searchNotes() {
-    const query = document.getElementById('note-search').value.toLowerCase();
+    const query = document.getElementById('note-search').value.trim();
 
-    const filtered = allNotes.filter(note =>
-        note.title.toLowerCase().includes(query) ||
-        note.body.toLowerCase().includes(query)
-    );
+    clearTimeout(noteSearchTimer);
+    if (!query) {
+        noteSearchResults = [];
+        renderNotes(allNotes);
+        return;
+    }
 
-    renderNotes(filtered);
+    // Debounce keystrokes so the server sees one ranked search per pause
+    noteSearchTimer = setTimeout(() => runNoteSearch(query), 250);
 }
 
-async function loadDashboard() {
+async function runNoteSearch(query) {
     if (!currentUser) return;
 
     try {
-        const [remindersRes, tasksRes, notesRes] = await Promise.all([
-            fetch(`${API_URL}/reminders?user_id=${currentUser.id}`, {
-                headers: { 'Authorization': `Bearer ${accessToken}` }
-            }),
-            fetch(`${API_URL}/tasks?user_id=${currentUser.id}`, {
-                headers: { 'Authorization': `Bearer ${accessToken}` }
-            }),
-            fetch(`${API_URL}/notes?user_id=${currentUser.id}`, {
-                headers: { 'Authorization': `Bearer ${accessToken}` }
-            })
-        ]);
+        const response = await apiFetch(`${API_URL}/notes/search?user_id=${currentUser.id}&q=${encodeURIComponent(query)}`, {
+            headers: { 'Authorization': `Bearer ${accessToken}` }
+        });
+        const notes = await response.json();
 
-        const reminders = await remindersRes.json();
-        const tasks = await tasksRes.json();
-        const notes = await notesRes.json();
+        // Ignore responses for a query the user has already typed past
+        if (document.getElementById('note-search').value.trim() !== query) return;
 
-        document.getElementById('total-reminders').textContent = reminders.length;
-        document.getElementById('total-tasks').textContent = tasks.length;
-        document.getElementById('total-notes').textContent = notes.length;
+        noteSearchResults = notes;
+        renderNotes(notes);
+    } catch (error) {
+        console.error('Error searching notes:', error);
+    }
+}
 
-        const completedToday = tasks.filter(t => t.status === 'completed').length;
-        document.getElementById('completed-today').textContent = completedToday;
+async function loadDashboard() {
+    if (!currentUser) return;
 
-        const upcomingReminders = reminders.filter(r => r.status === 'pending').slice(0, 3);
-        renderUpcomingReminders(upcomingReminders);
+    try {
+        const response = await apiFetch(`${API_URL}/dashboard?user_id=${currentUser.id}`, {
+            headers: { 'Authorization': `Bearer ${accessToken}` }
+        });
+        const dashboard = await response.json();
 
-        const recentTasks = tasks.filter(t => t.status !== 'completed').slice(0, 3);
-        renderRecentTasks(recentTasks);
+        document.getElementById('total-reminders').textContent = dashboard.counts.reminders;
+        document.getElementById('total-tasks').textContent = dashboard.counts.tasks;
+        document.getElementById('total-notes').textContent = dashboard.counts.notes;
+        document.getElementById('completed-today').textContent = dashboard.counts.tasks_completed;
 
-        const pinnedNotes = notes.filter(n => n.is_pinned).slice(0, 3);
-        renderPinnedNotes(pinnedNotes);
+        renderUpcomingReminders(dashboard.upcoming_reminders);
+        renderRecentTasks(dashboard.recent_tasks);
+        renderPinnedNotes(dashboard.pinned_notes);
     } catch (error) {
         console.error('Error loading dashboard:', error);
     }
@@ -714,7 +865,7 @@ function renderPinnedNotes(notes) {
         const html = `
             <div style="padding: 10px; border-bottom: 1px solid #eee;">
                 <strong>${note.title}</strong>
-                <div style="font-size: 12px; color: #999;">${note.body.substring(0, 50)}...</div>
+                <div style="font-size: 12px; color: #999;">${escapeHtml(note.excerpt.substring(0, 50))}...</div>
             </div>
         `;
         container.insertAdjacentHTML('beforeend', html);
@@ -735,7 +886,7 @@ async function updateProfile() {
     const name = document.getElementById('settings-name').value;
 
     try {
-        const response = await fetch(`${API_URL}/users/${currentUser.id}/update`, {
+        const response = await apiFetch(`${API_URL}/users/${currentUser.id}/update`, {
             method: 'PATCH',
             headers: {
                 'Content-Type': 'application/json',
@@ -774,7 +925,7 @@ async function updatePassword() {
     }
 
     try {
-        const response = await fetch(`${API_URL}/users/${currentUser.id}/update`, {
+        const response = await apiFetch(`${API_URL}/users/${currentUser.id}/update`, {
             method: 'PATCH',
             headers: {
                 'Content-Type': 'application/json',
@@ -798,7 +949,7 @@ async function updateUserDarkMode(isDarkMode) {
     if (!currentUser) return;
 
     try {
-        await fetch(`${API_URL}/users/${currentUser.id}/update`, {
+        await apiFetch(`${API_URL}/users/${currentUser.id}/update`, {
             method: 'PATCH',
             headers: {
                 'Content-Type': 'application/json',
@@ -815,16 +966,24 @@ async function updateUserDarkMode(isDarkMode) {
 let currentDiaryNote = null;
 let diaryEdited = false;
 
-function openDiaryEditor(noteId = null) {
+async function openDiaryEditor(noteId = null) {
     if (noteId) {
-        const note = allNotes.find(n => n.id === noteId);
-        if (note) {
+        // Lists and search only carry excerpts; the body comes from the note itself
+        try {
+            const response = await apiFetch(`${API_URL}/notes/${noteId}`, {
+                headers: { 'Authorization': `Bearer ${accessToken}` }
+            });
+            if (!response.ok) return;
+            const note = await response.json();
             currentDiaryNote = note;
             document.getElementById('diary-title').value = note.title;
             document.getElementById('diary-editor').innerHTML = note.body || '';
             document.getElementById('diary-tags').value = note.tags ? note.tags.join(', ') : '';
             diaryEdited = false;
             updateDiaryStatus();
+        } catch (error) {
+            console.error('Error loading diary entry:', error);
+            return;
         }
     } else {
         currentDiaryNote = null;
@@ -842,6 +1001,7 @@ function goBackToDiaryList() {
         const confirmed = confirm('You have unsaved changes. Are you sure you want to leave?');
         if (!confirmed) return;
     }
+    clearTimeout(diaryAutosaveTimer);
     currentDiaryNote = null;
     diaryEdited = false;
     showPage('notes-page');
@@ -850,6 +1010,7 @@ function goBackToDiaryList() {
 function markDiaryEdited() {
     diaryEdited = true;
     updateDiaryStatus();
+    scheduleDiaryAutosave();
 }
 
 function updateDiaryStatus() {
@@ -879,30 +1040,44 @@ async function saveDiaryEntry() {
         return;
     }
 
+    clearTimeout(diaryAutosaveTimer);
     try {
-        const method = currentDiaryNote ? 'PATCH' : 'POST';
-        const url = currentDiaryNote
-            ? `${API_URL}/notes/${currentDiaryNote.id}/`
-            : `${API_URL}/notes/`;
-
-        const response = await fetch(url, {
-            method: method,
-            headers: {
-                'Content-Type': 'application/json',
-                'Authorization': `Bearer ${accessToken}`
-            },
-            body: JSON.stringify({
-                title: title,
-                body: body,
-                tags: tags,
-                is_pinned: currentDiaryNote?.is_pinned || false,
-                is_archived: currentDiaryNote?.is_archived || false
-            })
-        });
+        let saved;
+        if (currentDiaryNote) {
+            // Existing entries send only what changed since the last saved revision
+            let result = await pushDiaryEdits(title);
+            if (result === 'conflict') {
+                if (!confirm('This entry was changed elsewhere since you opened it. OK saves your version over it, Cancel discards your changes.')) {
+                    await openDiaryEditor(currentDiaryNote.id);
+                    return;
+                }
+                await rebaseDiaryNote();
+                result = await pushDiaryEdits(title);
+            }
+            if (result !== 'saved') {
+                alert('Failed to save diary entry');
+                return;
+            }
+            saved = (currentDiaryNote.tags || []).join(',') === tags.join(',') || await patchNote(currentDiaryNote.id, { tags: tags });
+        } else {
+            const response = await apiFetch(`${API_URL}/notes`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Authorization': `Bearer ${accessToken}`
+                },
+                body: JSON.stringify({
+                    user_id: currentUser.id,
+                    title: title,
+                    body: body,
+                    tags: tags
+                })
+            });
+            saved = response.ok && await response.json();
+        }
 
-        if (response.ok) {
-            const data = await response.json();
-            currentDiaryNote = data;
+        if (saved) {
+            if (saved !== true) currentDiaryNote = saved;
             diaryEdited = false;
             updateDiaryStatus();
 
@@ -923,6 +1098,109 @@ async function saveDiaryEntry() {
     }
 }
 
+async function patchNote(noteId, changes) {
+    const response = await apiFetch(`${API_URL}/notes/${noteId}`, {
+        method: 'PATCH',
+        headers: {
+            'Content-Type': 'application/json',
+            'Authorization': `Bearer ${accessToken}`
+        },
+        body: JSON.stringify(changes)
+    });
+    return response.ok && await response.json();
+}
+
+// Smallest single splice [start, end, text] turning `before` into `after`,
+// with offsets in JavaScript string indices as the server expects
+function diffSplice(before, after) {
+    if (before === after) return null;
+    const max = Math.min(before.length, after.length);
+    let start = 0;
+    while (start < max && before[start] === after[start]) start++;
+    let end = 0;
+    while (end < max - start && before[before.length - 1 - end] === after[after.length - 1 - end]) end++;
+    // Never cut an emoji or other surrogate pair in half
+    const isHigh = code => code >= 0xD800 && code <= 0xDBFF;
+    const isLow = code => code >= 0xDC00 && code <= 0xDFFF;
+    if (start > 0 && isHigh(before.charCodeAt(start - 1))) start--;
+    if (end > 0 && isLow(before.charCodeAt(before.length - end))) end--;
+    return [start, before.length - end, after.slice(start, after.length - end)];
+}
+
+// Edits go out one at a time, each against the revision the previous one produced
+let diaryPushing = Promise.resolve();
+
+function pushDiaryEdits(title) {
+    const run = diaryPushing.then(() => sendDiaryEdits(title));
+    diaryPushing = run.catch(() => {});
+    return run;
+}
+
+async function sendDiaryEdits(title) {
+    const note = currentDiaryNote;
+    const body = document.getElementById('diary-editor').innerHTML;
+    const splice = diffSplice(note.body, body);
+    if (!splice && title === note.title) return 'saved';
+
+    const payload = { revision: note.revision, patch: splice ? [splice] : [] };
+    if (title !== note.title) payload.title = title;
+
+    const response = await apiFetch(`${API_URL}/notes/${note.id}/edits`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Authorization': `Bearer ${accessToken}`
+        },
+        body: JSON.stringify(payload)
+    });
+    if (response.status === 409) return 'conflict';
+    if (!response.ok) return 'failed';
+
+    const data = await response.json();
+    note.body = body;
+    note.title = title;
+    note.revision = data.revision;
+    return 'saved';
+}
+
+// Take the server's latest revision as the base, keeping the editor's contents
+async function rebaseDiaryNote() {
+    const response = await apiFetch(`${API_URL}/notes/${currentDiaryNote.id}`, {
+        headers: { 'Authorization': `Bearer ${accessToken}` }
+    });
+    if (response.ok) currentDiaryNote = await response.json();
+}
+
+// Autosave existing entries a couple of seconds after the last change
+const DIARY_AUTOSAVE_DELAY = 2000;
+let diaryAutosaveTimer = null;
+
+function scheduleDiaryAutosave() {
+    clearTimeout(diaryAutosaveTimer);
+    if (!currentDiaryNote) return;
+    diaryAutosaveTimer = setTimeout(autosaveDiaryEntry, DIARY_AUTOSAVE_DELAY);
+}
+
+async function autosaveDiaryEntry() {
+    const title = document.getElementById('diary-title').value.trim();
+    if (!currentDiaryNote || !diaryEdited || !title) return;
+
+    const body = document.getElementById('diary-editor').innerHTML;
+    try {
+        const result = await pushDiaryEdits(title);
+        const statusEl = document.getElementById('diary-status');
+        if (result === 'saved' && document.getElementById('diary-editor').innerHTML === body) {
+            diaryEdited = false;
+            updateDiaryStatus();
+        } else if (result === 'conflict') {
+            // Left for an explicit save to resolve
+            statusEl.textContent = 'Changed elsewhere';
+        }
+    } catch (error) {
+        console.error('Autosave failed:', error);
+    }
+}
+
 function formatText(command) {
     document.execCommand(command, false, null);
     document.getElementById('diary-editor').focus();
@@ -1008,6 +1286,7 @@ document.addEventListener('DOMContentLoaded', function () {
         currentUser = JSON.parse(savedUser);
         document.getElementById('user-name').textContent = currentUser.name;
         showPage('dashboard-page');
+        connectReminderEvents();
 
         const darkMode = localStorage.getItem('darkMode') === 'true';
         if (darkMode) {